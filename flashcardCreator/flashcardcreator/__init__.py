@@ -15,5 +15,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program; if not, see <http://www.gnu.org/licenses/>.
 #
-__all__ = ["translator", "userinput", "affix", "database", "main",
-           "ponsonlinedictionary", "util"]
+__all__ = ["translator", "userinput", "affix", "benchmark", "database", "main",
+           "ponsonlinedictionary", "translationcache", "formindex", "migrations",
+           "exporter", "profiling", "resolution", "sqltracing", "standinserver",
+           "syntheticdictionary", "util"]
@@ -17,10 +17,13 @@
 #
 
 import logging
+import threading
+from collections import OrderedDict
 
 # These methods calculate the derivate forms of the word's root
 from flashcardcreator.database import return_rows_of_sql_statement, \
     GRAMMATICAL_DATABASE_LOCAL_FILENAME
+from flashcardcreator.profiling import profiled
 
 DERIVATIVE_FORMS_DESCRIPTIONS_TO_ENGLISH_NAMES = {
     'ед.ч.': 'singular_indefinite',
@@ -67,24 +70,120 @@ VERB_DERIVATIVE_FORMS_WHICH_MIGHT_BE_IRREGULAR = (
     'повелително наклонение, мн.ч.'
 )
 
+SQL_FIND_ALL_DERIVATIVE_FORMS = '''
+    select name, description
+    from derivative_form
+    where base_word_id = :base_word_id
+    order by id;
+    '''
+# The placeholders of the IDs are added by format_prefetch_derivative_forms_statement
+SQL_PREFETCH_DERIVATIVE_FORMS = '''
+    select base_word_id, name, description
+    from derivative_form
+    where base_word_id in ({word_id_placeholders})
+    order by base_word_id, id;
+    '''
+# Number of words whose derivative forms are kept in memory
+DERIVATIVE_FORMS_CACHE_SIZE = 4096
+# Number of word IDs searched with one statement. It is below the limit of variables of old SQLite versions
+PREFETCH_WORD_IDS_PER_STATEMENT = 500
+
 logger = logging.getLogger(__name__)
 
 
+class _DerivativeFormsCache:
+    """
+    Keeps the derivative forms of the most recently used words. It can be used by many threads.
+    """
+
+
+    def __init__(self, maximum_size=DERIVATIVE_FORMS_CACHE_SIZE):
+        self._maximum_size = maximum_size
+        self._derivative_forms = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, base_word_id):
+        """
+        :return: List of tuples (name, description) or None if the word isn't in the cache
+        """
+        with self._lock:
+            derivative_forms = self._derivative_forms.get(base_word_id)
+            if derivative_forms is not None:
+                self._derivative_forms.move_to_end(base_word_id)
+            return derivative_forms
+
+
+    def __contains__(self, base_word_id):
+        with self._lock:
+            return base_word_id in self._derivative_forms
+
+
+    def put(self, base_word_id, derivative_forms):
+        with self._lock:
+            self._derivative_forms[base_word_id] = derivative_forms
+            self._derivative_forms.move_to_end(base_word_id)
+            while len(self._derivative_forms) > self._maximum_size:
+                self._derivative_forms.popitem(last=False)
+
+
+    def clear(self):
+        with self._lock:
+            self._derivative_forms.clear()
+
+
+_derivative_forms_cache = _DerivativeFormsCache()
+
+
+def clear_derivative_forms_cache():
+    _derivative_forms_cache.clear()
+
+
+def format_prefetch_derivative_forms_statement(word_id_count):
+    return SQL_PREFETCH_DERIVATIVE_FORMS.format(
+        word_id_placeholders=', '.join('?' * word_id_count))
+
+
+def prefetch_derivative_forms(base_word_ids):
+    """
+    Loads the derivative forms of many words with one statement per PREFETCH_WORD_IDS_PER_STATEMENT words,
+    so the following calculations don't search the grammatical database.
+
+    :param base_word_ids: IDs of the root words. IDs already in the cache and None are ignored
+    :return: Number of words which were searched in the grammatical database
+    """
+    missing_word_ids = [base_word_id for base_word_id in dict.fromkeys(base_word_ids)
+                        if base_word_id is not None and base_word_id not in _derivative_forms_cache]
+    for chunk_start in range(0, len(missing_word_ids), PREFETCH_WORD_IDS_PER_STATEMENT):
+        chunk_word_ids = missing_word_ids[chunk_start:chunk_start + PREFETCH_WORD_IDS_PER_STATEMENT]
+        found_derivative_forms = {base_word_id: [] for base_word_id in chunk_word_ids}
+        for base_word_id, name, description in return_rows_of_sql_statement(
+                GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+                format_prefetch_derivative_forms_statement(len(chunk_word_ids)),
+                chunk_word_ids):
+            found_derivative_forms[base_word_id].append((name, description))
+        for base_word_id, derivative_forms in found_derivative_forms.items():
+            _derivative_forms_cache.put(base_word_id, derivative_forms)
+    logger.debug(f'The derivative forms of {len(missing_word_ids)} words were prefetched')
+    return len(missing_word_ids)
+
+
+@profiled('dictionary.derivative_forms')
 def _find_all_derivative_forms(base_word_id):
     """
     Find all the derivative forms stored in the grammatical database. This is easier than using the rules with affixes of the word types to generate the words.
+    The forms are kept in a cache, so each word is searched only once.
 
     :param base_word_id: ID of the root word
     :return: A list containing all derivative forms. The first element is the word root
     """
-    search_params = {'base_word_id': base_word_id}
-    found_derivative_forms = return_rows_of_sql_statement(
-        GRAMMATICAL_DATABASE_LOCAL_FILENAME, '''
-            select name, description
-            from derivative_form
-            where base_word_id = :base_word_id
-            order by id;
-        ''', search_params)
+    found_derivative_forms = _derivative_forms_cache.get(base_word_id)
+    if found_derivative_forms is None:
+        search_params = {'base_word_id': base_word_id}
+        found_derivative_forms = return_rows_of_sql_statement(
+            GRAMMATICAL_DATABASE_LOCAL_FILENAME, SQL_FIND_ALL_DERIVATIVE_FORMS,
+            search_params)
+        _derivative_forms_cache.put(base_word_id, found_derivative_forms)
     logger.debug(f'Derivative forms {found_derivative_forms}')
     return found_derivative_forms
 
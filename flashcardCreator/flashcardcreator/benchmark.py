@@ -0,0 +1,339 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Measures the speed of the searches in the grammatical dictionary and of the import of files without
+# network access. The results are dictionaries which can be stored as JSON and compared between commits
+
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+
+import flashcardcreator.affix
+import flashcardcreator.main
+import flashcardcreator.resolution
+from flashcardcreator.affix import clear_derivative_forms_cache, \
+    _find_all_derivative_forms
+from flashcardcreator.formindex import open_form_index
+from flashcardcreator.main import WordFinder, parse_line, \
+    import_words_from_text_file, set_flashcard_database, \
+    close_flashcard_database, get_flashcard_store
+from flashcardcreator.resolution import NonInteractiveResolver
+from flashcardcreator.util import convert_to_absolute_path, OTHER_WORD_TYPES
+
+BENCHMARK_RESULTS_FORMAT_VERSION = 1
+DEFAULT_SAMPLES = 1000
+DEFAULT_PARSED_LINES = 100000
+DEFAULT_IMPORTED_LINES = 500
+FLASHCARD_DATABASE_TEMPLATE = convert_to_absolute_path('flashcards.sqlite')
+
+logger = logging.getLogger(__name__)
+
+
+def summarize_latencies(durations):
+    """
+    :param durations: Required. Durations in seconds
+    :return: Dictionary with the mean and the percentiles in milliseconds
+    """
+    if not durations:
+        return {'samples': 0}
+    milliseconds = sorted(duration * 1000 for duration in durations)
+    percentiles = statistics.quantiles(milliseconds, n=100, method='inclusive') \
+        if len(milliseconds) > 1 else [milliseconds[0]] * 99
+    return {'samples': len(milliseconds),
+            'mean_ms': statistics.fmean(milliseconds),
+            'p50_ms': percentiles[49],
+            'p90_ms': percentiles[89],
+            'p99_ms': percentiles[98],
+            'max_ms': milliseconds[-1]}
+
+
+def _replace_attribute(exit_stack, target, attribute_name, new_value):
+    exit_stack.callback(setattr, target, attribute_name,
+                        getattr(target, attribute_name))
+    setattr(target, attribute_name, new_value)
+
+
+@contextmanager
+def use_grammatical_database(database_file, index_file=None):
+    """
+    Points the searches at another grammatical dictionary until the context ends
+
+    :param database_file: Required. Grammatical dictionary to search
+    :param index_file: Optional. Index of the derivative forms of this dictionary. If it is missing or
+        stale, the searches use SQL
+    :return: FormIndex used by the searches or None
+    """
+    form_index = open_form_index(database_file, index_file) if index_file else None
+    with ExitStack() as exit_stack:
+        for module in (flashcardcreator.main, flashcardcreator.affix,
+                       flashcardcreator.resolution):
+            _replace_attribute(exit_stack, module,
+                               'GRAMMATICAL_DATABASE_LOCAL_FILENAME', database_file)
+        _replace_attribute(exit_stack, flashcardcreator.main, 'get_form_index',
+                           lambda: form_index)
+        if form_index is not None:
+            exit_stack.callback(form_index.close)
+        exit_stack.callback(clear_derivative_forms_cache)
+        clear_derivative_forms_cache()
+        yield form_index
+
+
+def _translate_without_network(word_to_translate, debug_client_calls=False,
+                               deepl_translations=None):
+    return f'translation of {word_to_translate}'
+
+
+def choose_sample_words(database_file, samples, random_generator):
+    """
+    Chooses random derivative forms of the grammatical dictionary
+    :return: List of forms. A form can appear many times
+    """
+    with sqlite3.connect(database_file) as db_connection:
+        maximum_id, = db_connection.execute('select max(id) from derivative_form').fetchone()
+        chosen_ids = [random_generator.randint(1, maximum_id) for _ in range(samples)]
+        found_forms = dict(db_connection.execute(
+            f"select id, name from derivative_form where id in ({', '.join('?' * len(set(chosen_ids)))})",
+            list(set(chosen_ids))).fetchall())
+    db_connection.close()
+    return [found_forms[chosen_id] for chosen_id in chosen_ids if chosen_id in found_forms]
+
+
+def choose_sample_rows(database_file, samples, random_generator):
+    """
+    Chooses random words of the grammatical dictionary
+    :return: List of tuples (word_id, root_word, word_type_id, speech_part, word_meaning)
+    """
+    with sqlite3.connect(database_file) as db_connection:
+        maximum_id, = db_connection.execute('select max(id) from word').fetchone()
+        chosen_ids = list({random_generator.randint(1, maximum_id) for _ in range(samples)})
+        found_rows = db_connection.execute(f'''
+            select w.id, w.name, w.type_id, wt.speech_part, w.meaning
+            from word as w join word_type as wt on w.type_id = wt.id
+            where w.id in ({', '.join('?' * len(chosen_ids))})''', chosen_ids).fetchall()
+    db_connection.close()
+    return found_rows
+
+
+def benchmark_find_word(sample_words):
+    """
+    Measures the latency of WordFinder._find_word. The first word of the grammatical dictionary is chosen
+    when there are many
+    """
+    durations = []
+    with ExitStack() as exit_stack:
+        _replace_attribute(exit_stack, flashcardcreator.main, 'word_resolver',
+                           NonInteractiveResolver())
+        found_words = 0
+        for sample_word in sample_words:
+            start_time = time.perf_counter()
+            found_word = WordFinder._find_word(sample_word, None)
+            durations.append(time.perf_counter() - start_time)
+            found_words += found_word is not None
+    return {**summarize_latencies(durations), 'found_words': found_words}
+
+
+def benchmark_derivative_forms(word_ids):
+    """
+    Measures _find_all_derivative_forms with an empty cache and again with all the words in the cache
+    """
+    results = {}
+    clear_derivative_forms_cache()
+    for cache_state in ('cold', 'warm'):
+        durations = []
+        found_forms = 0
+        start_time = time.perf_counter()
+        for word_id in word_ids:
+            call_start_time = time.perf_counter()
+            found_forms += len(_find_all_derivative_forms(word_id))
+            durations.append(time.perf_counter() - call_start_time)
+        total_seconds = time.perf_counter() - start_time
+        results[cache_state] = {**summarize_latencies(durations),
+                                'forms': found_forms,
+                                'forms_per_second': found_forms / total_seconds if total_seconds else None}
+    return results
+
+
+def benchmark_exists_flashcard(sample_rows):
+    """
+    Measures exists_flashcard_for_this_word. Half of the words are registered before as existing flashcards
+    """
+    words = [word for word in (WordFinder._create_classified_word_subclass(*row)
+                               for row in sample_rows) if word is not None]
+    flashcard_store = get_flashcard_store()
+    with flashcard_store.transaction():
+        for word in words[::2]:
+            flashcard_store.register_flashcard(word._root_word, word._word_id)
+    durations = []
+    existing_words = 0
+    for word in words:
+        start_time = time.perf_counter()
+        existing_words += word.exists_flashcard_for_this_word()
+        durations.append(time.perf_counter() - start_time)
+    return {**summarize_latencies(durations), 'existing_words': existing_words}
+
+
+def _generate_input_lines(sample_words, line_count, random_generator):
+    for line_number in range(line_count):
+        word = sample_words[line_number % len(sample_words)]
+        line_kind = random_generator.random()
+        if line_kind < 0.1:
+            yield f'# comment {line_number}\n'
+        elif line_kind < 0.4:
+            yield f'{word} = translation of {word}\n'
+        elif line_kind < 0.5:
+            yield f'{word} = translation of {word} = {random_generator.choice(OTHER_WORD_TYPES)}\n'
+        else:
+            yield f'{word}\n'
+
+
+def benchmark_parse_line(sample_words, line_count, random_generator):
+    lines = list(_generate_input_lines(sample_words, line_count, random_generator))
+    start_time = time.perf_counter()
+    for line in lines:
+        parse_line(line)
+    total_seconds = time.perf_counter() - start_time
+    return {'lines': line_count,
+            'seconds': total_seconds,
+            'lines_per_second': line_count / total_seconds if total_seconds else None}
+
+
+def benchmark_import(sample_words, scratch_directory, batch_size=50):
+    """
+    Imports a file with the sample words into a new copy of the flashcard database. The translations
+    are invented, so no online service is called.
+    """
+    input_file_path = os.path.join(scratch_directory, 'benchmark_import.txt')
+    output_file_path = os.path.join(scratch_directory, 'benchmark_import.log')
+    with open(input_file_path, 'w') as input_file:
+        input_file.writelines(f'{word}\n' for word in sample_words)
+    with ExitStack() as exit_stack:
+        _replace_attribute(exit_stack, flashcardcreator.main, 'translate_text_to_english',
+                           _translate_without_network)
+        _replace_attribute(exit_stack, flashcardcreator.main, 'translate_texts_with_deepl',
+                           lambda words: {})
+        start_time = time.perf_counter()
+        import_words_from_text_file(input_file_path, output_file_path, batch_size,
+                                    non_interactive=True)
+        total_seconds = time.perf_counter() - start_time
+    with open(output_file_path, 'r') as output_file:
+        error_lines = sum(line.startswith(flashcardcreator.main.ERROR_PREFIX) for line in output_file)
+    return {'lines': len(sample_words),
+            'batch_size': batch_size,
+            'seconds': total_seconds,
+            'lines_per_second': len(sample_words) / total_seconds if total_seconds else None,
+            'error_lines': error_lines}
+
+
+def _read_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(FLASHCARD_DATABASE_TEMPLATE)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _new_flashcard_database(scratch_directory, name):
+    database_file = os.path.join(scratch_directory, name)
+    shutil.copyfile(FLASHCARD_DATABASE_TEMPLATE, database_file)
+    set_flashcard_database(database_file)
+
+
+def run_benchmarks(grammatical_database_file, scratch_directory, index_file=None,
+                   samples=DEFAULT_SAMPLES, parsed_lines=DEFAULT_PARSED_LINES,
+                   imported_lines=DEFAULT_IMPORTED_LINES, seed=0):
+    """
+    Runs all benchmarks against the given grammatical dictionary. The flashcards are written to copies of
+    the flashcard database in the scratch directory.
+
+    :param grammatical_database_file: Required. Real or generated grammatical dictionary
+    :param scratch_directory: Required. Directory for the temporary flashcard databases and files
+    :param index_file: Optional. Index of the derivative forms of the grammatical dictionary
+    :param samples: Number of searches of each benchmark
+    :param parsed_lines: Number of lines parsed by parse_line
+    :param imported_lines: Number of lines of the imported file
+    :param seed: Seed used to choose the words
+    :return: Dictionary with the environment and the results of each benchmark
+    """
+    random_generator = random.Random(seed)
+    sample_words = choose_sample_words(grammatical_database_file, samples, random_generator)
+    sample_rows = choose_sample_rows(grammatical_database_file, samples, random_generator)
+    results = {}
+    try:
+        with use_grammatical_database(grammatical_database_file, index_file) as form_index:
+            _new_flashcard_database(scratch_directory, 'benchmark_flashcards.sqlite')
+            logger.info('Measuring the search of words')
+            results['find_word'] = {**benchmark_find_word(sample_words),
+                                    'uses_form_index': form_index is not None}
+            logger.info('Measuring the search of derivative forms')
+            results['find_all_derivative_forms'] = benchmark_derivative_forms(
+                [word_id for word_id, _, _, _, _ in sample_rows])
+            logger.info('Measuring the check of existing flashcards')
+            results['exists_flashcard_for_this_word'] = benchmark_exists_flashcard(sample_rows)
+            logger.info('Measuring the parsing of lines')
+            results['parse_line'] = benchmark_parse_line(sample_words, parsed_lines,
+                                                         random_generator)
+            logger.info('Measuring the import of a file')
+            _new_flashcard_database(scratch_directory, 'benchmark_import.sqlite')
+            results['import_words_from_text_file'] = benchmark_import(
+                list(dict.fromkeys(sample_words))[:imported_lines], scratch_directory)
+    finally:
+        close_flashcard_database()
+    return {'format_version': BENCHMARK_RESULTS_FORMAT_VERSION,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': _read_git_commit(),
+            'python_version': platform.python_version(),
+            'sqlite_version': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'grammatical_database': os.path.abspath(grammatical_database_file),
+            'samples': samples,
+            'seed': seed,
+            'results': results}
+
+
+def _flatten_metrics(results, prefix=''):
+    for name, value in results.items():
+        if isinstance(value, dict):
+            yield from _flatten_metrics(value, f'{prefix}{name}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f'{prefix}{name}', value
+
+
+def compare_benchmark_results(previous_results, current_results):
+    """
+    Compares the metrics of two runs
+
+    :return: List of tuples (metric, previous value, current value, change in percent). The change is None
+        if the previous value was 0
+    """
+    previous_metrics = dict(_flatten_metrics(previous_results['results']))
+    compared_metrics = []
+    for metric, current_value in _flatten_metrics(current_results['results']):
+        if metric not in previous_metrics:
+            continue
+        previous_value = previous_metrics[metric]
+        change = (current_value - previous_value) * 100 / previous_value if previous_value else None
+        compared_metrics.append((metric, previous_value, current_value, change))
+    return compared_metrics
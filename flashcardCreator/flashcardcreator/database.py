@@ -18,58 +18,338 @@
 
 # Methods to access the database
 
-import sqlite3
+import re
 import logging
+from contextlib import contextmanager
+
+import flashcardcreator.sqltracing
+from flashcardcreator.migrations import apply_migrations
+from flashcardcreator.profiling import profiled
 from flashcardcreator.util import convert_to_absolute_path
 
 SQL_INSERT_OTHER_WORD = '''
     insert into otherWordTypes (word, meaningInEnglish, type, externalWordId)
     values (:word, :meaningInEnglish, :type, :externalWordId);
     '''
+SQL_INSERT_NOUN = '''
+    insert into nouns (noun, meaningInEnglish, genderAbrev, irregularPluralEnding, irregularDefiniteArticle,
+               countableEnding, irregularPluralWithArticle,
+               externalWordId)
+    values (:noun, :meaningInEnglish, :genderAbrev, :irregularPluralEnding, :irregularDefiniteArticle,
+               :countableEnding, :irregularPluralWithArticle,
+               :externalWordId);
+    '''
+SQL_FIND_VERB_PAIR = '''
+    SELECT 1
+    FROM verbsPairs
+    WHERE terminativeVerb = ?
+    AND imperfectVerb = ?;
+    '''
+SQL_INSERT_ADJECTIVE = '''
+    insert into adjetives (masculineForm, meaningInEnglish, femenineForm, neutralForm, pluralForm, masculineFormDefinitive, externalWordId)
+    values (:masculineForm, :meaningInEnglish, :femenineForm, :neutralForm, :pluralForm, :masculine_definite, :externalWordId);
+    '''
+# The connection to the flashcard database is kept open during the whole session.
+# WAL with synchronous NORMAL avoids one fsync for every commit.
+FLASHCARD_DATABASE_PRAGMAS = (
+    'PRAGMA journal_mode = WAL;',
+    'PRAGMA synchronous = NORMAL;',
+    'PRAGMA temp_store = MEMORY;',
+    'PRAGMA cache_size = -16000;'
+)
+# Tables with this number of rows must not be read completely by the frequent statements
+LARGE_TABLE_ROWS = 10000
+# Number of prepared statements which are kept by the connection
+STATEMENT_CACHE_SIZE = 256
+# Words and IDs of the grammatical dictionary which have flashcards. It is loaded into the existence index
+SQL_FIND_ALL_HEADWORDS_AND_EXTERNAL_IDS = '''
+    select masculineForm, externalWordId from adjetives
+    union all
+    select noun, externalWordId from nouns
+    union all
+    select word, externalWordId from otherWordTypes
+    union all
+    select presentSingular1, externalWordId from verbMeanings;
+    '''
 
 logger = logging.getLogger(__name__)
 
 
 def return_rows_of_sql_statement(database_file, sql_statement: str,
                                  params):
-    with sqlite3.connect(database_file) as db_connection:
+    with flashcardcreator.sqltracing.connect(database_file) as db_connection:
         db_cursor = db_connection.cursor()
         db_cursor.execute(sql_statement, params)
         return db_cursor.fetchall()
 
 
-def insert_noun(database_file, noun_fields):
-    logger.info(
-        f'Adding a flashcard for the noun with the fields: {noun_fields}')
-    with sqlite3.connect(database_file) as db_connection:
-        db_cursor = db_connection.cursor()
-        db_cursor.execute('''
-        insert into nouns (noun, meaningInEnglish, genderAbrev, irregularPluralEnding, irregularDefiniteArticle,
-                   countableEnding, irregularPluralWithArticle,
-                   externalWordId)
-        values (:noun, :meaningInEnglish, :genderAbrev, :irregularPluralEnding, :irregularDefiniteArticle,
-                   :countableEnding, :irregularPluralWithArticle,
-                   :externalWordId);
-        ''', noun_fields)
-        db_connection.commit()
+def find_full_table_scans(database_file, sql_statement: str, params):
+    """
+    Returns the steps of the query plan which read a whole table or index instead of searching with an index.
+
+    :param database_file: Required. Database where the statement runs
+    :param sql_statement: Required. Statement to explain
+    :param params: Required. Parameters of the statement
+    :return: List with the details of the full scans. Empty if all tables are searched using indexes
+    """
+    query_plan = return_rows_of_sql_statement(database_file,
+                                              f'EXPLAIN QUERY PLAN {sql_statement}',
+                                              params)
+    return [detail for _, _, _, detail in query_plan
+            if detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW']
+
+
+def find_large_table_scans(database_file, sql_statement: str, params,
+                           minimum_rows=LARGE_TABLE_ROWS):
+    """
+    Returns the full scans of the query plan which read tables with many rows. The scans of small tables
+    like word_type are cheap and ignored.
+
+    :param database_file: Required. Database where the statement runs
+    :param sql_statement: Required. Statement to explain
+    :param params: Required. Parameters of the statement
+    :param minimum_rows: Tables with less rows are ignored
+    :return: List with the details of the scans of large tables
+    """
+    # The query plan names the tables by their aliases
+    table_names = {alias.lower(): table_name for table_name, alias in
+                   re.findall(r'\b(?:from|join)\s+(\w+)\s+(?:as\s+)?(\w+)',
+                              sql_statement, re.IGNORECASE)}
+    large_table_scans = []
+    for detail in find_full_table_scans(database_file, sql_statement, params):
+        scanned_name = detail.split()[1]
+        table_name = table_names.get(scanned_name.lower(), scanned_name)
+        (row_count,), = return_rows_of_sql_statement(
+            database_file,
+            f'select count(1) from (select 1 from "{table_name}" limit ?);',
+            (minimum_rows,))
+        if row_count >= minimum_rows:
+            large_table_scans.append(f'{detail} ({table_name} has at least {row_count} rows)')
+    return large_table_scans
+
+
+class FlashcardStore:
+    """
+    Session with the flashcard database. It owns one connection which is kept open until close is called,
+    so the connection is not opened and closed again for every word.
+    The transactions are managed explicitly. Nested transactions are implemented with savepoints.
+    """
+
+
+    def __init__(self, database_file):
+        self._database_file = database_file
+        # The transactions are started explicitly by the method transaction
+        self._connection = flashcardcreator.sqltracing.connect(
+            database_file, isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma_statement in FLASHCARD_DATABASE_PRAGMAS:
+            self._connection.execute(pragma_statement)
+        self._savepoint_counter = 0
+        # Headwords and external word IDs with flashcards. They are loaded with the first search
+        self._existing_headwords = None
+        self._existing_external_word_ids = None
+        # One list per open transaction and savepoint with the entries added to the existence index.
+        # They are removed again if the transaction or savepoint is rolled back
+        self._existence_index_undo_logs = []
+        logger.debug(f'The flashcard database {database_file} was opened')
+
+
+    @property
+    def database_file(self):
+        return self._database_file
+
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+
+    def migrate(self):
+        """
+        Updates the schema of the database to the latest version
+        :return: Number of applied migrations
+        """
+        if self._connection.in_transaction:
+            raise ValueError('The flashcard database can not be migrated inside a transaction')
+        return apply_migrations(self._connection)
+
+
+    def close(self):
+        if self._connection is None:
+            return
+        if self._connection.in_transaction:
+            logger.warning(
+                'The flashcard database was closed with an open transaction. It will be rolled back')
+            self._connection.rollback()
+        self._connection.close()
+        self._connection = None
+        logger.debug(f'The flashcard database {self._database_file} was closed')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Runs the statements of the with block in one transaction and returns a cursor.
+        If a transaction is already open, a savepoint is used and only the statements of the block are
+        rolled back if there is an exception.
+        :param immediate: If True, a new transaction locks the database for writing at the start
+        """
+        db_cursor = self._connection.cursor()
+        if self._connection.in_transaction:
+            self._savepoint_counter += 1
+            savepoint_name = f'flashcard_savepoint_{self._savepoint_counter}'
+            db_cursor.execute(f'SAVEPOINT {savepoint_name};')
+            self._existence_index_undo_logs.append([])
+            try:
+                yield db_cursor
+            except BaseException:
+                db_cursor.execute(f'ROLLBACK TO SAVEPOINT {savepoint_name};')
+                db_cursor.execute(f'RELEASE SAVEPOINT {savepoint_name};')
+                self._undo_existence_index_entries(
+                    self._existence_index_undo_logs.pop())
+                raise
+            db_cursor.execute(f'RELEASE SAVEPOINT {savepoint_name};')
+            savepoint_undo_log = self._existence_index_undo_logs.pop()
+            if self._existence_index_undo_logs:
+                self._existence_index_undo_logs[-1].extend(savepoint_undo_log)
+        else:
+            self.begin(immediate)
+            try:
+                yield db_cursor
+            except BaseException:
+                self.rollback()
+                raise
+            self.commit()
+
+
+    def begin(self, immediate=False):
+        """
+        Starts a transaction which is kept open until commit or rollback is called.
+        :param immediate: If True, other connections can't write until the transaction ends
+        """
+        self._connection.execute('BEGIN IMMEDIATE;' if immediate else 'BEGIN;')
+        self._existence_index_undo_logs = [[]]
+
+
+    def commit(self):
+        self._connection.commit()
+        self._existence_index_undo_logs = []
+
+
+    def rollback(self):
+        self._connection.rollback()
+        for undo_log in reversed(self._existence_index_undo_logs):
+            self._undo_existence_index_entries(undo_log)
+        self._existence_index_undo_logs = []
+
+
+    def load_existence_index(self):
+        """
+        Loads the words with flashcards into memory. It must be called in the thread of the connection
+        before other threads call exists_flashcard.
+        """
+        if self._existing_headwords is not None:
+            return
+        self._existing_headwords = set()
+        self._existing_external_word_ids = set()
+        for headword, external_word_id in self._connection.execute(
+                SQL_FIND_ALL_HEADWORDS_AND_EXTERNAL_IDS):
+            self._existing_headwords.add(headword)
+            if external_word_id is not None:
+                self._existing_external_word_ids.add(str(external_word_id))
+        logger.debug(
+            f'The existence index was loaded with {len(self._existing_headwords)} words')
+
+
+    def _undo_existence_index_entries(self, undo_log):
+        for index_entries, entry in undo_log:
+            index_entries.discard(entry)
+
+
+    def exists_flashcard(self, headword, external_word_id=None):
+        """
+        Checks in memory if there are flashcards for the word in the nouns, adjectives, verbs or other words.
+
+        :param headword: Required. Word as stored in the flashcards
+        :param external_word_id: Optional. ID of the word in the grammatical dictionary
+        :return: True if the headword or the ID were found
+        """
+        self.load_existence_index()
+        return headword in self._existing_headwords or (
+                external_word_id is not None and
+                str(external_word_id) in self._existing_external_word_ids)
+
+
+    def register_flashcard(self, headword, external_word_id=None):
+        """
+        Adds a word to the existence index. It must be called inside the transaction which inserts the word,
+        so the word is removed again if the transaction is rolled back.
+
+        :param headword: Required. Word as stored in the flashcards
+        :param external_word_id: Optional. ID of the word in the grammatical dictionary
+        """
+        self.load_existence_index()
+        undo_log = self._existence_index_undo_logs[-1] if self._existence_index_undo_logs else []
+        index_entries_to_add = [(self._existing_headwords, headword)]
+        if external_word_id is not None:
+            index_entries_to_add.append(
+                (self._existing_external_word_ids, str(external_word_id)))
+        for index_entries, entry in index_entries_to_add:
+            if entry not in index_entries:
+                index_entries.add(entry)
+                undo_log.append((index_entries, entry))
+
+
+    def return_rows_of_sql_statement(self, sql_statement: str, params):
+        db_cursor = self._connection.execute(sql_statement, params)
+        return db_cursor.fetchall()
+
+
+    @profiled('database.insert_noun')
+    def insert_noun(self, noun_fields):
+        logger.info(
+            f'Adding a flashcard for the noun with the fields: {noun_fields}')
+        with self.transaction() as db_cursor:
+            self.register_flashcard(noun_fields['noun'],
+                                    noun_fields['externalWordId'])
+            db_cursor.execute(SQL_INSERT_NOUN, noun_fields)
         logger.info(
             f'The noun {noun_fields["noun"]} was added to the flashcard database')
 
 
-def insert_adjective(database_file, adjective_fields):
-    logger.info(
-        f'Adding a flashcard for the adjective with the fields: {adjective_fields}')
-    with sqlite3.connect(database_file) as db_connection:
-        db_cursor = db_connection.cursor()
-        db_cursor.execute('''
-        insert into adjetives (masculineForm, meaningInEnglish, femenineForm, neutralForm, pluralForm, masculineFormDefinitive, externalWordId)
-        values (:masculineForm, :meaningInEnglish, :femenineForm, :neutralForm, :pluralForm, :masculine_definite, :externalWordId);
-        ''', adjective_fields)
-        db_connection.commit()
+    @profiled('database.insert_adjective')
+    def insert_adjective(self, adjective_fields):
+        logger.info(
+            f'Adding a flashcard for the adjective with the fields: {adjective_fields}')
+        with self.transaction() as db_cursor:
+            self.register_flashcard(adjective_fields['masculineForm'],
+                                    adjective_fields['externalWordId'])
+            db_cursor.execute(SQL_INSERT_ADJECTIVE, adjective_fields)
         logger.info(
             f'The adjective {adjective_fields["masculineForm"]} was added to the flashcard database')
 
 
+    @profiled('database.insert_other_word_type')
+    def insert_other_word_type(self, word_fields):
+        logger.info(
+            f'Adding a flashcard for the other word with the fields: {word_fields}')
+        with self.transaction() as db_cursor:
+            self.register_flashcard(word_fields['word'],
+                                    word_fields['externalWordId'])
+            insert_other_word_type_with_cursor(db_cursor, word_fields)
+        logger.info(
+            f'The word {word_fields["word"]} was added to the flashcard database')
+
+
+@profiled('database.insert_verb_meaning')
 def insert_verb_meaning_with_cursor(db_cursor, meaning_in_english,
                                     external_word_id,
                                     present_singular1):
@@ -89,6 +369,7 @@ def insert_other_word_type_with_cursor(db_cursor, word_fields):
         word_fields)
 
 
+@profiled('database.insert_participles')
 def insert_participles_with_cursor(db_cursor, verb_participles,
                                    final_translation, word_id):
     unique_verb_participles = {}
@@ -111,6 +392,7 @@ def insert_participles_with_cursor(db_cursor, verb_participles,
         insert_other_word_type_with_cursor(db_cursor, word_fields)
 
 
+@profiled('database.insert_verb_tense')
 def insert_verb_tense_with_cursor(db_cursor, present_singular1, tense,
                                   imperfect,
                                   singular1, singular2, plural3, plural2=None):
@@ -126,17 +408,6 @@ def insert_verb_tense_with_cursor(db_cursor, present_singular1, tense,
         f'The tense {tense} of the verb {present_singular1} was added to the flashcard database')
 
 
-def insert_other_word_type(database_file, word_fields):
-    logger.info(
-        f'Adding a flashcard for the other word with the fields: {word_fields}')
-    with sqlite3.connect(database_file) as db_connection:
-        db_cursor = db_connection.cursor()
-        insert_other_word_type_with_cursor(db_cursor, word_fields)
-        db_connection.commit()
-        logger.info(
-            f'The word {word_fields["word"]} was added to the flashcard database')
-
-
 def verb_pair_not_exists(db_cursor, terminative_verb, imperfective_verb):
     """
     Returns if the given verb pair already exists.
@@ -147,15 +418,12 @@ def verb_pair_not_exists(db_cursor, terminative_verb, imperfective_verb):
     :param imperfective_verb: Required.  Verb's root word
     :return: True or False
     """
-    db_cursor.execute('''
-        SELECT 1
-        FROM verbsPairs
-        WHERE terminativeVerb = ?
-        AND imperfectVerb = ?;
-    ''', (terminative_verb, imperfective_verb))
+    db_cursor.execute(SQL_FIND_VERB_PAIR,
+                      (terminative_verb, imperfective_verb))
     return db_cursor.fetchone() is None
 
 
+@profiled('database.insert_verb_pair')
 def verb_pair_insert(db_cursor, terminative_verb, imperfective_verb):
     logger.info(
         f'Adding a verb pair with terminative verb {terminative_verb} and imperfective verb {imperfective_verb}')
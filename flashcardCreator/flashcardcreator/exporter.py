@@ -0,0 +1,131 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Exports the pending flashcards to files which can be imported in Anki and marks them as exported
+
+import csv
+import logging
+import os
+import tempfile
+from datetime import date
+
+from flashcardcreator.database import FlashcardStore
+from flashcardcreator.migrations import EXPORT_CARD_SOURCE_TABLES, \
+    export_card_key_expression
+
+# Number of cards read from the database at once, so the memory used doesn't depend on the size of the deck
+EXPORT_CHUNK_SIZE = 1000
+WRITE_ANSWER_VIEW = 'ankiWebCardsWriteAnswer'
+READ_ANSWER_VIEW = 'ankiWebCardsReadAnswer'
+# Headers understood by the importer of Anki
+ANKI_FILE_HEADERS = ('#separator:tab', '#html:false', '#tags column:3')
+
+logger = logging.getLogger(__name__)
+
+
+def get_read_answer_file_path(write_answer_file_path):
+    """
+    Returns the file for the cards where the answer is only read, next to the file of the other cards
+    """
+    file_root, file_extension = os.path.splitext(write_answer_file_path)
+    return f'{file_root}-read{file_extension or ".tsv"}'
+
+
+def _write_cards_of_view(db_cursor, view, target_file, chunk_size):
+    """
+    Writes the pending cards of the view in chunks
+    :return: Number of written cards
+    """
+    writer = csv.writer(target_file, delimiter='\t', lineterminator='\n')
+    for header in ANKI_FILE_HEADERS:
+        target_file.write(f'{header}\n')
+    written_cards = 0
+    db_cursor.execute(f'select front, back, tags from {view};')
+    while True:
+        cards = db_cursor.fetchmany(chunk_size)
+        if not cards:
+            break
+        # The tags of Anki are separated by spaces
+        writer.writerows((front, back, ' '.join(filter(None, (tags or '').split(','))))
+                         for front, back, tags in cards)
+        written_cards += len(cards)
+    return written_cards
+
+
+def _mark_cards_as_exported(db_cursor, export_date):
+    """
+    Sets the export date of the rows which have pending cards with one update per table
+    :return: Number of updated rows
+    """
+    updated_rows = 0
+    for source_table in EXPORT_CARD_SOURCE_TABLES:
+        updated_rows += db_cursor.execute(f'''
+            update {source_table} as s set flashcardExportDate = ?
+            where s.flashcardExportDate is null
+            and {export_card_key_expression(source_table, 's')} in (
+                select sourceKey from exportCards
+                where sourceTable = ? and flashcardExportDate is null);
+            ''', (export_date, source_table)).rowcount
+    return updated_rows
+
+
+def export_pending_cards(store: FlashcardStore, write_answer_file_path,
+                         read_answer_file_path=None, export_date=None,
+                         chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Writes the cards which weren't exported yet to tab separated files which can be imported in Anki and
+    sets their export date. The files are only replaced if all cards were written and everything runs in one
+    transaction, so the exported rows are exactly the rows which are marked.
+
+    :param store: Required. Migrated flashcard database
+    :param write_answer_file_path: Required. File for the cards of the view ankiWebCardsWriteAnswer
+    :param read_answer_file_path: Optional. File for the cards of the view ankiWebCardsReadAnswer
+    :param export_date: Optional. Date stored in flashcardExportDate. Today by default
+    :param chunk_size: Optional. Number of cards read at once
+    :return: Tuple with the number of exported write answer cards, read answer cards and marked rows
+    """
+    if read_answer_file_path is None:
+        read_answer_file_path = get_read_answer_file_path(write_answer_file_path)
+    if export_date is None:
+        export_date = date.today().isoformat()
+    exported_cards = []
+    temporary_files = []
+    try:
+        # No other connection can change the pending cards until they are marked
+        with store.transaction(immediate=True) as db_cursor:
+            for view, file_path in ((WRITE_ANSWER_VIEW, write_answer_file_path),
+                                    (READ_ANSWER_VIEW, read_answer_file_path)):
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='',
+                                                 dir=os.path.dirname(os.path.abspath(file_path)),
+                                                 suffix='.part', delete=False) as temporary_file:
+                    temporary_files.append((temporary_file.name, file_path))
+                    exported_cards.append(_write_cards_of_view(db_cursor, view, temporary_file,
+                                                               chunk_size))
+                    temporary_file.flush()
+                    os.fsync(temporary_file.fileno())
+            marked_rows = _mark_cards_as_exported(db_cursor, export_date)
+            for (temporary_file_path, file_path), card_count in zip(temporary_files, exported_cards):
+                if card_count:
+                    os.replace(temporary_file_path, file_path)
+    finally:
+        for temporary_file_path, _ in temporary_files:
+            if os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
+    logger.info(f'{exported_cards[0]} cards were exported to {write_answer_file_path} and '
+                f'{exported_cards[1]} cards to {read_answer_file_path}. {marked_rows} rows were marked as exported')
+    return exported_cards[0], exported_cards[1], marked_rows
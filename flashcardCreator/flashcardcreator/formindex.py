@@ -0,0 +1,291 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Precomputed index of the grammatical dictionary which finds the base words of a derivative form without
+# running SQL statements. The file is memory-mapped, so it is shared by all processes using it.
+#
+# Layout of the file. All numbers are little endian:
+#   header
+#   key table: sorted derivative forms, each one with its slice of the postings
+#   postings: positions of the base words in the word table
+#   word table: id, type id, name, speech part and meaning of every base word
+#   strings: UTF-8 encoded texts referenced by the keys and the words
+
+import logging
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+
+from flashcardcreator.util import convert_to_absolute_path
+
+FORM_INDEX_LOCAL_FILENAME = convert_to_absolute_path(
+    'data/grammatical_dictionary.formindex')
+FORM_INDEX_MAGIC = b'BGFORMS1'
+# magic, key count, word count, offsets of the sections and the size and modification time of the database
+_HEADER = struct.Struct('<8sIIQQQQQq')
+# string offset, string length, first posting, posting count
+_KEY = struct.Struct('<QIII')
+_POSTING = struct.Struct('<I')
+# word id, type id and offset and length of the name, speech part and meaning. A meaning length of -1 is NULL
+_WORD = struct.Struct('<IIQIQIQi')
+
+# Same rows as the search of WordFinder: the words of the derivative forms and the words without derivative forms
+SQL_FIND_ALL_BASE_WORDS = '''
+    SELECT w.id, w.name, w.type_id, wt.speech_part, w.meaning
+    FROM word as w
+        join word_type as wt
+        on w.type_id = wt.id
+    ORDER BY w.id;
+    '''
+SQL_FIND_ALL_FORMS_ORDERED = '''
+        SELECT df.name, df.base_word_id
+        FROM derivative_form as df
+        WHERE df.name IS NOT NULL
+    UNION
+        SELECT w.name, w.id
+        FROM word as w
+        WHERE w.name IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM derivative_form as df WHERE df.base_word_id = w.id)
+    ORDER BY 1, 2;
+    '''
+
+logger = logging.getLogger(__name__)
+
+
+def _database_signature(database_file):
+    database_stat = os.stat(database_file)
+    return database_stat.st_size, database_stat.st_mtime_ns
+
+
+class _StringWriter:
+    """
+    Appends UTF-8 texts to a file and returns their positions
+    """
+
+
+    def __init__(self, target_file):
+        self._target_file = target_file
+        self._size = 0
+
+
+    def write(self, text):
+        if text is None:
+            return 0, -1
+        encoded_text = text.encode('utf-8')
+        offset = self._size
+        self._target_file.write(encoded_text)
+        self._size += len(encoded_text)
+        return offset, len(encoded_text)
+
+
+def build_form_index(database_file, index_file=FORM_INDEX_LOCAL_FILENAME):
+    """
+    Creates the index file from the grammatical dictionary. The file is replaced at the end, so readers
+    never see a partially written index.
+
+    :param database_file: Required. Grammatical dictionary
+    :param index_file: Optional. File to create
+    :return: Number of derivative forms in the index
+    """
+    source_size, source_mtime_ns = _database_signature(database_file)
+    with sqlite3.connect(database_file) as db_connection, \
+            tempfile.TemporaryFile() as keys_file, \
+            tempfile.TemporaryFile() as postings_file, \
+            tempfile.TemporaryFile() as words_file, \
+            tempfile.TemporaryFile() as strings_file:
+        strings = _StringWriter(strings_file)
+        speech_part_positions = {}
+        word_positions = {}
+        for word_id, name, type_id, speech_part, meaning in db_connection.execute(
+                SQL_FIND_ALL_BASE_WORDS):
+            if speech_part not in speech_part_positions:
+                speech_part_positions[speech_part] = strings.write(speech_part)
+            words_file.write(_WORD.pack(word_id, type_id, *strings.write(name),
+                                        *speech_part_positions[speech_part],
+                                        *strings.write(meaning)))
+            word_positions[word_id] = len(word_positions)
+
+        key_count = 0
+        posting_count = 0
+        current_form = None
+        current_postings = []
+
+        def write_key():
+            nonlocal key_count, posting_count
+            if not current_postings:
+                return
+            keys_file.write(_KEY.pack(*strings.write(current_form),
+                                      posting_count, len(current_postings)))
+            for word_position in current_postings:
+                postings_file.write(_POSTING.pack(word_position))
+            key_count += 1
+            posting_count += len(current_postings)
+
+        # The rows are sorted with the binary collation of SQLite, which is the order of the UTF-8 bytes
+        for form, base_word_id in db_connection.execute(SQL_FIND_ALL_FORMS_ORDERED):
+            if form != current_form:
+                if current_form is not None and form.encode('utf-8') < current_form.encode('utf-8'):
+                    raise ValueError(f'The forms of {database_file} are not sorted by their UTF-8 bytes')
+                write_key()
+                current_form = form
+                current_postings = []
+            if base_word_id in word_positions:
+                current_postings.append(word_positions[base_word_id])
+        write_key()
+
+        key_table_offset = _HEADER.size
+        postings_offset = key_table_offset + keys_file.tell()
+        words_offset = postings_offset + postings_file.tell()
+        strings_offset = words_offset + words_file.tell()
+        index_directory = os.path.dirname(os.path.abspath(index_file))
+        with tempfile.NamedTemporaryFile(dir=index_directory, suffix='.part',
+                                         delete=False) as temporary_index_file:
+            try:
+                temporary_index_file.write(_HEADER.pack(
+                    FORM_INDEX_MAGIC, key_count, len(word_positions),
+                    key_table_offset, postings_offset, words_offset,
+                    strings_offset, source_size, source_mtime_ns))
+                for section_file in (keys_file, postings_file, words_file,
+                                     strings_file):
+                    section_file.seek(0)
+                    shutil.copyfileobj(section_file, temporary_index_file)
+                temporary_index_file.flush()
+                os.fsync(temporary_index_file.fileno())
+            except BaseException:
+                temporary_index_file.close()
+                os.remove(temporary_index_file.name)
+                raise
+        os.replace(temporary_index_file.name, index_file)
+    logger.info(f'The form index {index_file} was created with {key_count} forms')
+    return key_count
+
+
+class FormIndex:
+    """
+    Read only view of an index file created by build_form_index
+    """
+
+
+    def __init__(self, index_file=FORM_INDEX_LOCAL_FILENAME):
+        with open(index_file, 'rb') as opened_file:
+            self._buffer = mmap.mmap(opened_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        magic, self._key_count, self._word_count, self._key_table_offset, \
+            self._postings_offset, self._words_offset, self._strings_offset, \
+            self._source_size, self._source_mtime_ns = _HEADER.unpack_from(
+                self._buffer, 0)
+        if magic != FORM_INDEX_MAGIC:
+            self.close()
+            raise ValueError(f'{index_file} is not a form index')
+
+
+    def close(self):
+        self._buffer.close()
+
+
+    def __len__(self):
+        return self._key_count
+
+
+    def is_fresh_for(self, database_file):
+        """
+        :return: True if the index was created from the current version of the database
+        """
+        return (self._source_size, self._source_mtime_ns) == _database_signature(
+            database_file)
+
+
+    def _read_string(self, offset, length):
+        if length < 0:
+            return None
+        start = self._strings_offset + offset
+        return self._buffer[start:start + length].decode('utf-8')
+
+
+    def _read_key(self, key_position):
+        offset, length, first_posting, posting_count = _KEY.unpack_from(
+            self._buffer, self._key_table_offset + key_position * _KEY.size)
+        start = self._strings_offset + offset
+        return self._buffer[start:start + length], first_posting, posting_count
+
+
+    def _read_word(self, word_position):
+        word_id, type_id, name_offset, name_length, speech_part_offset, \
+            speech_part_length, meaning_offset, meaning_length = _WORD.unpack_from(
+                self._buffer, self._words_offset + word_position * _WORD.size)
+        return (word_id, self._read_string(name_offset, name_length), type_id,
+                self._read_string(speech_part_offset, speech_part_length),
+                self._read_string(meaning_offset, meaning_length))
+
+
+    def _find_word_positions(self, form: str):
+        encoded_form = form.encode('utf-8')
+        low, high = 0, self._key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._read_key(middle)[0] < encoded_form:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._key_count:
+            return []
+        found_form, first_posting, posting_count = self._read_key(low)
+        if found_form != encoded_form:
+            return []
+        postings_start = self._postings_offset + first_posting * _POSTING.size
+        return [word_position for word_position, in _POSTING.iter_unpack(
+            self._buffer[postings_start:postings_start + posting_count * _POSTING.size])]
+
+
+    def find(self, *forms):
+        """
+        Searches the base words of the given derivative forms. Words without derivative forms are
+        found by their name.
+        :return: List of tuples (word_id, root_word, word_type_id, speech_part, word_meaning) sorted by word id
+        """
+        word_positions = set()
+        for form in forms:
+            word_positions.update(self._find_word_positions(form))
+        # The word table is sorted by the word id
+        return [self._read_word(word_position) for word_position in
+                sorted(word_positions)]
+
+
+def open_form_index(database_file, index_file=FORM_INDEX_LOCAL_FILENAME):
+    """
+    Opens the index if it exists and was created from the given database
+    :return: FormIndex or None if it can't be used
+    """
+    if not os.path.exists(index_file) or not os.path.exists(database_file):
+        return None
+    try:
+        form_index = FormIndex(index_file)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"The form index {index_file} couldn't be opened: {e}")
+        return None
+    if not form_index.is_fresh_for(database_file):
+        logger.warning(
+            f'The form index {index_file} is older than the grammatical dictionary. '
+            f'Please run installGrammaticalDictionary.py')
+        form_index.close()
+        return None
+    logger.debug(f'The form index {index_file} was opened')
+    return form_index
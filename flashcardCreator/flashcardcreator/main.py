@@ -19,31 +19,72 @@
 import configparser
 # Contains the main classes
 import logging
+import os
+import queue
 import re
 import sqlite3
+import threading
 import unicodedata
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
 
 import yaml
 
+import flashcardcreator.database
 import flashcardcreator.userinput
 from flashcardcreator.affix import \
     calculate_derivative_forms_with_english_field_names, \
-    calculate_derivative_forms_from_verb, filter_verb_participles
-from flashcardcreator.database import insert_noun, insert_adjective, \
-    insert_other_word_type, \
-    return_rows_of_sql_statement, GRAMMATICAL_DATABASE_LOCAL_FILENAME, \
+    calculate_derivative_forms_from_verb, filter_verb_participles, \
+    prefetch_derivative_forms, SQL_FIND_ALL_DERIVATIVE_FORMS, \
+    format_prefetch_derivative_forms_statement
+from flashcardcreator.database import FlashcardStore, \
+    GRAMMATICAL_DATABASE_LOCAL_FILENAME, find_full_table_scans, \
+    find_large_table_scans, LARGE_TABLE_ROWS, \
     insert_participles_with_cursor, \
     insert_verb_meaning_with_cursor, insert_verb_tense_with_cursor, \
     verb_pair_not_exists, verb_pair_insert
-from flashcardcreator.translator import translate_text_to_english
+from flashcardcreator.formindex import FormIndex, open_form_index
+from flashcardcreator.profiling import profiled
+from flashcardcreator.resolution import InteractiveResolver, \
+    NonInteractiveResolver, ReviewRequired
+from flashcardcreator.translationcache import normalize_word_for_cache
+from flashcardcreator.translator import translate_text_to_english, \
+    translate_texts_with_deepl
 from flashcardcreator.util import OTHER_WORD_TYPES, EXPRESSION_WORD_TYPE
 
 ERROR_PREFIX = "# ERROR: "
 WARNING_PREFIX = "# INFO: "
 INFO_PREFIX = "# INFO: "
 CONFIG_FILENAME = 'configuration.ini'
+# Number of lines of the input file which are searched and translated in advance
+DEFAULT_PREFETCH_LINES = 8
+PREFETCH_TRANSLATION_WORKERS = 4
+_END_OF_PREFETCHED_LINES = object()
+SQL_FIND_CANDIDATE_ROWS = '''
+        SELECT DISTINCT w.id, w.name, w.type_id, wt.speech_part, w.meaning
+        FROM derivative_form as df
+            join word as w
+            on w.id = df.base_word_id
+            join word_type as wt
+            on w.type_id = wt.id
+        where df.name in (:word_to_search, :word_to_search_like_name)
+    UNION
+        SELECT DISTINCT w.id, w.name, w.type_id, wt.speech_part, w.meaning
+        FROM word as w
+            join word_type as wt
+            on w.type_id = wt.id
+        WHERE w.name in (:word_to_search, :word_to_search_like_name)
+        AND NOT EXISTS (SELECT 1 FROM derivative_form as df WHERE df.base_word_id = w.id);
+    '''
+# Statements which run for every imported word with example parameters. The existence of flashcards
+# is checked in memory, so only the grammatical dictionary is searched for every word
+GRAMMATICAL_DICTIONARY_HOT_STATEMENTS = (
+    (SQL_FIND_CANDIDATE_ROWS, {'word_to_search': '',
+                               'word_to_search_like_name': ''}),
+    (SQL_FIND_ALL_DERIVATIVE_FORMS, {'base_word_id': 0}),
+    (format_prefetch_derivative_forms_statement(2), (0, 1)))
 
 CYRILLIC_LETTERS_LOWER_UPPER_CASE_PAIRS = [
     ('а', 'А'),
@@ -79,14 +120,21 @@ CYRILLIC_LETTERS_LOWER_UPPER_CASE_PAIRS = [
 ]
 
 logger = logging.getLogger(__name__)
-# Location of the flashcard which can be given by the user
-flashcard_database = None
+# Session with the flashcard database which can be given by the user
+flashcard_store: FlashcardStore = None
+# Takes the decisions which are asked to the user during the import
+word_resolver = InteractiveResolver()
+# Index of the derivative forms. It is opened with the first search
+_form_index: FormIndex = None
+_form_index_was_opened = False
+_form_index_lock = threading.Lock()
 main_debug = False
 config = configparser.ConfigParser(interpolation=None)
 config.read(CONFIG_FILENAME)
 
 
-def _insert_verb(database_file, derivative_forms_to_study, root_word,
+@profiled('database.insert_verb')
+def _insert_verb(store, derivative_forms_to_study, root_word,
                  final_translation, word_id, is_terminative,
                  linked_verb_present_singular1):
     """
@@ -97,16 +145,18 @@ def _insert_verb(database_file, derivative_forms_to_study, root_word,
     :param root_word: Singular first person in present tense
     :param derivative_forms_to_study: All derivative forms which are irregular
     :param final_translation: Translation in English accepted by the use
-    :param database_file: Required.
+    :param store: Required. Session with the flashcard database
     :param linked_verb_present_singular1: Optional. String with the singular in first person in present
     :return:
     """
     logger.info(
         f'Adding a flashcard for the verb {root_word} to all required tables')
-    with sqlite3.connect(database_file) as db_connection:
-        db_cursor = db_connection.cursor()
+    with store.transaction() as db_cursor:
         # Причастия (отглаголни прилагателни)
         verb_participles = filter_verb_participles(derivative_forms_to_study)
+        for participle in verb_participles.values():
+            store.register_flashcard(participle, word_id)
+        store.register_flashcard(root_word, word_id)
         insert_participles_with_cursor(db_cursor, verb_participles,
                                        final_translation, word_id)
 
@@ -188,9 +238,8 @@ def _insert_verb(database_file, derivative_forms_to_study, root_word,
                 verb_pair_insert(db_cursor, terminative_verb,
                                  imperfective_verb)
 
-        db_connection.commit()
-        logger.info(
-            f'The verb {root_word} was added to all required tables')
+    logger.info(
+        f'The verb {root_word} was added to all required tables')
 
 
 class AbstractClassifiedWord(ABC):
@@ -211,29 +260,8 @@ class AbstractClassifiedWord(ABC):
 
         :return: True if the word don't exist
         """
-        word_search_parameters = {
-            'wordToSearch': self._root_word,
-            'wordId': self._word_id
-        }
-        found_flashcards = return_rows_of_sql_statement(
-            flashcard_database, '''
-            select a.masculineForm, a.externalWordId
-            from adjetives as a
-            where a.masculineForm = :wordToSearch or a.externalWordId = :wordId
-            union
-            select n.noun, n.externalWordId
-            from nouns as n
-            where n.noun = :wordToSearch or n.externalWordId = :wordId
-            union
-            select o.word, o.externalWordId
-            from otherWordTypes as o
-            where o.word = :wordToSearch or o.externalWordId = :wordId
-            union
-            select vm.presentSingular1, vm.externalWordId
-            from verbMeanings as vm
-            where vm.presentSingular1 = :wordToSearch or vm.externalWordId = :wordId
-        ''', word_search_parameters)
-
+        found_flashcards = flashcard_store.exists_flashcard(self._root_word,
+                                                            self._word_id)
         if found_flashcards:
             logger.info(
                 f'The word {self._root_word} has already flash cards')
@@ -242,21 +270,29 @@ class AbstractClassifiedWord(ABC):
             return False
 
 
-    def ask_user_for_final_translation(self):
+    def ask_user_for_final_translation(self, prefetched_translation=None,
+                                       deepl_translations=None):
         """
         Uses a translation API to suggest the user a translation and ask him for a corrected translation
+        :param prefetched_translation: Optional. Future with a tuple (word, translation) which was started in the background
+        :param deepl_translations: Optional. Dictionary with the DeepL translations found for the whole file
         :return: True if the final translation was accepted. False if the user wants to exit
         """
         global main_debug
         # Find an automatic translation in English for the word
-        translated_word_original = translate_text_to_english(self._root_word,
-                                                             debug_client_calls=main_debug)
+        translated_word_original = _get_prefetched_translation(
+            prefetched_translation, self._root_word)
+        if translated_word_original is None:
+            translated_word_original = translate_text_to_english(
+                self._root_word, debug_client_calls=main_debug,
+                deepl_translations=(deepl_translations or {}).get(
+                    normalize_word_for_cache(self._root_word)))
 
         logger.info(
             f'The word {self._root_word} translates to "{translated_word_original}" ')
 
         # Ask the user to accept the translation
-        final_translation = flashcardcreator.userinput.ask_user_for_translation(
+        final_translation = word_resolver.confirm_translation(
             self._root_word, translated_word_original)
         if not final_translation:
             logger.info("Exiting because no translation was provided")
@@ -274,9 +310,14 @@ class AbstractClassifiedWord(ABC):
         :return: None
         """
         linked_words = self._get_linked_words()
-        new_words = [WordFinder.find_word_with_english_translation(word, None)
-                     for
-                     word in linked_words]
+        new_words = []
+        for linked_word in linked_words:
+            try:
+                new_words.append(
+                    WordFinder.find_word_with_english_translation(linked_word,
+                                                                  None))
+            except ReviewRequired as e:
+                word_resolver.send_to_review(f'{linked_word}\n', str(e))
         logger.debug(
             f"Creating flashcards for the linked words {new_words}")
         # Remove all Nones from existing words
@@ -285,6 +326,8 @@ class AbstractClassifiedWord(ABC):
                                classifiedWord and not classifiedWord.exists_flashcard_for_this_word()]
         logger.debug(
             f"Creating flashcards for the linked non-existent words {new_words}")
+        prefetch_derivative_forms(
+            [word_to_import._word_id for word_to_import in new_words_to_import])
         for word_to_import in new_words_to_import:
             word_to_import.linked_word = self._root_word
             word_to_import.create_flashcard()
@@ -404,7 +447,7 @@ class Noun(AbstractClassifiedWord):
         if 'contable' in derivative_forms_to_study:
             noun_fields['countableEnding'] = derivative_forms_to_study[
                 'contable']
-        insert_noun(flashcard_database, noun_fields)
+        flashcard_store.insert_noun(noun_fields)
         return True
 
 
@@ -436,7 +479,7 @@ class Adjective(AbstractClassifiedWord):
             adjective_fields['masculine_definite'] = \
                 derivative_forms_to_study[
                     'masculine_definite']
-        insert_adjective(flashcard_database, adjective_fields)
+        flashcard_store.insert_adjective(adjective_fields)
         return True
 
 
@@ -447,7 +490,7 @@ class Verb(AbstractClassifiedWord):
 
 
     def _add_row_to_flashcard_database(self, derivative_forms_to_study):
-        _insert_verb(flashcard_database, derivative_forms_to_study,
+        _insert_verb(flashcard_store, derivative_forms_to_study,
                      self._root_word, self._final_translation,
                      self._word_id, self._is_terminative(), self.linked_word)
 
@@ -484,7 +527,7 @@ class WordWithoutDerivativeForms(AbstractClassifiedWord):
             'type': self._speech_part,
             'externalWordId': self._word_id
         }
-        insert_other_word_type(flashcard_database, word_fields)
+        flashcard_store.insert_other_word_type(word_fields)
         return True
 
 
@@ -531,40 +574,45 @@ class WordFinder:
 
 
     @staticmethod
-    def _find_word(word_to_search: str, other_word_type):
+    @profiled('dictionary.find_word')
+    def find_candidate_rows(word_to_search: str):
         """
-        Normalizes the given word and searches for its word type and derivation rules. Ask
-        the user to confirm the translation in English
-        If multiple words are found, the user will be prompted to choose one.
-        :param other_word_type: Type of the word if it isn't found in the grammar dictionary
-        :return:
-        :rtype: None or a AbstractClassifiedWord
+        Normalizes the given word and searches all the words of the grammatical dictionary
+        which have it as root or derivative form. It doesn't ask the user, so it can run in the background.
+        :param word_to_search: Required. Word as entered by the user
+        :return: List of tuples (word_id, root_word, word_type_id, speech_part, word_meaning)
         """
         # Find what type of word is it together with its writing rules
         word_without_accents = WordFinder._trim_lower_case_remove_accents(
             word_to_search)
         word_like_a_name = first_cyrillic_letter_upper_case(
             word_without_accents)
+        form_index = get_form_index()
+        if form_index is not None:
+            return form_index.find(word_without_accents, word_like_a_name)
         search_params = {
             'word_to_search': word_without_accents,
             'word_to_search_like_name': word_like_a_name}
-        found_classified_words = flashcardcreator.database.return_rows_of_sql_statement(
-            GRAMMATICAL_DATABASE_LOCAL_FILENAME, '''
-                SELECT DISTINCT w.id, w.name, w.type_id, wt.speech_part, w.meaning
-                FROM derivative_form as df
-                    join word as w
-                    on w.id = df.base_word_id
-                    join word_type as wt
-                    on w.type_id = wt.id
-                where df.name in (:word_to_search, :word_to_search_like_name)
-            UNION 
-                SELECT DISTINCT w.id, w.name, w.type_id, wt.speech_part, w.meaning
-                FROM word as w
-                    join word_type as wt
-                    on w.type_id = wt.id
-                WHERE w.name in (:word_to_search, :word_to_search_like_name)
-                AND NOT EXISTS (SELECT 1 FROM derivative_form as df WHERE df.base_word_id = w.id);
-        ''', search_params)
+        return flashcardcreator.database.return_rows_of_sql_statement(
+            GRAMMATICAL_DATABASE_LOCAL_FILENAME, SQL_FIND_CANDIDATE_ROWS,
+            search_params)
+
+
+    @staticmethod
+    def _find_word(word_to_search: str, other_word_type,
+                   found_classified_words=None):
+        """
+        Normalizes the given word and searches for its word type and derivation rules. Ask
+        the user to confirm the translation in English
+        If multiple words are found, the user will be prompted to choose one.
+        :param other_word_type: Type of the word if it isn't found in the grammar dictionary
+        :param found_classified_words: Optional. Rows already found by find_candidate_rows
+        :return:
+        :rtype: None or a AbstractClassifiedWord
+        """
+        if found_classified_words is None:
+            found_classified_words = WordFinder.find_candidate_rows(
+                word_to_search)
 
         if not found_classified_words:
             if other_word_type is not None:
@@ -577,8 +625,8 @@ class WordFinder:
                     f'The word {word_to_search} is unknown. Exiting')
                 return None
         elif len(found_classified_words) > 1:
-            found_classified_word = flashcardcreator.userinput.ask_user_to_choose_a_row(
-                found_classified_words)
+            found_classified_word = word_resolver.choose_row(
+                word_to_search, found_classified_words)
             if found_classified_word is None:
                 logger.warning('The user wants to exit')
                 return None
@@ -593,7 +641,8 @@ class WordFinder:
     @staticmethod
     def find_word_with_english_translation(word_to_search: str,
                                            other_word_type,
-                                           user_translation: str = None) -> AbstractClassifiedWord:
+                                           user_translation: str = None,
+                                           prefetched_line=None) -> AbstractClassifiedWord:
         """
         Normalizes the given word and searches for its word type and derivation rules. Ask
         the user to confirm the translation in English
@@ -601,10 +650,19 @@ class WordFinder:
         :param word_to_search: Word to search for. It will be converted to the case required by the grammar dictionary
         :param other_word_type: Type of the word if it isn't found in the grammar dictionary
         :param user_translation: Optional. Translation given by the user
+        :param prefetched_line: Optional. PrefetchedLine with the rows and the translation found in the background
         :return:
         :rtype: None or a AbstractClassifiedWord
         """
-        word = WordFinder._find_word(word_to_search, other_word_type)
+        candidate_rows = None
+        prefetched_translation = None
+        deepl_translations = None
+        if prefetched_line is not None:
+            candidate_rows = prefetched_line.candidate_rows
+            prefetched_translation = prefetched_line.machine_translation
+            deepl_translations = prefetched_line.deepl_translations
+        word = WordFinder._find_word(word_to_search, other_word_type,
+                                     candidate_rows)
         if word is None and word_to_search.endswith(' се'):
             word = WordFinder._find_word(word_to_search[:-3], other_word_type)
         if word is None:
@@ -615,7 +673,8 @@ class WordFinder:
 
         if user_translation:
             word._final_translation = user_translation
-        elif not word.ask_user_for_final_translation():
+        elif not word.ask_user_for_final_translation(prefetched_translation,
+                                                     deepl_translations):
             return None
         return word
 
@@ -736,44 +795,549 @@ def parse_line(line: str) -> ParsedLine:
                       word_type, error)
 
 
-def import_words_from_text_file(input_file_path, output_file_path):
-    with open(input_file_path, 'r') as file, \
-            open(output_file_path, 'a') as output_file:
+class PrefetchedLine(NamedTuple):
+    """
+    Line of the input file together with the information which was found in the background
+    """
+    parsed_line: ParsedLine
+    # Rows found in the grammatical dictionary or None if they weren't searched
+    candidate_rows: list = None
+    # Future with a tuple (word, machine translation) or None
+    machine_translation: Future = None
+    # Dictionary with the DeepL translations found for the whole file or None
+    deepl_translations: dict = None
+
+
+def _is_line_to_import(parsed_line):
+    """
+    :return: True if the line contains a word which must be searched and imported
+    """
+    return not (parsed_line.original_line.startswith(ERROR_PREFIX) or
+                parsed_line.original_line.startswith(WARNING_PREFIX) or
+                parsed_line.original_line.startswith(INFO_PREFIX) or
+                parsed_line.is_comment or parsed_line.error)
+
+
+def _translate_in_background(word_to_translate, deepl_translations=None):
+    return word_to_translate, translate_text_to_english(
+        word_to_translate, debug_client_calls=main_debug,
+        deepl_translations=deepl_translations)
+
+
+def _translate_lines_with_deepl(file, found_candidate_rows):
+    """
+    Translates with a few requests to DeepL the words of the file which don't have a translation. The words are
+    searched in the grammatical dictionary and their headwords are translated, because the translations are
+    requested later for the headwords. The words without flashcards and with only one candidate are translated,
+    the other words are translated one by one if they need it.
+    :param file: Required. Open input file. The caller must go back to the beginning of the file
+    :param found_candidate_rows: Required. Dictionary where the rows found for each word are stored, so the
+        import doesn't search them again
+    :return: Dictionary with the normalized headword as key and the list of DeepL translations as value
+    """
+    words_to_translate = []
+    for line in file:
+        parsed_line = parse_line(line)
+        if not _is_line_to_import(parsed_line) or parsed_line.translation:
+            continue
+        try:
+            candidate_rows = WordFinder.find_candidate_rows(
+                parsed_line.word_or_phrase)
+        except sqlite3.Error as e:
+            logger.warning(
+                f"The word {parsed_line.word_or_phrase} couldn't be searched for the batch translation: {e}")
+            continue
+        found_candidate_rows[parsed_line.word_or_phrase] = candidate_rows
+        word_to_translate = _get_word_to_translate(parsed_line, candidate_rows)
+        if word_to_translate:
+            words_to_translate.append(word_to_translate)
+    if not words_to_translate:
+        return {}
+    logger.info(
+        f"Translating {len(words_to_translate)} words of the file with DeepL")
+    try:
+        return translate_texts_with_deepl(words_to_translate)
+    except Exception as e:
+        logger.warning(
+            f"The words couldn't be translated together. They will be translated one by one: {e}")
+        return {}
+
+
+def _find_candidate_rows_of_line(parsed_line, found_candidate_rows):
+    """
+    Returns the rows which were found for the batch translation or searches them in the grammatical dictionary.
+    The found rows are removed, so they don't stay in memory during the whole import.
+    :param found_candidate_rows: Required. Dictionary with the word of the line as key and its rows as value
+    """
+    candidate_rows = found_candidate_rows.pop(parsed_line.word_or_phrase, None)
+    if candidate_rows is None:
+        candidate_rows = WordFinder.find_candidate_rows(parsed_line.word_or_phrase)
+    return candidate_rows
+
+
+def _get_prefetched_translation(prefetched_translation, root_word):
+    """
+    Returns the translation found in the background if it belongs to the given word.
+    :param prefetched_translation: Optional. Future with a tuple (word, translation)
+    :param root_word: Required. Word which is going to be translated
+    :return: None if there is no translation for this word
+    """
+    if prefetched_translation is None:
+        return None
+    try:
+        translated_word, translation = prefetched_translation.result()
+    except Exception as e:
+        logger.warning(
+            f"The translation of {root_word} in the background failed: {e}")
+        return None
+    if translated_word != root_word:
+        return None
+    return translation
+
+
+def _get_word_to_translate(parsed_line, candidate_rows):
+    if len(candidate_rows) == 1:
+        word_id, root_word, _, _, _ = candidate_rows[0]
+        # The words with flashcards aren't imported again, so they don't need a translation
+        if flashcard_store is not None and flashcard_store.exists_flashcard(root_word, word_id):
+            return None
+        return root_word
+    elif not candidate_rows and parsed_line.word_type is not None:
+        return parsed_line.word_or_phrase
+    # The user must choose a word first or the word is unknown
+    return None
+
+
+def search_word_in_background(word_to_search, other_word_type=None):
+    """
+    Searches the word in the grammatical dictionary and translates it without asking the user.
+    The user interface calls it from its background worker, so the window stays responsive.
+    :param word_to_search: Required. Word entered by the user
+    :param other_word_type: Type of the word if it isn't found in the grammar dictionary
+    :return: PrefetchedLine whose translation is already finished
+    """
+    parsed_line = ParsedLine(word_to_search, word_to_search,
+                             word_type=other_word_type)
+    candidate_rows = WordFinder.find_candidate_rows(word_to_search)
+    prefetch_derivative_forms(
+        [word_id for word_id, _, _, _, _ in candidate_rows])
+    word_to_translate = _get_word_to_translate(parsed_line, candidate_rows)
+    machine_translation = None
+    if word_to_translate:
+        machine_translation = Future()
+        try:
+            machine_translation.set_result(
+                _translate_in_background(word_to_translate))
+        except Exception as e:
+            machine_translation.set_exception(e)
+    return PrefetchedLine(parsed_line, candidate_rows, machine_translation)
+
+
+def _prefetch_line(line, translation_executor, deepl_translations,
+                   found_candidate_rows):
+    """
+    Parses the line, searches the word in the grammatical dictionary and starts its translation in the background.
+    It doesn't ask the user anything.
+    :param deepl_translations: Required. Dictionary with the DeepL translations found for the whole file
+    :param found_candidate_rows: Required. Dictionary with the rows found for the batch translation
+    """
+    parsed_line = parse_line(line)
+    if not _is_line_to_import(parsed_line):
+        return PrefetchedLine(parsed_line, deepl_translations=deepl_translations)
+    try:
+        candidate_rows = _find_candidate_rows_of_line(parsed_line,
+                                                      found_candidate_rows)
+    except sqlite3.Error as e:
+        logger.warning(
+            f"The word {parsed_line.word_or_phrase} couldn't be searched in the background: {e}")
+        return PrefetchedLine(parsed_line, deepl_translations=deepl_translations)
+    try:
+        prefetch_derivative_forms(
+            [word_id for word_id, _, _, _, _ in candidate_rows])
+    except sqlite3.Error as e:
+        logger.warning(
+            f"The derivative forms of {parsed_line.word_or_phrase} couldn't be loaded in the background: {e}")
+    word_to_translate = _get_word_to_translate(parsed_line, candidate_rows)
+    machine_translation = None
+    if word_to_translate and not parsed_line.translation:
+        machine_translation = translation_executor.submit(
+            _translate_in_background, word_to_translate,
+            deepl_translations.get(
+                normalize_word_for_cache(word_to_translate)))
+    return PrefetchedLine(parsed_line, candidate_rows, machine_translation,
+                          deepl_translations)
+
+
+def _read_prefetched_lines(file, prefetch_lines, deepl_translations,
+                           translation_executor=None, found_candidate_rows=None):
+    """
+    Returns the lines of the file in their original order. A background thread parses and searches
+    the next lines and starts their translations while the current line is being imported.
+
+    :param file: Required. Open input file
+    :param prefetch_lines: Number of lines which are prepared in advance. If it is 0, nothing is done in the background
+    :param deepl_translations: Required. Dictionary with the DeepL translations found for the whole file
+    :param translation_executor: Optional. Executor of the translations which is shut down by the caller.
+        If it is missing, the pending translations are cancelled when the generator ends
+    :param found_candidate_rows: Optional. Dictionary with the rows found for the batch translation
+    :return: Generator of PrefetchedLine
+    """
+    if found_candidate_rows is None:
+        found_candidate_rows = {}
+    if prefetch_lines < 1:
         for line in file:
-            current_parsed_line = parse_line(line)
-            # Exclude old errors, warnings or info messages
-            if current_parsed_line.original_line.startswith(ERROR_PREFIX) or \
-                    current_parsed_line.original_line.startswith(
-                        WARNING_PREFIX) or \
-                    current_parsed_line.original_line.startswith(INFO_PREFIX):
+            parsed_line = parse_line(line)
+            yield PrefetchedLine(parsed_line,
+                                 found_candidate_rows.pop(parsed_line.word_or_phrase, None),
+                                 deepl_translations=deepl_translations)
+        return
+
+    prefetched_lines_queue = queue.Queue(maxsize=prefetch_lines)
+    stop_event = threading.Event()
+    owns_translation_executor = translation_executor is None
+    if owns_translation_executor:
+        translation_executor = ThreadPoolExecutor(
+            max_workers=PREFETCH_TRANSLATION_WORKERS,
+            thread_name_prefix='translation-prefetch')
+
+    def put_in_queue(item):
+        # The consumer could stop before reading all lines
+        while not stop_event.is_set():
+            try:
+                prefetched_lines_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def prefetch_all_lines():
+        try:
+            for line in file:
+                if not put_in_queue(_prefetch_line(line, translation_executor,
+                                                   deepl_translations,
+                                                   found_candidate_rows)):
+                    return
+            put_in_queue(_END_OF_PREFETCHED_LINES)
+        except BaseException as e:
+            put_in_queue(e)
+
+    prefetch_thread = threading.Thread(target=prefetch_all_lines,
+                                       name='line-prefetch', daemon=True)
+    prefetch_thread.start()
+    try:
+        while True:
+            prefetched_line = prefetched_lines_queue.get()
+            if prefetched_line is _END_OF_PREFETCHED_LINES:
+                return
+            if isinstance(prefetched_line, BaseException):
+                raise prefetched_line
+            yield prefetched_line
+    finally:
+        stop_event.set()
+        prefetch_thread.join()
+        if owns_translation_executor:
+            translation_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _import_parsed_line(prefetched_line, output_file):
+    """
+    Adds the word or phrase of the line to the flashcard database together with its linked words
+    :param prefetched_line: Required. Line which isn't a comment and doesn't have errors
+    :param output_file: Required. Open file where the results of the import are written
+    """
+    current_parsed_line = prefetched_line.parsed_line
+    found_word = WordFinder.find_word_with_english_translation(
+        current_parsed_line.word_or_phrase,
+        current_parsed_line.word_type,
+        current_parsed_line.translation,
+        prefetched_line)
+    _create_flashcards_of_found_word(found_word, current_parsed_line,
+                                     output_file)
+
+
+def _create_flashcards_of_found_word(found_word, current_parsed_line,
+                                     output_file):
+    """
+    Adds the word with its final translation and its linked words to the flashcard database
+    :param found_word: AbstractClassifiedWord or None if the word wasn't found
+    :param current_parsed_line: Required. Line of the input file with the word
+    :param output_file: Required. Open file where the results of the import are written
+    """
+    if found_word is None:
+        output_file.write(
+            f"{ERROR_PREFIX}The following word wasn't found\n")
+        output_file.write(f"{current_parsed_line.original_line}")
+    elif found_word.exists_flashcard_for_this_word():
+        output_file.write(
+            f"{INFO_PREFIX}The word '{current_parsed_line.word_or_phrase}' already has flashcards\n")
+    else:
+        if not found_word.create_flashcard():
+            output_file.write(
+                f"{WARNING_PREFIX}No flashcards were created for the word '{current_parsed_line.word_or_phrase}'\n")
+        else:
+            found_word.create_flashcards_for_linked_words()
+            logger.debug(
+                f"Flashcard for {current_parsed_line.word_or_phrase} and linked words were created")
+
+
+class PendingWord(NamedTuple):
+    """
+    Word of the input file which was searched and whose translation was started. It waits for the review of the user
+    """
+    parsed_line: ParsedLine
+    # Rows found in the grammatical dictionary. Empty if the word is imported with the word type of the line
+    candidate_rows: list
+    # Future with a tuple (word, machine translation) or None if the line has a translation
+    machine_translation: Future = None
+
+
+def _write_line_with_message(output_file, prefix, message, parsed_line):
+    output_file.write(f"{prefix}{message}\n")
+    output_file.write(parsed_line.original_line if parsed_line.original_line.endswith('\n')
+                      else f"{parsed_line.original_line}\n")
+
+
+def _have_all_candidates_flashcards(parsed_line, candidate_rows):
+    if not candidate_rows:
+        return flashcard_store.exists_flashcard(parsed_line.word_or_phrase)
+    return all(flashcard_store.exists_flashcard(root_word, word_id)
+               for word_id, root_word, _, _, _ in candidate_rows)
+
+
+def _resolve_lines(file, output_file, prefetch_lines, deepl_translations,
+                   translation_executor, found_candidate_rows):
+    """
+    Resolve phase of the import with deferred review. Searches all words of the file and starts their
+    translations without asking the user. The comments and the lines with errors are written to the output file.
+    :return: List of PendingWord in the order of the file
+    """
+    pending_words = []
+    for prefetched_line in _read_prefetched_lines(file, prefetch_lines,
+                                                  deepl_translations,
+                                                  translation_executor,
+                                                  found_candidate_rows):
+        parsed_line = prefetched_line.parsed_line
+        if parsed_line.original_line.startswith((ERROR_PREFIX, WARNING_PREFIX, INFO_PREFIX)):
+            continue
+        elif parsed_line.is_comment:
+            output_file.write(f"{parsed_line.original_line}")
+            continue
+        elif parsed_line.error:
+            _write_line_with_message(output_file, ERROR_PREFIX, parsed_line.error, parsed_line)
+            continue
+        candidate_rows = prefetched_line.candidate_rows
+        try:
+            if candidate_rows is None:
+                candidate_rows = _find_candidate_rows_of_line(
+                    parsed_line, found_candidate_rows)
+                prefetch_derivative_forms(
+                    [word_id for word_id, _, _, _, _ in candidate_rows])
+        except sqlite3.Error as e:
+            _write_line_with_message(output_file, ERROR_PREFIX,
+                                     f"The word couldn't be searched: {e}", parsed_line)
+            continue
+        if not candidate_rows and parsed_line.word_type is None:
+            _write_line_with_message(output_file, ERROR_PREFIX,
+                                     "The following word wasn't found", parsed_line)
+            continue
+        # The words with flashcards would be skipped anyway, so the user doesn't review them
+        if _have_all_candidates_flashcards(parsed_line, candidate_rows):
+            logger.info(f"The word {parsed_line.word_or_phrase} has already flashcards")
+            _write_line_with_message(output_file, INFO_PREFIX,
+                                     f"The word '{parsed_line.word_or_phrase}' already has flashcards",
+                                     parsed_line)
+            continue
+        machine_translation = prefetched_line.machine_translation
+        if machine_translation is None and not parsed_line.translation:
+            word_to_translate = candidate_rows[0][1] if candidate_rows else parsed_line.word_or_phrase
+            machine_translation = translation_executor.submit(
+                _translate_in_background, word_to_translate,
+                deepl_translations.get(normalize_word_for_cache(word_to_translate)))
+        pending_words.append(PendingWord(parsed_line, candidate_rows,
+                                         machine_translation))
+    logger.info(f"{len(pending_words)} words are waiting for the review")
+    return pending_words
+
+
+def _get_proposed_translation(pending_word):
+    if pending_word.parsed_line.translation:
+        return pending_word.parsed_line.translation
+    if pending_word.machine_translation is None:
+        return None
+    try:
+        return pending_word.machine_translation.result()[1]
+    except Exception as e:
+        logger.warning(
+            f"The word {pending_word.parsed_line.word_or_phrase} couldn't be translated: {e}")
+        return None
+
+
+def _describe_candidate_rows(pending_word):
+    if not pending_word.candidate_rows:
+        return [f"{pending_word.parsed_line.word_or_phrase} ({pending_word.parsed_line.word_type})"]
+    return [f"{root_word} ({speech_part}) {word_meaning or ''}"[:200]
+            for _, root_word, _, speech_part, word_meaning in pending_word.candidate_rows]
+
+
+def _import_reviewed_words(pending_words, reviewed_words, output_file):
+    """
+    Bulk write of the import with deferred review. All words are imported in one transaction and a failing word
+    only rolls back its own savepoint. The linked words are imported with the non-interactive policies,
+    so the user isn't asked again.
+    """
+    global word_resolver
+    word_resolver = NonInteractiveResolver(review_file=output_file,
+                                           review_prefix=INFO_PREFIX)
+    with flashcard_store.transaction():
+        for pending_word, (chosen_candidate, translation) in zip(pending_words,
+                                                                 reviewed_words):
+            parsed_line = pending_word.parsed_line
+            if chosen_candidate is None:
+                _write_line_with_message(output_file, INFO_PREFIX,
+                                         "The word was skipped during the review", parsed_line)
                 continue
-            elif current_parsed_line.is_comment:
-                output_file.write(f"{current_parsed_line.original_line}")
-            elif current_parsed_line.error:
-                output_file.write(
-                    f"{ERROR_PREFIX}{current_parsed_line.error}\n")
-                output_file.write(f"{current_parsed_line.original_line}")
-            else:
-                # Add the word or phrase to the flashcard database
-                found_word = WordFinder.find_word_with_english_translation(
-                    current_parsed_line.word_or_phrase,
-                    current_parsed_line.word_type,
-                    current_parsed_line.translation)
-                if found_word is None:
-                    output_file.write(
-                        f"{ERROR_PREFIX}The following word wasn't found\n")
+            chosen_rows = [pending_word.candidate_rows[chosen_candidate]] if pending_word.candidate_rows else []
+            try:
+                with flashcard_store.transaction():
+                    found_word = WordFinder._find_word(parsed_line.word_or_phrase,
+                                                       parsed_line.word_type,
+                                                       chosen_rows)
+                    if found_word is not None:
+                        found_word._final_translation = translation
+                    _create_flashcards_of_found_word(found_word, parsed_line,
+                                                     output_file)
+            except (sqlite3.Error, ValueError) as e:
+                logger.error(
+                    f"The flashcards for {parsed_line.word_or_phrase} couldn't be created: {e}")
+                _write_line_with_message(output_file, ERROR_PREFIX,
+                                         f"The flashcards couldn't be created: {e}", parsed_line)
+
+
+def _import_with_deferred_review(file, output_file, prefetch_lines,
+                                 deepl_translations, found_candidate_rows):
+    """
+    Searches and translates all words in the background, asks the user to review them in one table and
+    imports the confirmed words together.
+    """
+    with ThreadPoolExecutor(max_workers=PREFETCH_TRANSLATION_WORKERS,
+                            thread_name_prefix='translation-prefetch') as translation_executor:
+        pending_words = _resolve_lines(file, output_file, prefetch_lines,
+                                       deepl_translations, translation_executor,
+                                       found_candidate_rows)
+        proposed_translations = [_get_proposed_translation(pending_word)
+                                 for pending_word in pending_words]
+    if not pending_words:
+        return
+    reviewed_words = flashcardcreator.userinput.ask_user_to_review_words(
+        [pending_word.parsed_line.word_or_phrase for pending_word in pending_words],
+        [_describe_candidate_rows(pending_word) for pending_word in pending_words],
+        proposed_translations)
+    if reviewed_words is None:
+        logger.info("The user cancelled the review. No words were imported")
+        for pending_word in pending_words:
+            _write_line_with_message(output_file, INFO_PREFIX,
+                                     "The review was cancelled", pending_word.parsed_line)
+        return
+    _import_reviewed_words(pending_words, reviewed_words, output_file)
+
+
+def import_words_from_text_file(input_file_path, output_file_path,
+                                batch_size=1,
+                                prefetch_lines=DEFAULT_PREFETCH_LINES,
+                                batch_translation=True,
+                                non_interactive=False,
+                                ambiguity_policy='first',
+                                translation_policy='machine',
+                                review_file_path=None,
+                                deferred_review=False):
+    """
+    Imports all the words of the input file. Each word is imported together with its linked words
+    in a savepoint, so a failing word only rolls back its own flashcards.
+    The next lines are searched and translated in the background while the user confirms the current one.
+    The headwords of the words without translation are sent to DeepL in a few requests before the import starts.
+
+    :param input_file_path: Required. File with the words to import
+    :param output_file_path: Required. The errors and information messages are appended to this file
+    :param batch_size: Number of words which are committed together in one transaction
+    :param prefetch_lines: Number of lines which are searched and translated in advance. 0 deactivates it
+    :param batch_translation: If True, the words are translated by DeepL in batches
+    :param non_interactive: If True, no dialogs are shown. The policies decide and the lines which need
+        a user are written to the review file
+    :param ambiguity_policy: Name of the policy which chooses between many words of the grammatical dictionary
+    :param translation_policy: Name of the policy which decides the final translation
+    :param review_file_path: Optional. The lines to review are appended to this file instead of the output file
+    :param deferred_review: If True, all words are searched and translated first and the user reviews
+        them together in one table before they are imported in one transaction
+    """
+    global word_resolver
+    if batch_size < 1:
+        raise ValueError(f"The batch size must be positive. It was {batch_size}")
+    words_in_current_batch = 0
+    interactive_resolver = word_resolver
+    try:
+        with open(input_file_path, 'r') as file, \
+                open(output_file_path, 'a') as output_file, \
+                open(review_file_path or os.devnull, 'a') as review_file:
+            # The background threads check the existing flashcards in memory without the connection
+            flashcard_store.load_existence_index()
+            if non_interactive:
+                word_resolver = NonInteractiveResolver(
+                    ambiguity_policy, translation_policy,
+                    review_file if review_file_path else output_file,
+                    INFO_PREFIX)
+            deepl_translations = {}
+            # Rows found by the batch translation. The import takes them instead of searching the words again
+            found_candidate_rows = {}
+            if batch_translation:
+                deepl_translations = _translate_lines_with_deepl(
+                    file, found_candidate_rows)
+                file.seek(0)
+            if deferred_review:
+                _import_with_deferred_review(file, output_file,
+                                             prefetch_lines,
+                                             deepl_translations,
+                                             found_candidate_rows)
+                return
+            for prefetched_line in _read_prefetched_lines(
+                    file, prefetch_lines, deepl_translations,
+                    found_candidate_rows=found_candidate_rows):
+                current_parsed_line = prefetched_line.parsed_line
+                # Exclude old errors, warnings or info messages
+                if current_parsed_line.original_line.startswith(ERROR_PREFIX) or \
+                        current_parsed_line.original_line.startswith(
+                            WARNING_PREFIX) or \
+                        current_parsed_line.original_line.startswith(INFO_PREFIX):
+                    continue
+                elif current_parsed_line.is_comment:
                     output_file.write(f"{current_parsed_line.original_line}")
-                elif found_word.exists_flashcard_for_this_word():
+                elif current_parsed_line.error:
                     output_file.write(
-                        f"{INFO_PREFIX}The word '{current_parsed_line.word_or_phrase}' already has flashcards\n")
+                        f"{ERROR_PREFIX}{current_parsed_line.error}\n")
+                    output_file.write(f"{current_parsed_line.original_line}")
                 else:
-                    if not found_word.create_flashcard():
+                    if batch_size > 1 and not flashcard_store.in_transaction:
+                        flashcard_store.begin()
+                    try:
+                        with flashcard_store.transaction():
+                            _import_parsed_line(prefetched_line, output_file)
+                    except ReviewRequired as e:
+                        word_resolver.send_to_review(
+                            current_parsed_line.original_line, str(e))
+                    except (sqlite3.Error, ValueError) as e:
+                        logger.error(
+                            f"The flashcards for {current_parsed_line.word_or_phrase} couldn't be created: {e}")
                         output_file.write(
-                            f"{WARNING_PREFIX}No flashcards were created for the word '{current_parsed_line.word_or_phrase}'\n")
-                    else:
-                        found_word.create_flashcards_for_linked_words()
-                        logger.debug(
-                            f"Flashcard for {current_parsed_line.word_or_phrase} and linked words were created")
+                            f"{ERROR_PREFIX}The flashcards couldn't be created: {e}\n")
+                        output_file.write(f"{current_parsed_line.original_line}")
+                    words_in_current_batch += 1
+                    if words_in_current_batch >= batch_size:
+                        if flashcard_store.in_transaction:
+                            flashcard_store.commit()
+                        words_in_current_batch = 0
+    finally:
+        word_resolver = interactive_resolver
+        if flashcard_store.in_transaction:
+            flashcard_store.commit()
 
 
 def load_logging_configuration(debug=False, verbose=False):
@@ -792,6 +1356,93 @@ def load_logging_configuration(debug=False, verbose=False):
     logger.debug(f"The global logging level was set to {logging_level}")
 
 
+def check_grammatical_dictionary_query_plans():
+    """
+    Warns if the searches in the grammatical dictionary must read whole tables because the
+    indexes created by the installer are missing.
+
+    :return: List with the details of the full scans. Empty if all searches use indexes
+    """
+    if not os.path.exists(GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+        logger.warning(
+            f"The grammatical dictionary {GRAMMATICAL_DATABASE_LOCAL_FILENAME} doesn't exist. Please run installGrammaticalDictionary.py")
+        return []
+    full_table_scans = []
+    for sql_statement, params in GRAMMATICAL_DICTIONARY_HOT_STATEMENTS:
+        try:
+            full_table_scans += find_full_table_scans(
+                GRAMMATICAL_DATABASE_LOCAL_FILENAME, sql_statement, params)
+        except sqlite3.Error as e:
+            logger.warning(
+                f"The query plans of the grammatical dictionary couldn't be checked: {e}")
+            return []
+    if full_table_scans:
+        logger.warning(
+            f"The searches in the grammatical dictionary read whole tables ({', '.join(full_table_scans)}). "
+            f"Please run installGrammaticalDictionary.py to create the indexes")
+    return full_table_scans
+
+
+def find_large_table_scans_of_hot_statements(
+        database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+        minimum_rows=LARGE_TABLE_ROWS):
+    """
+    Returns the full scans of large tables done by the statements which run for every imported word.
+    The tests use it to fail when a change in the statements or in the indexes makes them slow.
+
+    :param database_file: Grammatical dictionary to check
+    :param minimum_rows: Tables with less rows are ignored
+    :return: List with the details of the scans. Empty if the large tables are only read with indexes
+    """
+    large_table_scans = []
+    for sql_statement, params in GRAMMATICAL_DICTIONARY_HOT_STATEMENTS:
+        large_table_scans += find_large_table_scans(database_file, sql_statement,
+                                                    params, minimum_rows)
+    return large_table_scans
+
+
 def set_flashcard_database(database_file):
-    global flashcard_database
-    flashcard_database = database_file
+    """
+    Opens a session with the flashcard database which is used until close_flashcard_database is called.
+    :param database_file: Required. Path to the flashcard database
+    """
+    global flashcard_store
+    close_flashcard_database()
+    flashcard_store = FlashcardStore(database_file)
+    flashcard_store.migrate()
+
+
+def get_flashcard_store():
+    """
+    :return: Session with the flashcard database opened by set_flashcard_database
+    """
+    return flashcard_store
+
+
+def close_flashcard_database():
+    global flashcard_store
+    if flashcard_store is not None:
+        flashcard_store.close()
+        flashcard_store = None
+
+
+def get_form_index():
+    """
+    Opens the index of the derivative forms created by installGrammaticalDictionary.py
+    :return: FormIndex or None if the searches must use the grammatical dictionary
+    """
+    global _form_index, _form_index_was_opened
+    with _form_index_lock:
+        if not _form_index_was_opened:
+            _form_index = open_form_index(GRAMMATICAL_DATABASE_LOCAL_FILENAME)
+            _form_index_was_opened = True
+        return _form_index
+
+
+def close_form_index():
+    global _form_index, _form_index_was_opened
+    with _form_index_lock:
+        if _form_index is not None:
+            _form_index.close()
+        _form_index = None
+        _form_index_was_opened = False
@@ -0,0 +1,260 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Changes of the schema of the flashcard database. The version of the schema is stored in PRAGMA user_version,
+# so the databases of the users are updated when they are opened
+
+import logging
+import sqlite3
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    sql_script: str
+
+
+# Cards of the views ankiWebCardsWriteAnswer and ankiWebCardsReadAnswer which are created from each table.
+# The rows of the table have the alias s and the selects are completed with a condition on s
+_VERB_FORM_OF_CARD = '''case p.cardNumber when 1 then s.singular1 when 2 then s.singular2 when 3 then s.singular3
+            when 4 then s.plural1 when 5 then s.plural2 else s.plural3 end'''
+_NOUN_FORM_OF_CARD = '''case p.cardNumber
+            when 1 then case when s.genderAbrev = 'm' then 'един ' when s.genderAbrev = 'f' then 'една '
+                else 'едно ' end || s.noun
+            when 2 then s.irregularPluralEnding when 3 then s.IrregularDefiniteArticle
+            when 4 then s.irregularPluralWithArticle else s.countableEnding end'''
+_ADJECTIVE_FORM_OF_CARD = '''case p.cardNumber when 1 then s.masculineForm when 2 then s.masculineFormDefinitive
+            when 3 then s.femenineForm when 4 then s.neutralForm else s.pluralForm end'''
+
+
+class _ExportCardSource(NamedTuple):
+    key_columns: tuple
+    select_cards: str
+
+
+_EXPORT_CARD_SOURCES = {
+    'verbs4': _ExportCardSource(('presentSingular1', 'tense', 'imperfect'), f'''
+        select 'verbs4', s.presentSingular1 || '|' || s.tense || '|' || s.imperfect, p.cardNumber, 'write',
+            vm.meaningInEnglish || ' - ' || p.pronoun || ' (' || t.name || ')'
+                || case s.imperfect when 1 then ' (imperf.)' when 2 then ' (perf. and imperf.)' else ' (perf.)' end,
+            trim({_VERB_FORM_OF_CARD}), 'verbs,' || coalesce(s.tags, ''), s.flashcardExportDate
+        from verbs4 as s
+            inner join verbTenses as t on s.tense = t.code
+            inner join verbMeanings as vm on s.presentSingular1 = vm.presentSingular1
+            cross join (select 1 as cardNumber, 'аз' as pronoun union all select 2, 'ти'
+                union all select 3, 'той/тя/то' union all select 4, 'ние' union all select 5, 'вие'
+                union all select 6, 'те') as p
+        where rtrim(coalesce({_VERB_FORM_OF_CARD}, '')) <> ''
+        '''),
+    'nouns': _ExportCardSource(('noun',), f'''
+        select 'nouns', s.noun, p.cardNumber, 'write', s.meaningInEnglish || p.description,
+            trim({_NOUN_FORM_OF_CARD}), 'nouns,' || coalesce(s.tags, ''), s.flashcardExportDate
+        from nouns as s
+            cross join (select 1 as cardNumber, ' (singular with gender)' as description
+                union all select 2, ' (plural)' union all select 3, ' (singular with article)'
+                union all select 4, ' (plural with article)' union all select 5, ' (countable singular)') as p
+        where (p.cardNumber = 1 or rtrim({_NOUN_FORM_OF_CARD}) <> '')
+        '''),
+    'adjetives': _ExportCardSource(('masculineForm',), f'''
+        select 'adjetives', s.masculineForm, p.cardNumber, 'write', s.meaningInEnglish || p.description,
+            trim({_ADJECTIVE_FORM_OF_CARD}), 'adjetives,' || coalesce(s.tags, ''), s.flashcardExportDate
+        from adjetives as s
+            cross join (select 1 as cardNumber, ' (masculine form)' as description
+                union all select 2, ' (masculine definitive form)' union all select 3, ' (femenine form)'
+                union all select 4, ' (neutral form)' union all select 5, ' (plural form)') as p
+        where (p.cardNumber <= 2 or rtrim({_ADJECTIVE_FORM_OF_CARD}) <> '')
+        '''),
+    # The cards of type 0 are shown in ankiWebCardsReadAnswer, which doesn't trim the words
+    'otherWordTypes': _ExportCardSource(('word',), '''
+        select 'otherWordTypes', s.word, 1, case s.typeInCard when 0 then 'read' else 'write' end,
+            s.meaningInEnglish || coalesce(' (' || s.type || ')', ''),
+            case s.typeInCard when 0 then s.word else trim(s.word) end,
+            case s.typeInCard when 0 then s.tags else coalesce(s.tags, '') end, s.flashcardExportDate
+        from otherWordTypes as s
+        where s.typeInCard in (0, 1)
+        '''),
+    'wordOrder': _ExportCardSource(('phrase',), '''
+        select 'wordOrder', s.phrase, 1, 'write', 'Word order: [[ws::' || s.phrase || ']]', trim(s.phrase),
+            'wordOrder', s.flashcardExportDate
+        from wordOrder as s
+        where 1 = 1
+        '''),
+}
+
+
+# Tables whose rows are exported as cards. Their rows have the column flashcardExportDate
+EXPORT_CARD_SOURCE_TABLES = tuple(_EXPORT_CARD_SOURCES)
+
+
+def _export_card_key(source, row_alias):
+    return " || '|' || ".join(f'{row_alias}.{column}' for column in source.key_columns)
+
+
+def export_card_key_expression(source_table, row_alias):
+    """
+    Returns the SQL expression which calculates the column sourceKey of exportCards from a row of the table
+    """
+    return _export_card_key(_EXPORT_CARD_SOURCES[source_table], row_alias)
+
+
+def _insert_export_cards(source_table, condition):
+    return f'''
+        insert into exportCards (sourceTable, sourceKey, cardNumber, answerType, front, back, tags,
+            flashcardExportDate)
+        {_EXPORT_CARD_SOURCES[source_table].select_cards} and ({condition});'''
+
+
+def _delete_export_cards(source_table, key_condition):
+    return f"""
+        delete from exportCards where sourceTable = '{source_table}' and sourceKey {key_condition};"""
+
+
+def _create_export_card_triggers():
+    """
+    Returns the triggers which update the cards when the rows of the flashcard tables change
+    """
+    triggers = []
+    for source_table, source in _EXPORT_CARD_SOURCES.items():
+        new_row_condition = ' and '.join(f's.{column} = NEW.{column}' for column in source.key_columns)
+        insert_cards = _insert_export_cards(source_table, new_row_condition)
+        delete_cards = _delete_export_cards(source_table, f'= {_export_card_key(source, "OLD")}')
+        triggers.append(f'''
+        create trigger exportCards_{source_table}_insert after insert on {source_table}
+        begin {insert_cards}
+        end;
+        create trigger exportCards_{source_table}_update after update on {source_table}
+        begin {delete_cards} {insert_cards}
+        end;
+        create trigger exportCards_{source_table}_delete after delete on {source_table}
+        begin {delete_cards}
+        end;''')
+    # The cards of the verbs contain the meaning and the name of the tense
+    verb_source = _EXPORT_CARD_SOURCES['verbs4']
+    for parent_table, parent_column, verb_column, events in (
+            ('verbMeanings', 'presentSingular1', 'presentSingular1', ('insert', 'update', 'delete')),
+            ('verbTenses', 'code', 'tense', ('update',))):
+        for event in events:
+            statements = [_delete_export_cards(
+                'verbs4', f'in (select {_export_card_key(verb_source, "s")} from verbs4 as s '
+                          f'where s.{verb_column} = {row}.{parent_column})')
+                for row in ('OLD', 'NEW')
+                if (row, event) not in (('OLD', 'insert'), ('NEW', 'delete'))]
+            if event != 'delete':
+                statements.append(_insert_export_cards('verbs4', f's.{verb_column} = NEW.{parent_column}'))
+            triggers.append(f'''
+        create trigger exportCards_{parent_table}_{event} after {event} on {parent_table}
+        begin {''.join(statements)}
+        end;''')
+    return ''.join(triggers)
+
+
+def _fill_export_cards():
+    return ''.join(_insert_export_cards(source_table, '1 = 1') for source_table in _EXPORT_CARD_SOURCES)
+
+
+# The versions must be consecutive. Never change a migration which was released, add a new one
+MIGRATIONS = (
+    Migration(1, 'Indexes on the external word IDs and on the flashcards which were not exported', '''
+        create index if not exists nounsExternalWordIdIdx on nouns (externalWordId);
+        create index if not exists adjetivesExternalWordIdIdx on adjetives (externalWordId);
+        create index if not exists otherWordTypesExternalWordIdIdx on otherWordTypes (externalWordId);
+        create index if not exists nounsNotExportedIdx on nouns (noun)
+            where flashcardExportDate is null;
+        create index if not exists adjetivesNotExportedIdx on adjetives (masculineForm)
+            where flashcardExportDate is null;
+        create index if not exists otherWordTypesNotExportedIdx on otherWordTypes (word)
+            where flashcardExportDate is null;
+        create index if not exists verbs4NotExportedIdx on verbs4 (presentSingular1, tense, imperfect)
+            where flashcardExportDate is null;
+        create index if not exists wordOrderNotExportedIdx on wordOrder (phrase)
+            where flashcardExportDate is null;
+        '''),
+    Migration(2, 'Table with the cards to export which is updated by triggers', f'''
+        create table exportCards (
+            sourceTable text not null,
+            sourceKey text not null,
+            cardNumber integer not null,
+            answerType text not null check (answerType in ('read', 'write')),
+            front text,
+            back text,
+            tags text,
+            flashcardExportDate date,
+            primary key (sourceTable, sourceKey, cardNumber)
+        );
+        create index exportCardsPendingIdx on exportCards (answerType, front, back, tags)
+            where flashcardExportDate is null;
+        {_create_export_card_triggers()}
+        {_fill_export_cards()}
+        drop view if exists ankiWebCardsWriteAnswer;
+        create view ankiWebCardsWriteAnswer as
+            select distinct front, back, tags
+            from exportCards
+            where answerType = 'write' and flashcardExportDate is null;
+        drop view if exists ankiWebCardsReadAnswer;
+        create view ankiWebCardsReadAnswer as
+            select front, back, tags
+            from exportCards
+            where answerType = 'read' and flashcardExportDate is null;
+        '''),
+)
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(db_connection):
+    return db_connection.execute('PRAGMA user_version;').fetchone()[0]
+
+
+def apply_migrations(db_connection, migrations=MIGRATIONS):
+    """
+    Runs the migrations which are newer than the version of the database. Each migration runs in its
+    own transaction together with the update of the version.
+
+    :param db_connection: Required. Connection in autocommit mode, isolation_level None
+    :param migrations: Optional. Migrations sorted by version
+    :return: Number of applied migrations
+    """
+    current_version = get_schema_version(db_connection)
+    latest_version = migrations[-1].version if migrations else 0
+    if current_version > latest_version:
+        raise ValueError(
+            f'The flashcard database has the schema version {current_version}, but this version of '
+            f'the flashcard creator only knows up to {latest_version}')
+    applied_migrations = 0
+    for migration in migrations:
+        if migration.version <= current_version:
+            continue
+        if migration.version != current_version + 1:
+            raise ValueError(f'The migration {migration.version} follows the version {current_version}')
+        logger.info(f'Updating the flashcard database to the version {migration.version}: {migration.description}')
+        try:
+            db_connection.executescript(f'''
+                BEGIN;
+                {migration.sql_script}
+                PRAGMA user_version = {migration.version};
+                COMMIT;
+                ''')
+        except sqlite3.Error:
+            if db_connection.in_transaction:
+                db_connection.rollback()
+            raise
+        current_version = migration.version
+        applied_migrations += 1
+    return applied_migrations
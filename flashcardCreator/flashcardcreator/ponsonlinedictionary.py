@@ -17,15 +17,27 @@
 #
 
 # It implements calls to the PONs dictionary API
+import base64
+import gzip
+import http.client
 import logging
+import threading
 import urllib.request
-import urllib.parse
-from urllib.parse import urlencode
+import zlib
+from urllib.parse import unquote, urlencode, urlsplit
 import json
 
-_DEFAULT_SERVER_URL = 'https://api.pons.com/v1/dictionary'
+PONS_DICTIONARY_PATH = '/v1/dictionary'
+_DEFAULT_SERVER_URL = f'https://api.pons.com{PONS_DICTIONARY_PATH}'
 _DEFAULT_LANGUAGE_PAIR = 'bgen'
 _DEFAULT_INPUT_LANGUAGE = 'bg'
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 5
+DEFAULT_READ_TIMEOUT_SECONDS = 20
+# Connections kept open between the requests. One per thread translating at the same time is enough
+DEFAULT_MAXIMUM_IDLE_CONNECTIONS = 4
+# Errors of a reused connection which the server closed while it was idle
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError,
+                            ConnectionAbortedError, BrokenPipeError)
 
 logger = logging.getLogger(__name__)
 
@@ -55,18 +67,164 @@ class OnlineDictionaryException(Exception):
         super().__init__(self.message)
 
 
+class _HttpConnectionPool:
+    """
+    Keeps the connections to one server open, so the following requests don't pay again the TCP and TLS
+    handshakes. It can be used by many threads at the same time and each request takes its own connection.
+    Like urllib, it uses the proxy of the environment variables HTTPS_PROXY or HTTP_PROXY unless NO_PROXY
+    excludes the server.
+    """
+
+
+    def __init__(self, server_url, connect_timeout_seconds=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                 read_timeout_seconds=DEFAULT_READ_TIMEOUT_SECONDS,
+                 maximum_idle_connections=DEFAULT_MAXIMUM_IDLE_CONNECTIONS):
+        split_url = urlsplit(server_url)
+        if split_url.scheme == 'https':
+            self._connection_class = http.client.HTTPSConnection
+        elif split_url.scheme == 'http':
+            self._connection_class = http.client.HTTPConnection
+        else:
+            raise ValueError(f'The URL {server_url} must start with http or https')
+        self._scheme = split_url.scheme
+        self._host = split_url.hostname
+        self._port = split_url.port
+        self._proxy_host = None
+        self._proxy_port = None
+        self._proxy_headers = {}
+        proxy_url = urllib.request.getproxies().get(split_url.scheme)
+        if proxy_url and not urllib.request.proxy_bypass(self._host):
+            self._set_proxy(proxy_url)
+        self._connect_timeout_seconds = connect_timeout_seconds
+        self._read_timeout_seconds = read_timeout_seconds
+        self._maximum_idle_connections = maximum_idle_connections
+        self._idle_connections = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created_connections = 0
+
+
+    def _set_proxy(self, proxy_url):
+        split_proxy_url = urlsplit(proxy_url if '://' in proxy_url else f'http://{proxy_url}')
+        self._proxy_host = split_proxy_url.hostname
+        self._proxy_port = split_proxy_url.port
+        if split_proxy_url.username:
+            credentials = f'{unquote(split_proxy_url.username)}:{unquote(split_proxy_url.password or "")}'
+            self._proxy_headers['Proxy-Authorization'] = \
+                f'Basic {base64.b64encode(credentials.encode("utf-8")).decode("ascii")}'
+        logger.debug(f'The requests to {self._host} are sent through the proxy {self._proxy_host}')
+
+
+    def _create_connection(self):
+        if self._proxy_host is None:
+            connection = self._connection_class(self._host, self._port,
+                                                timeout=self._connect_timeout_seconds)
+        elif self._scheme == 'https':
+            # The TLS connection to the server goes through a tunnel opened with CONNECT
+            connection = http.client.HTTPSConnection(self._proxy_host, self._proxy_port,
+                                                     timeout=self._connect_timeout_seconds)
+            connection.set_tunnel(self._host, self._port, headers=self._proxy_headers)
+        else:
+            connection = http.client.HTTPConnection(self._proxy_host, self._proxy_port,
+                                                    timeout=self._connect_timeout_seconds)
+        connection.connect()
+        # The connect timeout only applies to the handshake. The answers can take longer
+        connection.sock.settimeout(self._read_timeout_seconds)
+        with self._lock:
+            self.created_connections += 1
+        return connection
+
+
+    def _take_idle_connection(self):
+        with self._lock:
+            if self._idle_connections:
+                return self._idle_connections.pop()
+        return None
+
+
+    def _return_connection(self, connection, response):
+        # The connections which the server will close can't be reused
+        if not response.will_close and connection.sock is not None:
+            with self._lock:
+                if not self._closed and len(self._idle_connections) < self._maximum_idle_connections:
+                    self._idle_connections.append(connection)
+                    return
+        connection.close()
+
+
+    def request(self, method, path, headers):
+        """
+        Sends the request with an idle connection or a new one. If the server closed the idle connection,
+        the request is sent again with a new connection.
+
+        :param method: Required. HTTP method
+        :param path: Required. Path and query of the URL
+        :param headers: Required. Dictionary with the headers of the request
+        :return: Tuple (HTTP status, headers, body) of the response
+        """
+        if self._proxy_host is not None and self._scheme == 'http':
+            # The proxies of plain HTTP receive the whole URL
+            port = f':{self._port}' if self._port else ''
+            path = f'http://{self._host}{port}{path}'
+            headers = {**headers, **self._proxy_headers}
+        connection = self._take_idle_connection()
+        while True:
+            is_reused_connection = connection is not None
+            if connection is None:
+                connection = self._create_connection()
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except _STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not is_reused_connection:
+                    raise
+                logger.debug(f'The idle connection to {self._host} was closed by the server')
+                connection = None
+                continue
+            except BaseException:
+                connection.close()
+                raise
+            self._return_connection(connection, response)
+            return response.status, response.headers, body
+
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle_connections, self._idle_connections = self._idle_connections, []
+        for connection in idle_connections:
+            connection.close()
+
+
 class OnlineDictionary:
 
     def __init__(self, api_key, server_url=_DEFAULT_SERVER_URL,
                  language_pair=_DEFAULT_LANGUAGE_PAIR,
                  input_language=_DEFAULT_INPUT_LANGUAGE,
-                 include_examples=False) -> None:
+                 include_examples=False,
+                 connect_timeout_seconds=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                 read_timeout_seconds=DEFAULT_READ_TIMEOUT_SECONDS,
+                 maximum_idle_connections=DEFAULT_MAXIMUM_IDLE_CONNECTIONS) -> None:
         super().__init__()
         self._api_key = api_key
         self._server_url = server_url
+        self._server_path = urlsplit(server_url).path
         self._language_pair = language_pair
         self._input_language = input_language
         self._include_examples = include_examples
+        self._connection_pool = _HttpConnectionPool(server_url,
+                                                    connect_timeout_seconds,
+                                                    read_timeout_seconds,
+                                                    maximum_idle_connections)
+
+
+    def close(self):
+        """
+        Closes the open connections. New connections are opened if it is used again.
+        """
+        self._connection_pool.close()
 
 
     def get_full_response_from(self, word_or_phrase: str):
@@ -77,7 +235,8 @@ class OnlineDictionary:
         :return: Translations and examples
         """
         headers = {
-            "X-Secret": self._api_key
+            "X-Secret": self._api_key,
+            "Accept-Encoding": "gzip"
         }
         if self._include_examples:
             fm_parameter = 1
@@ -91,26 +250,25 @@ class OnlineDictionary:
             'q': word_or_phrase
         }
         final_encoded_params = urlencode(final_params, encoding="utf-8")
-        final_url = f'{self._server_url}?{final_encoded_params}'
-        request = urllib.request.Request(final_url, headers=headers)
         try:
-            with urllib.request.urlopen(request) as response:
-                if response.getcode() == 200:
-                    json_data = json.loads(response.read().decode('utf-8'))
-                    logger.debug(f"Response: {json_data}")
-                    return json_data
-                elif response.getcode() == 204:
-                    logger.debug(
-                        f"There is no translation for {word_or_phrase}")
-                    return None
-                else:
-                    raise OnlineDictionaryException(
-                        http_status=response.getcode(),
-                        message=response.read().decode('utf-8'))
-        except urllib.error.URLError as e:
-            raise OnlineDictionaryException() from e
-        except urllib.error.HTTPError as e:
+            http_status, response_headers, body = self._connection_pool.request(
+                'GET', f'{self._server_path}?{final_encoded_params}', headers)
+            if response_headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+        except (OSError, EOFError, zlib.error, http.client.HTTPException) as e:
             raise OnlineDictionaryException() from e
+        if http_status == 200:
+            json_data = json.loads(body.decode('utf-8'))
+            logger.debug(f"Response: {json_data}")
+            return json_data
+        elif http_status == 204:
+            logger.debug(
+                f"There is no translation for {word_or_phrase}")
+            return None
+        else:
+            raise OnlineDictionaryException(
+                http_status=http_status,
+                message=body.decode('utf-8', errors='replace'))
 
 
     def get_translations_from(self, word_or_phrase: str):
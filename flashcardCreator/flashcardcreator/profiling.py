@@ -0,0 +1,153 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Measures how long each stage of the import takes, like the searches in the grammatical dictionary,
+# the translation services, the dialogs and the inserts. It only measures when the profiling was started
+
+import functools
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_profiling_enabled = False
+_stage_durations = {}
+_stage_durations_lock = threading.Lock()
+
+
+def start_profiling():
+    """
+    Starts measuring the stages. The previous measures are removed
+    """
+    global _profiling_enabled
+    reset_profile()
+    _profiling_enabled = True
+
+
+def stop_profiling():
+    global _profiling_enabled
+    _profiling_enabled = False
+
+
+def is_profiling():
+    return _profiling_enabled
+
+
+def reset_profile():
+    with _stage_durations_lock:
+        _stage_durations.clear()
+
+
+def record_stage_duration(stage, duration_seconds):
+    with _stage_durations_lock:
+        _stage_durations.setdefault(stage, []).append(duration_seconds)
+
+
+@contextmanager
+def profiled_stage(stage):
+    """
+    Measures the code inside the context as the given stage. The exceptions are also measured
+    """
+    if not _profiling_enabled:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage_duration(stage, time.perf_counter() - start_time)
+
+
+def profiled(stage):
+    """
+    Decorator which measures every call of the function as the given stage. If the profiling
+    wasn't started, the function is called directly.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _profiling_enabled:
+                return function(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_stage_duration(stage, time.perf_counter() - start_time)
+
+        return wrapper
+
+    return decorator
+
+
+def _percentile(sorted_durations, percent):
+    # Nearest rank, so the value was really measured
+    rank = max(1, math.ceil(percent * len(sorted_durations) / 100))
+    return sorted_durations[rank - 1]
+
+
+def get_profile_summary():
+    """
+    :return: List of dictionaries with the stage, count, total_seconds, p50_ms, p95_ms and max_ms,
+        sorted by the total time
+    """
+    with _stage_durations_lock:
+        stage_durations = {stage: sorted(durations) for stage, durations in _stage_durations.items()}
+    summary = [{'stage': stage,
+                'count': len(durations),
+                'total_seconds': sum(durations),
+                'p50_ms': _percentile(durations, 50) * 1000,
+                'p95_ms': _percentile(durations, 95) * 1000,
+                'max_ms': durations[-1] * 1000}
+               for stage, durations in stage_durations.items()]
+    return sorted(summary, key=lambda stage_summary: stage_summary['total_seconds'], reverse=True)
+
+
+def format_profile_summary(summary=None):
+    """
+    :param summary: Optional. Result of get_profile_summary
+    :return: Table with one line per stage
+    """
+    if summary is None:
+        summary = get_profile_summary()
+    if not summary:
+        return 'No stages were measured'
+    stage_width = max(len('Stage'), *(len(stage_summary['stage']) for stage_summary in summary))
+    lines = [f"{'Stage':<{stage_width}} {'Count':>7} {'Total s':>10} {'p50 ms':>10} {'p95 ms':>10} {'Max ms':>10}"]
+    for stage_summary in summary:
+        lines.append(f"{stage_summary['stage']:<{stage_width}} {stage_summary['count']:>7} "
+                     f"{stage_summary['total_seconds']:>10.3f} {stage_summary['p50_ms']:>10.2f} "
+                     f"{stage_summary['p95_ms']:>10.2f} {stage_summary['max_ms']:>10.2f}")
+    return '\n'.join(lines)
+
+
+def write_profile_json(file_path, summary=None):
+    """
+    Writes the summary of the stages to a JSON file
+    :param file_path: Required. Target file
+    :param summary: Optional. Result of get_profile_summary
+    """
+    if summary is None:
+        summary = get_profile_summary()
+    with open(file_path, 'w') as json_file:
+        json.dump({'stages': summary}, json_file, indent=2)
+    logger.info(f'The profile was written to {file_path}')
@@ -0,0 +1,164 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Decisions which are taken during the import of a word: which of the words found in the grammatical dictionary
+# is imported and what is its final translation. They are asked to the user or taken by policies, so the
+# import can run without a user
+
+import logging
+
+import flashcardcreator.userinput
+from flashcardcreator.database import return_rows_of_sql_statement, \
+    GRAMMATICAL_DATABASE_LOCAL_FILENAME
+
+# Column of the table word of the grammatical dictionary with the number of occurrences in the texts of chitanka.info
+WORD_FREQUENCY_COLUMN = 'chitanka_count'
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewRequired(Exception):
+    """
+    Raised when a word can't be imported without the decision of a user
+    """
+
+
+def choose_first_row(word_to_search, found_classified_words):
+    return found_classified_words[0]
+
+
+def choose_most_frequent_row(word_to_search, found_classified_words):
+    """
+    Chooses the word which is used more often. If the grammatical dictionary doesn't have frequencies,
+    the first word is chosen.
+    """
+    column_names = [column_name for _, column_name, _, _, _, _ in return_rows_of_sql_statement(
+        GRAMMATICAL_DATABASE_LOCAL_FILENAME, 'PRAGMA table_info(word);', ())]
+    if WORD_FREQUENCY_COLUMN not in column_names:
+        logger.warning(
+            f"The grammatical dictionary doesn't have the column {WORD_FREQUENCY_COLUMN}. The first word is chosen")
+        return choose_first_row(word_to_search, found_classified_words)
+    word_ids = [word_id for word_id, _, _, _, _ in found_classified_words]
+    frequencies = dict(return_rows_of_sql_statement(
+        GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+        f'select id, {WORD_FREQUENCY_COLUMN} from word where id in ({", ".join("?" * len(word_ids))});',
+        word_ids))
+    # max returns the first of the rows with the same frequency
+    return max(found_classified_words,
+               key=lambda row: frequencies.get(row[0]) or 0)
+
+
+def send_row_choice_to_review(word_to_search, found_classified_words):
+    raise ReviewRequired(
+        f"{len(found_classified_words)} words were found in the grammatical dictionary for '{word_to_search}'")
+
+
+def accept_machine_translation(root_word, machine_translation):
+    if not machine_translation:
+        raise ReviewRequired(f"The word '{root_word}' doesn't have any machine translation")
+    return machine_translation
+
+
+def send_translation_to_review(root_word, machine_translation):
+    raise ReviewRequired(f"The translation of the word '{root_word}' must be confirmed")
+
+
+# Policies which can be chosen in the command line. A policy returns the decision or raises ReviewRequired
+AMBIGUITY_POLICIES = {
+    'first': choose_first_row,
+    'most-frequent': choose_most_frequent_row,
+    'skip': send_row_choice_to_review
+}
+TRANSLATION_POLICIES = {
+    'machine': accept_machine_translation,
+    'skip': send_translation_to_review
+}
+
+
+class InteractiveResolver:
+    """
+    Asks the user with dialogs
+    """
+
+
+    def choose_row(self, word_to_search, found_classified_words):
+        """
+        :param word_to_search: Required. Word entered by the user
+        :param found_classified_words: Required. Rows of the grammatical dictionary
+        :return: One of the rows or None if the user wants to exit
+        """
+        return flashcardcreator.userinput.ask_user_to_choose_a_row(
+            found_classified_words)
+
+
+    def confirm_translation(self, root_word, machine_translation):
+        """
+        :param root_word: Required. Word to translate
+        :param machine_translation: Translation of the online services or None
+        :return: Final translation or None if the user wants to exit
+        """
+        return flashcardcreator.userinput.ask_user_for_translation(root_word,
+                                                                   machine_translation)
+
+
+    def send_to_review(self, original_line, reason):
+        """
+        Stores a line of the input file which needs the decision of a user. It isn't needed in interactive mode
+        """
+        logger.warning(f'{reason}: {original_line.strip()}')
+
+
+class NonInteractiveResolver(InteractiveResolver):
+    """
+    Takes the decisions with policies. The lines which can't be decided are written to a review file which
+    can be imported later in interactive mode.
+    """
+
+
+    def __init__(self, ambiguity_policy='first', translation_policy='machine',
+                 review_file=None, review_prefix='# INFO: '):
+        """
+        :param ambiguity_policy: Name of a policy of AMBIGUITY_POLICIES or a function (word, rows) -> row
+        :param translation_policy: Name of a policy of TRANSLATION_POLICIES or a function (word, translation) -> translation
+        :param review_file: Optional. Open file where the lines to review are appended
+        :param review_prefix: Optional. Prefix of the line with the reason of the review
+        """
+        self._ambiguity_policy = AMBIGUITY_POLICIES.get(ambiguity_policy, ambiguity_policy)
+        self._translation_policy = TRANSLATION_POLICIES.get(translation_policy, translation_policy)
+        if not callable(self._ambiguity_policy) or not callable(self._translation_policy):
+            raise ValueError(f'Unknown policies {ambiguity_policy} and {translation_policy}')
+        self._review_file = review_file
+        self._review_prefix = review_prefix
+        self.reviewed_lines = 0
+
+
+    def choose_row(self, word_to_search, found_classified_words):
+        return self._ambiguity_policy(word_to_search, found_classified_words)
+
+
+    def confirm_translation(self, root_word, machine_translation):
+        return self._translation_policy(root_word, machine_translation)
+
+
+    def send_to_review(self, original_line, reason):
+        super().send_to_review(original_line, reason)
+        self.reviewed_lines += 1
+        if self._review_file is not None:
+            self._review_file.write(f'{self._review_prefix}{reason}\n')
+            self._review_file.write(original_line if original_line.endswith('\n')
+                                    else f'{original_line}\n')
@@ -0,0 +1,136 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Optional tracing of the SQL statements. When it is enabled, the new connections log every statement which is
+# slower than a threshold as a warning with its parameters. All statements can be logged at debug level too
+
+import logging
+import sqlite3
+import time
+
+DEFAULT_SLOW_STATEMENT_SECONDS = 0.1
+
+logger = logging.getLogger(__name__)
+
+_tracing_enabled = False
+_slow_statement_seconds = DEFAULT_SLOW_STATEMENT_SECONDS
+_log_all_statements = False
+
+
+def enable_sql_tracing(slow_statement_seconds=DEFAULT_SLOW_STATEMENT_SECONDS,
+                       log_all_statements=False):
+    """
+    Traces the connections which are opened from now on with connect
+
+    :param slow_statement_seconds: Statements which take longer are logged as warnings
+    :param log_all_statements: If True, every statement is logged at debug level with the values of its parameters
+    """
+    global _tracing_enabled, _slow_statement_seconds, _log_all_statements
+    _slow_statement_seconds = slow_statement_seconds
+    _log_all_statements = log_all_statements
+    _tracing_enabled = True
+
+
+def disable_sql_tracing():
+    global _tracing_enabled
+    _tracing_enabled = False
+
+
+def is_sql_tracing_enabled():
+    return _tracing_enabled
+
+
+def _log_statement(expanded_statement):
+    # SQLite calls it for every statement, also the ones of the triggers, with the values of the parameters
+    logger.debug(f'SQL: {expanded_statement}')
+
+
+def _check_duration(sql_statement, parameters, duration_seconds):
+    if duration_seconds >= _slow_statement_seconds:
+        logger.warning(f'Slow SQL statement ({duration_seconds * 1000:.1f} ms): '
+                       f'{" ".join(sql_statement.split())} Parameters: {parameters}')
+
+
+class TracingCursor(sqlite3.Cursor):
+    """
+    Cursor which measures its statements. Only the execution until the first row is measured, not the fetches.
+    """
+
+
+    def execute(self, sql_statement, parameters=()):
+        start_time = time.perf_counter()
+        try:
+            return super().execute(sql_statement, parameters)
+        finally:
+            _check_duration(sql_statement, parameters, time.perf_counter() - start_time)
+
+
+    def executemany(self, sql_statement, parameters_sequence):
+        parameters_list = list(parameters_sequence)
+        start_time = time.perf_counter()
+        try:
+            return super().executemany(sql_statement, parameters_list)
+        finally:
+            _check_duration(sql_statement, f'{len(parameters_list)} rows',
+                            time.perf_counter() - start_time)
+
+
+    def executescript(self, sql_script):
+        start_time = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _check_duration(sql_script, None, time.perf_counter() - start_time)
+
+
+class TracingConnection(sqlite3.Connection):
+    """
+    Connection whose statements run in a TracingCursor
+    """
+
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+
+    def execute(self, sql_statement, parameters=()):
+        return self.cursor().execute(sql_statement, parameters)
+
+
+    def executemany(self, sql_statement, parameters_sequence):
+        return self.cursor().executemany(sql_statement, parameters_sequence)
+
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(database_file, **kwargs):
+    """
+    Opens a connection like sqlite3.connect. If the tracing is enabled, its statements are traced.
+
+    :param database_file: Required. Database to open
+    :param kwargs: Other parameters of sqlite3.connect
+    :return: sqlite3.Connection
+    """
+    if not _tracing_enabled:
+        return sqlite3.connect(database_file, **kwargs)
+    connection = sqlite3.connect(database_file, factory=TracingConnection, **kwargs)
+    if _log_all_statements:
+        connection.set_trace_callback(_log_statement)
+    return connection
@@ -0,0 +1,342 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Local HTTP server which answers like the APIs of PONS and DeepL used by the translator. It adds latency,
+# rate limits and errors, so the clients can be tested without network access and without API keys
+
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import urlsplit, parse_qs
+
+from flashcardcreator.ponsonlinedictionary import PONS_DICTIONARY_PATH
+
+DEEPL_TRANSLATE_PATH = '/v2/translate'
+STATISTICS_PATH = '/stats'
+PONS_SERVICE = 'pons'
+DEEPL_SERVICE = 'deepl'
+INJECTED_ERROR_STATUSES = (500, 502, 503)
+
+logger = logging.getLogger(__name__)
+
+
+class StandInServerSettings(NamedTuple):
+    """
+    Behaviour of the stand-in server. The same seed always injects the same errors and delays.
+    """
+    # Delay of every answer and the maximum random delay which is added to it
+    latency_seconds: float = 0.0
+    jitter_seconds: float = 0.0
+    # Requests per second accepted by each service. None deactivates the rate limit
+    requests_per_second: float = None
+    # Number of requests which can be sent at once before the rate limit applies
+    burst: int = 1
+    # Share of the requests answered with a server error
+    error_rate: float = 0.0
+    seed: int = 0
+    # If they are set, the requests must send these keys
+    pons_api_key: str = None
+    deepl_api_key: str = None
+
+
+def invent_translations(word_or_phrase):
+    """
+    Translation returned for the words which aren't in the dictionary of the server
+    """
+    return [f'translation of {word_or_phrase}']
+
+
+class _RateLimiter:
+    """
+    Token bucket which allows a number of requests per second with bursts
+    """
+
+
+    def __init__(self, requests_per_second, burst, clock=time.monotonic):
+        self._requests_per_second = requests_per_second
+        self._burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self._burst)
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+
+    def try_acquire(self):
+        """
+        :return: 0 if the request is allowed. Otherwise the seconds until the next request is allowed
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._requests_per_second)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self._requests_per_second
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Answers the requests of OnlineDictionary and of DeepL's client. The translations are taken from the given
+    dictionary. PONS answers 204 for the words which aren't in it and DeepL invents a translation.
+    If the dictionary is empty, both services invent the translations.
+    """
+    daemon_threads = True
+
+
+    def __init__(self, server_address=('127.0.0.1', 0), settings=StandInServerSettings(),
+                 translations=None):
+        super().__init__(server_address, _StandInRequestHandler)
+        self.settings = settings
+        self.translations = translations or {}
+        self._random_generator = random.Random(settings.seed)
+        self._random_lock = threading.Lock()
+        self._forced_statuses = {PONS_SERVICE: deque(), DEEPL_SERVICE: deque()}
+        self._rate_limiters = {}
+        if settings.requests_per_second:
+            self._rate_limiters = {service: _RateLimiter(settings.requests_per_second, settings.burst)
+                                   for service in (PONS_SERVICE, DEEPL_SERVICE)}
+        self._statistics = Counter()
+        self._connection_count = 0
+        self._statistics_lock = threading.Lock()
+        self._thread = None
+
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+    def start_in_background(self):
+        """
+        Serves the requests in a daemon thread until close is called
+        :return: This server
+        """
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='stand-in-server', daemon=True)
+        self._thread.start()
+        return self
+
+
+    def close(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+
+    def force_statuses(self, service, *http_statuses):
+        """
+        The next requests of the service are answered with these statuses, one per request, before the
+        random errors and the rate limit are applied. 200 answers normally.
+        """
+        with self._random_lock:
+            self._forced_statuses[service].extend(http_statuses)
+
+
+    def statistics(self):
+        """
+        :return: Dictionary with the number of answers per service and HTTP status like 'pons 200'
+        """
+        with self._statistics_lock:
+            return {f'{service} {http_status}': count for (service, http_status), count in
+                    sorted(self._statistics.items())}
+
+
+    def connection_count(self):
+        """
+        :return: Number of connections opened by the clients. The clients with keep-alive reuse them
+        """
+        with self._statistics_lock:
+            return self._connection_count
+
+
+    def _count_connection(self):
+        with self._statistics_lock:
+            self._connection_count += 1
+
+
+    def _count_answer(self, service, http_status):
+        with self._statistics_lock:
+            self._statistics[(service, http_status)] += 1
+
+
+    def _choose_error_and_delay(self, service):
+        """
+        :return: Tuple (HTTP status of the injected error or None, delay in seconds)
+        """
+        with self._random_lock:
+            delay = self.settings.latency_seconds
+            if self.settings.jitter_seconds:
+                delay += self._random_generator.uniform(0, self.settings.jitter_seconds)
+            if self._forced_statuses[service]:
+                forced_status = self._forced_statuses[service].popleft()
+                return (None if forced_status == 200 else forced_status), delay
+            if self.settings.error_rate and self._random_generator.random() < self.settings.error_rate:
+                return self._random_generator.choice(INJECTED_ERROR_STATUSES), delay
+        return None, delay
+
+
+    def find_translations(self, word_or_phrase):
+        """
+        :return: List of translations or None if the word isn't in the dictionary of the server
+        """
+        if not self.translations:
+            return invent_translations(word_or_phrase)
+        return self.translations.get(word_or_phrase.strip())
+
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: StandInServer
+
+
+    def setup(self):
+        super().setup()
+        self.server._count_connection()
+
+
+    def log_message(self, format, *args):
+        logger.debug(f'{self.address_string()} {format % args}')
+
+
+    def _send(self, service, http_status, body=None, headers=None):
+        encoded_body = b'' if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        headers = dict(headers or {})
+        if encoded_body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            encoded_body = gzip.compress(encoded_body)
+            headers['Content-Encoding'] = 'gzip'
+        # The answer is counted before it is sent, so the client always sees it in the statistics
+        if service is not None:
+            self.server._count_answer(service, http_status)
+        self.send_response(http_status)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        for header_name, header_value in headers.items():
+            self.send_header(header_name, header_value)
+        self.send_header('Content-Length', str(len(encoded_body)))
+        self.end_headers()
+        if encoded_body and self.command != 'HEAD':
+            self.wfile.write(encoded_body)
+
+
+    def _apply_faults(self, service):
+        """
+        Waits the configured latency and answers with the injected error or the rate limit
+        :return: True if the request was already answered
+        """
+        http_status, delay = self.server._choose_error_and_delay(service)
+        if delay:
+            time.sleep(delay)
+        if http_status is not None:
+            self._send(service, http_status, {'message': f'Injected error {http_status}'})
+            return True
+        rate_limiter = self.server._rate_limiters.get(service)
+        if rate_limiter is not None:
+            waiting_seconds = rate_limiter.try_acquire()
+            if waiting_seconds:
+                self._send(service, 429, {'message': 'Too many requests'},
+                           {'Retry-After': str(max(1, round(waiting_seconds)))})
+                return True
+        return False
+
+
+    def _read_body(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(content_length) if content_length else b''
+
+
+    def do_GET(self):
+        split_url = urlsplit(self.path)
+        if split_url.path == STATISTICS_PATH:
+            self._send(None, 200, self.server.statistics())
+        elif split_url.path == PONS_DICTIONARY_PATH:
+            self._answer_pons(parse_qs(split_url.query))
+        else:
+            self._send(None, 404, {'message': f'Unknown path {split_url.path}'})
+
+
+    def do_POST(self):
+        split_url = urlsplit(self.path)
+        body = self._read_body()
+        if split_url.path == DEEPL_TRANSLATE_PATH:
+            self._answer_deepl(body)
+        else:
+            self._send(None, 404, {'message': f'Unknown path {split_url.path}'})
+
+
+    def _answer_pons(self, query_parameters):
+        expected_api_key = self.server.settings.pons_api_key
+        if expected_api_key is not None and self.headers.get('X-Secret') != expected_api_key:
+            self._send(PONS_SERVICE, 403, {'message': 'Invalid API key'})
+            return
+        if self._apply_faults(PONS_SERVICE):
+            return
+        word_or_phrase = query_parameters.get('q', [''])[0]
+        translations = self.server.find_translations(word_or_phrase)
+        if not word_or_phrase or not translations:
+            self._send(PONS_SERVICE, 204)
+            return
+        self._send(PONS_SERVICE, 200, [{
+            'lang': query_parameters.get('in', ['bg'])[0],
+            'hits': [{
+                'type': 'entry',
+                'opendict': False,
+                'roms': [{
+                    'headword': word_or_phrase,
+                    'arabs': [{
+                        'header': '',
+                        'translations': [{
+                            'source': f'<strong class="headword">{word_or_phrase}</strong>',
+                            'target': translation} for translation in translations]
+                    }]
+                }]
+            }]
+        }])
+
+
+    def _answer_deepl(self, body):
+        expected_api_key = self.server.settings.deepl_api_key
+        if expected_api_key is not None and \
+                self.headers.get('Authorization') != f'DeepL-Auth-Key {expected_api_key}':
+            self._send(DEEPL_SERVICE, 403, {'message': 'Invalid authentication key'})
+            return
+        if self._apply_faults(DEEPL_SERVICE):
+            return
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            request_data = json.loads(body.decode('utf-8') or '{}')
+        else:
+            request_data = parse_qs(body.decode('utf-8'))
+        texts = request_data.get('text')
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts or 'target_lang' not in request_data:
+            self._send(DEEPL_SERVICE, 400, {'message': 'The parameters text and target_lang are required'})
+            return
+        self._send(DEEPL_SERVICE, 200, {'translations': [{
+            'detected_source_language': 'BG',
+            'text': (self.server.find_translations(text) or invent_translations(text))[0],
+            'billed_characters': len(text)} for text in texts]})
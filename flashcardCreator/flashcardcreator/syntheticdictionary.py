@@ -0,0 +1,292 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Generates a grammatical dictionary with the schema of the database of rechnik.chitanka.info and invented
+# Bulgarian words. It allows running the tests and the benchmarks without downloading the real dictionary
+
+import configparser
+import logging
+import os
+import random
+import sqlite3
+from typing import NamedTuple
+
+from flashcardcreator.util import convert_to_absolute_path
+
+DEFAULT_WORD_COUNT = 10000
+# Share of the words whose forms have a changed stem
+DEFAULT_IRREGULAR_RATIO = 0.05
+# Share of the words whose name is also used by another word
+DEFAULT_HOMOGRAPH_RATIO = 0.02
+# Rows inserted with one statement
+_INSERT_CHUNK_SIZE = 10000
+SQL_INSERT_WORD = 'insert into word (id, name, type_id, meaning, chitanka_count) values (?, ?, ?, ?, ?);'
+SQL_INSERT_DERIVATIVE_FORM = 'insert into derivative_form (name, description, base_word_id) values (?, ?, ?);'
+
+SQL_CREATE_SYNTHETIC_DICTIONARY = '''
+    create table word_type (
+        id integer primary key,
+        name text not null,
+        speech_part text not null
+    );
+    create table word (
+        id integer primary key,
+        name text not null,
+        type_id integer not null,
+        meaning text,
+        chitanka_count integer
+    );
+    create table derivative_form (
+        id integer primary key,
+        name text not null,
+        description text not null,
+        base_word_id integer not null
+    );
+    '''
+
+# Speech parts of the configuration whose words have derivative forms, with the share of the generated words
+SPEECH_PARTS_WITH_DERIVATIVE_FORMS = {
+    'noun_female': 0.16,
+    'noun_male': 0.18,
+    'noun_neutral': 0.10,
+    'adjective': 0.16,
+    'verb_intransitive_imperfective': 0.06,
+    'verb_intransitive_terminative': 0.06,
+    'verb_transitive_imperfective': 0.07,
+    'verb_transitive_terminative': 0.07,
+    'verb': 0.005,
+    'pronominal_general': 0.0025,
+    'numeral_ordinal': 0.0025,
+}
+# Speech parts which don't have any derivative forms. Their type IDs aren't in the configuration
+SPEECH_PARTS_WITHOUT_DERIVATIVE_FORMS = {
+    'adverb': 0.05,
+    'conjunction': 0.005,
+    'preposition': 0.005,
+    'interjection': 0.005,
+    'particle': 0.005,
+    'name_city': 0.005,
+    'expression': 0.005,
+}
+_FIRST_TYPE_ID_WITHOUT_DERIVATIVE_FORMS = 1000
+
+# Suffixes of the forms of each speech part: (description, suffix). The root is the form of the word
+_NOUN_FEMALE_FORMS = (('ед.ч.', ''), ('ед.ч. членувано', 'та'), ('мн.ч.', 'и'),
+                      ('мн.ч. членувано', 'ите'), ('звателна форма', 'о'))
+_NOUN_MALE_FORMS = (('ед.ч.', ''), ('ед.ч. членувано', 'а'), ('ед.ч. пълен член', 'ът'),
+                    ('мн.ч.', 'ове'), ('мн.ч. членувано', 'овете'), ('бройна форма', 'а'),
+                    ('звателна форма', 'е'))
+_NOUN_NEUTRAL_FORMS = (('ед.ч.', ''), ('ед.ч. членувано', 'то'), ('мн.ч.', 'а'),
+                       ('мн.ч. членувано', 'ата'))
+_ADJECTIVE_FORMS = (('м.р.', ''), ('м.р. членувано', 'ия'), ('м.р. пълен член', 'ият'),
+                    ('ж.р.', 'а'), ('ж.р. членувано', 'ата'), ('ср.р.', 'о'),
+                    ('ср.р. членувано', 'ото'), ('мн.ч.', 'и'), ('мн.ч. членувано', 'ите'))
+_VERB_SUFFIXES = {
+    'сег.вр., 1л., ед.ч.': 'ам',
+    'сег.вр., 2л., ед.ч.': 'аш',
+    'сег.вр., 3л., ед.ч.': 'а',
+    'сег.вр., 1л., мн.ч.': 'аме',
+    'сег.вр., 2л., мн.ч.': 'ате',
+    'сег.вр., 3л., мн.ч.': 'ат',
+    'мин.св.вр., 1л., ед.ч.': 'ах',
+    'мин.св.вр., 2л., ед.ч.': 'а',
+    'мин.св.вр., 1л., мн.ч.': 'ахме',
+    'мин.св.вр., 3л., мн.ч.': 'аха',
+    'мин.несв.вр., 1л., ед.ч.': 'ах',
+    'мин.несв.вр., 2л., ед.ч.': 'аше',
+    'мин.несв.вр., 1л., мн.ч.': 'ахме',
+    'мин.несв.вр., 3л., мн.ч.': 'аха',
+    'повелително наклонение, ед.ч.': 'ай',
+    'повелително наклонение, мн.ч.': 'айте',
+    'мин.деят.св.прич. м.р.': 'ал',
+    'мин.деят.св.прич. ж.р.': 'ала',
+    'мин.деят.св.прич. ср.р.': 'ало',
+    'мин.деят.св.прич. мн.ч.': 'али',
+    'мин.деят.св.прич. м.р. пълен член': 'алият',
+    'мин.деят.несв.прич. м.р.': 'ал',
+    'мин.деят.несв.прич. мн.ч.': 'али',
+    'мин.страд.прич. м.р.': 'ан',
+    'мин.страд.прич. ср.р.': 'ано',
+    'сег.деят.прич. м.р.': 'ащ',
+    'деепричастие': 'айки',
+}
+_VERB_FORMS = tuple(_VERB_SUFFIXES.items())
+_SPEECH_PART_FORMS = {
+    'noun_female': _NOUN_FEMALE_FORMS,
+    'noun_male': _NOUN_MALE_FORMS,
+    'noun_neutral': _NOUN_NEUTRAL_FORMS,
+    'adjective': _ADJECTIVE_FORMS,
+    'pronominal_general': _ADJECTIVE_FORMS,
+    'numeral_ordinal': _ADJECTIVE_FORMS,
+}
+_ROOT_SUFFIXES = {
+    'noun_female': 'а',
+    'noun_neutral': 'о',
+    'adjective': 'ен',
+    'pronominal_general': 'ък',
+    'numeral_ordinal': 'и',
+}
+
+_CONSONANTS = 'бвгдзклмнпрстфхцчшж'
+_VOWELS = 'аеиоуъ'
+# Vowels which replace the last vowel of the stem of the irregular words
+_IRREGULAR_VOWEL_CHANGES = {'а': 'е', 'е': 'я', 'о': 'ъ', 'ъ': 'а', 'и': 'е', 'у': 'о'}
+_MEANING_WORDS = ('който', 'се', 'използва', 'за', 'на', 'в', 'дом', 'човек', 'време',
+                  'място', 'действие', 'състояние', 'предмет', 'вид', 'част', 'голям')
+
+logger = logging.getLogger(__name__)
+
+
+class GeneratedDictionary(NamedTuple):
+    word_count: int
+    derivative_form_count: int
+
+
+def read_word_type_ids(configuration_file=convert_to_absolute_path('configuration.ini')):
+    """
+    Returns the type IDs of the configuration, so the generated words use the same ones as the real dictionary
+    :return: Dictionary with the speech part as key and the list of type IDs as value
+    """
+    config = configparser.ConfigParser(interpolation=None)
+    if not config.read(configuration_file):
+        raise FileNotFoundError(f'The configuration {configuration_file} is missing')
+    return {speech_part: [int(type_id) for type_id in config[speech_part]]
+            for speech_part in SPEECH_PARTS_WITH_DERIVATIVE_FORMS
+            if speech_part in config}
+
+
+def _invent_stem(random_generator, used_stems):
+    while True:
+        syllables = random_generator.choice((1, 2, 2, 3))
+        stem = ''.join(random_generator.choice(_CONSONANTS) + random_generator.choice(_VOWELS)
+                       for _ in range(syllables)) + random_generator.choice(_CONSONANTS)
+        if stem not in used_stems:
+            used_stems.add(stem)
+            return stem
+
+
+def _change_last_vowel(stem):
+    for position in range(len(stem) - 1, -1, -1):
+        if stem[position] in _IRREGULAR_VOWEL_CHANGES:
+            return stem[:position] + _IRREGULAR_VOWEL_CHANGES[stem[position]] + stem[position + 1:]
+    return stem
+
+
+def _generate_forms(speech_part, stem, is_irregular):
+    """
+    :return: Name of the word and a list of tuples (form, description)
+    """
+    if speech_part.startswith('verb'):
+        forms = [(stem + suffix, description) for description, suffix in _VERB_FORMS]
+        if is_irregular:
+            # The aorist and the participles change the stem like in пека, пякох
+            forms = [(_change_last_vowel(stem) + suffix if description.startswith('мин.') else form, description)
+                     for (form, description), (_, suffix) in zip(forms, _VERB_FORMS)]
+        return forms[0][0], forms
+    if speech_part not in _SPEECH_PART_FORMS:
+        return stem, []
+    root = stem + _ROOT_SUFFIXES.get(speech_part, '')
+    forms = []
+    for description, suffix in _SPEECH_PART_FORMS[speech_part]:
+        if not suffix:
+            forms.append((root, description))
+        elif is_irregular and description.startswith('мн.ч.'):
+            forms.append((_change_last_vowel(stem) + suffix, description))
+        else:
+            forms.append(((root[:-1] if root[-1] in _VOWELS else root) + suffix, description))
+    return root, forms
+
+
+def _invent_meaning(random_generator):
+    if random_generator.random() < 0.4:
+        return None
+    return ' '.join(random_generator.choice(_MEANING_WORDS) for _ in range(random_generator.randint(2, 8)))
+
+
+def _choose_speech_part(random_generator):
+    speech_parts = list(SPEECH_PARTS_WITH_DERIVATIVE_FORMS) + list(SPEECH_PARTS_WITHOUT_DERIVATIVE_FORMS)
+    weights = list(SPEECH_PARTS_WITH_DERIVATIVE_FORMS.values()) + list(
+        SPEECH_PARTS_WITHOUT_DERIVATIVE_FORMS.values())
+    while True:
+        yield random_generator.choices(speech_parts, weights, k=1)[0]
+
+
+def generate_grammatical_dictionary(database_file, word_count=DEFAULT_WORD_COUNT, seed=0,
+                                    irregular_ratio=DEFAULT_IRREGULAR_RATIO,
+                                    homograph_ratio=DEFAULT_HOMOGRAPH_RATIO,
+                                    configuration_file=convert_to_absolute_path('configuration.ini')):
+    """
+    Creates a database with the tables word_type, word and derivative_form of the grammatical dictionary and
+    fills them with invented words. The same seed always generates the same words.
+
+    :param database_file: Required. New database file. It must not exist
+    :param word_count: Number of words. Each one has between 0 and 27 derivative forms
+    :param seed: Seed of the random generator
+    :param irregular_ratio: Share of the words whose forms change the stem
+    :param homograph_ratio: Share of the words which have the same name as a previous word of another type
+    :param configuration_file: Configuration with the type IDs of the speech parts
+    :return: GeneratedDictionary with the number of rows
+    """
+    if os.path.exists(database_file):
+        raise FileExistsError(f'The database {database_file} already exists')
+    word_type_ids = read_word_type_ids(configuration_file)
+    word_type_rows = [(type_id, str(type_id), speech_part)
+                      for speech_part, type_ids in word_type_ids.items() for type_id in type_ids]
+    for type_id, speech_part in enumerate(SPEECH_PARTS_WITHOUT_DERIVATIVE_FORMS,
+                                          start=_FIRST_TYPE_ID_WITHOUT_DERIVATIVE_FORMS):
+        word_type_ids[speech_part] = [type_id]
+        word_type_rows.append((type_id, speech_part, speech_part))
+
+    random_generator = random.Random(seed)
+    used_stems = set()
+    generated_stems = []
+    derivative_form_count = 0
+    with sqlite3.connect(database_file) as db_connection:
+        db_connection.execute('PRAGMA journal_mode = OFF;')
+        db_connection.execute('PRAGMA synchronous = OFF;')
+        db_connection.executescript(SQL_CREATE_SYNTHETIC_DICTIONARY)
+        db_connection.executemany('insert into word_type (id, name, speech_part) values (?, ?, ?);',
+                                  word_type_rows)
+        word_rows = []
+        form_rows = []
+        for word_id, speech_part in zip(range(1, word_count + 1), _choose_speech_part(random_generator)):
+            if generated_stems and random_generator.random() < homograph_ratio:
+                stem = random_generator.choice(generated_stems)
+            else:
+                stem = _invent_stem(random_generator, used_stems)
+                generated_stems.append(stem)
+            name, forms = _generate_forms(speech_part, stem,
+                                          random_generator.random() < irregular_ratio)
+            if speech_part.startswith('name_'):
+                name = name.capitalize()
+            # The frequency of the words follows Zipf's law like in the corpus of chitanka
+            chitanka_count = int(1000000 / (random_generator.random() * word_count + 1))
+            word_rows.append((word_id, name, random_generator.choice(word_type_ids[speech_part]),
+                              _invent_meaning(random_generator), chitanka_count))
+            form_rows.extend((form, description, word_id) for form, description in forms)
+            if len(form_rows) >= _INSERT_CHUNK_SIZE or word_id == word_count:
+                db_connection.executemany(SQL_INSERT_WORD, word_rows)
+                db_connection.executemany(SQL_INSERT_DERIVATIVE_FORM, form_rows)
+                derivative_form_count += len(form_rows)
+                word_rows.clear()
+                form_rows.clear()
+        db_connection.commit()
+    db_connection.close()
+    logger.info(f'The synthetic dictionary {database_file} has {word_count} words and '
+                f'{derivative_form_count} derivative forms')
+    return GeneratedDictionary(word_count, derivative_form_count)
@@ -0,0 +1,262 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# Stores the answers of the translation services in a local database, so the same word
+# isn't translated again by the online services
+
+import json
+import logging
+import threading
+import time
+import unicodedata
+from typing import NamedTuple
+
+import flashcardcreator.sqltracing
+from flashcardcreator.util import convert_to_absolute_path
+
+TRANSLATION_CACHE_LOCAL_FILENAME = convert_to_absolute_path(
+    'data/translation_cache.db')
+# Translations are kept 90 days. Words without any translation are searched again after 7 days
+DEFAULT_TIME_TO_LIVE_SECONDS = 90 * 24 * 60 * 60
+DEFAULT_NEGATIVE_TIME_TO_LIVE_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAXIMUM_ENTRIES = 100000
+# The size of the cache is checked after this number of new entries
+_EVICTION_INTERVAL = 100
+
+SQL_CREATE_TRANSLATION_CACHE = '''
+    create table if not exists translationCache (
+        provider text not null,
+        sourceLanguage text not null,
+        normalizedWord text not null,
+        translations text,
+        createdAt real not null,
+        lastAccessedAt real not null,
+        primary key (provider, sourceLanguage, normalizedWord)
+    ) without rowid;
+    create index if not exists translationCacheLastAccessedAt
+        on translationCache (lastAccessedAt);
+    '''
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_word_for_cache(word_or_phrase: str):
+    """
+    Returns the key used to store the translations of a word. The case and the white spaces
+    are not important.
+    :param word_or_phrase: Required. Word to translate
+    :return: Normalized word
+    """
+    return ' '.join(
+        unicodedata.normalize('NFC', word_or_phrase).lower().split())
+
+
+class CachedTranslation(NamedTuple):
+    """
+    Translations found in the cache. If the provider didn't have any translation, translations is None.
+    """
+    translations: list
+    created_at: float
+
+
+class TranslationCache:
+    """
+    Cache of the translations which is stored in a SQLite database. The entries expire after a time
+    to live and the least recently used entries are removed when the cache is full.
+    It can be used by many threads at the same time.
+    """
+
+
+    def __init__(self, database_file=TRANSLATION_CACHE_LOCAL_FILENAME,
+                 time_to_live_seconds=DEFAULT_TIME_TO_LIVE_SECONDS,
+                 negative_time_to_live_seconds=DEFAULT_NEGATIVE_TIME_TO_LIVE_SECONDS,
+                 maximum_entries=DEFAULT_MAXIMUM_ENTRIES,
+                 clock=time.time):
+        self._database_file = database_file
+        self._time_to_live_seconds = time_to_live_seconds
+        self._negative_time_to_live_seconds = negative_time_to_live_seconds
+        self._maximum_entries = maximum_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._new_entries_since_eviction = 0
+        self._connection = flashcardcreator.sqltracing.connect(
+            database_file, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode = WAL;')
+        self._connection.execute('PRAGMA synchronous = NORMAL;')
+        self._connection.executescript(SQL_CREATE_TRANSLATION_CACHE)
+        logger.debug(f'The translation cache {database_file} was opened')
+
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+    def _is_expired(self, translations, created_at, now):
+        if translations is None:
+            time_to_live = self._negative_time_to_live_seconds
+        else:
+            time_to_live = self._time_to_live_seconds
+        return created_at + time_to_live < now
+
+
+    def get(self, provider: str, source_language: str, word_or_phrase: str):
+        """
+        Searches the translations of the provider for the given word.
+
+        :param provider: Required. Name of the translation service
+        :param source_language: Required. Language of the word
+        :param word_or_phrase: Required. Word to translate
+        :return: None if the word isn't in the cache or expired. Otherwise a CachedTranslation
+        """
+        key = (provider, source_language,
+               normalize_word_for_cache(word_or_phrase))
+        now = self._clock()
+        with self._lock:
+            found_row = self._connection.execute('''
+                select translations, createdAt
+                from translationCache
+                where provider = ? and sourceLanguage = ? and normalizedWord = ?;
+                ''', key).fetchone()
+            if found_row is None:
+                return None
+            stored_translations, created_at = found_row
+            translations = None if stored_translations is None else json.loads(
+                stored_translations)
+            if self._is_expired(translations, created_at, now):
+                self._connection.execute('''
+                    delete from translationCache
+                    where provider = ? and sourceLanguage = ? and normalizedWord = ?;
+                    ''', key)
+                return None
+            self._connection.execute('''
+                update translationCache set lastAccessedAt = ?
+                where provider = ? and sourceLanguage = ? and normalizedWord = ?;
+                ''', (now,) + key)
+        logger.debug(
+            f'The translations of {provider} for {word_or_phrase} were found in the cache')
+        return CachedTranslation(translations, created_at)
+
+
+    def put(self, provider: str, source_language: str, word_or_phrase: str,
+            translations):
+        """
+        Stores the translations of the provider.
+
+        :param provider: Required. Name of the translation service
+        :param source_language: Required. Language of the word
+        :param word_or_phrase: Required. Translated word
+        :param translations: List of translations or None if the provider doesn't have any translation
+        """
+        stored_translations = None if translations is None else json.dumps(
+            list(translations), ensure_ascii=False)
+        now = self._clock()
+        with self._lock:
+            self._connection.execute('''
+                insert or replace into translationCache (provider, sourceLanguage, normalizedWord,
+                    translations, createdAt, lastAccessedAt)
+                values (?, ?, ?, ?, ?, ?);
+                ''', (provider, source_language,
+                      normalize_word_for_cache(word_or_phrase),
+                      stored_translations, now, now))
+            self._new_entries_since_eviction += 1
+            if self._new_entries_since_eviction >= _EVICTION_INTERVAL:
+                self._evict_least_recently_used()
+
+
+    def _evict_least_recently_used(self):
+        """
+        Removes the least recently used entries which exceed the maximum size. The caller must hold the lock.
+        """
+        self._new_entries_since_eviction = 0
+        deleted_rows = self._connection.execute('''
+            delete from translationCache
+            where lastAccessedAt <= (select lastAccessedAt from translationCache
+                                    order by lastAccessedAt desc
+                                    limit 1 offset ?);
+            ''', (self._maximum_entries,)).rowcount
+        if deleted_rows > 0:
+            logger.info(
+                f'{deleted_rows} translations were removed from the full cache')
+
+
+    def list_entries(self, provider=None, limit=None):
+        """
+        Returns the entries starting with the most recently used
+        :param provider: Optional. Only the entries of this provider are returned
+        :param limit: Optional. Maximum number of entries
+        :return: List of tuples (provider, sourceLanguage, normalizedWord, translations, createdAt, lastAccessedAt)
+        """
+        with self._lock:
+            return self._connection.execute('''
+                select provider, sourceLanguage, normalizedWord, translations, createdAt, lastAccessedAt
+                from translationCache
+                where :provider is null or provider = :provider
+                order by lastAccessedAt desc
+                limit coalesce(:limit, -1);
+                ''', {'provider': provider, 'limit': limit}).fetchall()
+
+
+    def statistics(self):
+        """
+        Returns the number of positive, negative and expired entries per provider
+        :return: List of tuples (provider, entries, entries without translations, expired entries)
+        """
+        now = self._clock()
+        with self._lock:
+            return self._connection.execute('''
+                select provider,
+                    count(1),
+                    sum(translations is null),
+                    sum(case when translations is null then createdAt + :negativeTimeToLive < :now
+                        else createdAt + :timeToLive < :now end)
+                from translationCache
+                group by provider
+                order by provider;
+                ''', {'now': now,
+                      'timeToLive': self._time_to_live_seconds,
+                      'negativeTimeToLive': self._negative_time_to_live_seconds}).fetchall()
+
+
+    def purge(self, expired_only=False, provider=None, word_or_phrase=None):
+        """
+        Removes entries from the cache
+        :param expired_only: If True, only the expired entries are removed
+        :param provider: Optional. Only the entries of this provider are removed
+        :param word_or_phrase: Optional. Only the entries of this word are removed
+        :return: Number of removed entries
+        """
+        now = self._clock()
+        normalized_word = None if word_or_phrase is None else normalize_word_for_cache(
+            word_or_phrase)
+        with self._lock:
+            return self._connection.execute('''
+                delete from translationCache
+                where (:provider is null or provider = :provider)
+                and (:normalizedWord is null or normalizedWord = :normalizedWord)
+                and (not :expiredOnly
+                    or (translations is null and createdAt + :negativeTimeToLive < :now)
+                    or (translations is not null and createdAt + :timeToLive < :now));
+                ''', {'provider': provider,
+                      'normalizedWord': normalized_word,
+                      'expiredOnly': expired_only,
+                      'now': now,
+                      'timeToLive': self._time_to_live_seconds,
+                      'negativeTimeToLive': self._negative_time_to_live_seconds}).rowcount
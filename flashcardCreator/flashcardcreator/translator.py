@@ -17,12 +17,28 @@
 #
 import configparser
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, \
+    TimeoutError as FutureTimeoutError
 from flashcardcreator.util import convert_to_absolute_path
-from flashcardcreator.ponsonlinedictionary import OnlineDictionary
-
-import deepl
+from flashcardcreator.profiling import profiled
+from flashcardcreator.ponsonlinedictionary import OnlineDictionary, \
+    PONS_DICTIONARY_PATH
+from flashcardcreator.translationcache import TranslationCache, \
+    normalize_word_for_cache
 
 API_KEYS_FILENAME = convert_to_absolute_path('apiKeys.ini')
+SOURCE_LANGUAGE = 'BG'
+TARGET_LANGUAGE = 'EN-GB'
+ONLINE_DICTIONARY_PROVIDER = 'pons'
+DEEPL_PROVIDER = 'deepl'
+# Maximum time to wait for the answer of each provider. Both providers are called at the same time.
+ONLINE_DICTIONARY_TIMEOUT_SECONDS = 10
+DEEPL_TIMEOUT_SECONDS = 15
+# Limits of one request to the DeepL API. The size of the request is kept below 128 KiB.
+DEEPL_MAXIMUM_TEXTS_PER_REQUEST = 50
+DEEPL_MAXIMUM_TEXT_BYTES_PER_REQUEST = 100 * 1024
 logger = logging.getLogger(__name__)
 
 
@@ -36,8 +52,14 @@ def init_function_create_deepl_translator():
     if not deepl_api_key:
         raise ValueError(
             "DeepL API key is not configured. Please visit https://www.deepl.com/pro-api and get a Free API key")
+    # Optional. It points the client to another server like the local stand-in server
+    deepl_base_url = api_keys_config[api_keys_config.default_section].get(
+        "deepl_base_url") or None
 
+    # DeepL's library is only loaded when something is translated
+    import deepl
     return deepl.Translator(auth_key=deepl_api_key,
+                            server_url=deepl_base_url,
                             send_platform_info=False).set_app_info("Flashcard "
                                                                    "Creator",
                                                                    '0.0.1')
@@ -54,39 +76,284 @@ def init_function_create_online_dictionary():
         logger.info(
             "PONs dictionary's API key is not configured. Please visit https://en.pons.com/p/online-dictionary/developers/api and get a Free API key")
         return None
-
+    dictionary_base_url = api_keys_config[
+        api_keys_config.default_section].get("pons_online_dictionary_base_url")
+    if dictionary_base_url:
+        return OnlineDictionary(
+            api_key=dictionary_api_key,
+            server_url=f'{dictionary_base_url.rstrip("/")}{PONS_DICTIONARY_PATH}')
     return OnlineDictionary(api_key=dictionary_api_key)
 
 
-# The following code will run when the module is imported
-free_translator = init_function_create_deepl_translator()
-online_dictionary = init_function_create_online_dictionary()
+def init_function_create_translation_cache():
+    logger.debug(
+        "Initialization function of the translation cache has been called.")
+    return TranslationCache()
+
+
+def init_function_create_provider_executor():
+    # The providers which didn't answer in time keep running here and store their answer in the cache
+    return ThreadPoolExecutor(max_workers=8,
+                              thread_name_prefix='translation-provider')
+
+
+TRANSLATION_CACHE_NAME = 'translation_cache'
+PROVIDER_EXECUTOR_NAME = 'provider_executor'
+
+
+class _ProviderRegistry:
+    """
+    Creates the clients of the translation services when they are used for the first time.
+    The commands which don't translate anything don't need the API keys or a network connection.
+    It can be used by many threads at the same time.
+    """
+
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._instances = {}
+
+
+    def get(self, name, init_function):
+        # The lock is only needed the first time
+        if name in self._instances:
+            return self._instances[name]
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = init_function()
+            return self._instances[name]
+
+
+    def close(self):
+        with self._lock:
+            translation_cache = self._instances.pop(TRANSLATION_CACHE_NAME,
+                                                    None)
+            if translation_cache is not None:
+                translation_cache.close()
+            provider_executor = self._instances.pop(PROVIDER_EXECUTOR_NAME,
+                                                    None)
+            if provider_executor is not None:
+                provider_executor.shutdown(wait=False, cancel_futures=True)
+            online_dictionary = self._instances.pop(ONLINE_DICTIONARY_PROVIDER,
+                                                    None)
+            if online_dictionary is not None:
+                online_dictionary.close()
+            self._instances.clear()
+
+
+_provider_registry = _ProviderRegistry()
+
+
+def get_free_translator():
+    return _provider_registry.get(DEEPL_PROVIDER,
+                                  init_function_create_deepl_translator)
+
+
+def get_online_dictionary():
+    """
+    :return: None if the online dictionary isn't configured
+    """
+    return _provider_registry.get(ONLINE_DICTIONARY_PROVIDER,
+                                  init_function_create_online_dictionary)
+
+
+def get_translation_cache():
+    return _provider_registry.get(TRANSLATION_CACHE_NAME,
+                                  init_function_create_translation_cache)
+
+
+def get_provider_executor():
+    return _provider_registry.get(PROVIDER_EXECUTOR_NAME,
+                                  init_function_create_provider_executor)
+
 
+def close_translation_providers():
+    """
+    Closes the translation cache and the connections to the online dictionary and stops the threads calling
+    the providers. They are created again if needed.
+    """
+    _provider_registry.close()
 
+
+@profiled('translation.pons')
+def _translate_with_online_dictionary(word_or_phrase_to_translate):
+    """
+    :return: None if the online dictionary doesn't have any translation. Otherwise a list of translations
+    """
+    return get_online_dictionary().get_target_single_word_translations_from(
+        word_or_phrase_to_translate)
+
+
+@profiled('translation.deepl')
+def _translate_with_deepl(word_or_phrase_to_translate):
+    """
+    :return: List of translations
+    """
+    deep_translation_result = get_free_translator().translate_text(
+        word_or_phrase_to_translate,
+        source_lang=SOURCE_LANGUAGE,
+        target_lang=TARGET_LANGUAGE)
+    if isinstance(deep_translation_result, list):
+        return [result.text for result in deep_translation_result]
+    return [deep_translation_result.text]
+
+
+def _split_in_deepl_requests(words_or_phrases):
+    """
+    Splits the texts in chunks which can be sent in one request to DeepL
+    :return: Generator of lists of texts
+    """
+    current_chunk = []
+    current_chunk_bytes = 0
+    for word_or_phrase in words_or_phrases:
+        word_bytes = len(word_or_phrase.encode('utf-8'))
+        if current_chunk and (
+                len(current_chunk) >= DEEPL_MAXIMUM_TEXTS_PER_REQUEST or
+                current_chunk_bytes + word_bytes > DEEPL_MAXIMUM_TEXT_BYTES_PER_REQUEST):
+            yield current_chunk
+            current_chunk = []
+            current_chunk_bytes = 0
+        current_chunk.append(word_or_phrase)
+        current_chunk_bytes += word_bytes
+    if current_chunk:
+        yield current_chunk
+
+
+@profiled('translation.deepl_batch')
+def translate_texts_with_deepl(words_or_phrases, use_cache=True):
+    """
+    Translates many words with a few requests to DeepL. The translations are stored in the translation cache.
+    If a request fails, its words are not included in the result and they can be translated one by one later.
+
+    :param words_or_phrases: Required. Iterable of words or phrases in Bulgarian
+    :param use_cache: If False, the translations in the cache are ignored
+    :return: Dictionary with the normalized word as key and the list of translations as value
+    """
+    deepl_translations = {}
+    words_to_translate = {}
+    for word_or_phrase in words_or_phrases:
+        normalized_word = normalize_word_for_cache(word_or_phrase)
+        if normalized_word in deepl_translations or normalized_word in words_to_translate:
+            continue
+        cached_translation = get_translation_cache().get(
+            DEEPL_PROVIDER, SOURCE_LANGUAGE,
+            normalized_word) if use_cache else None
+        if cached_translation is not None:
+            deepl_translations[normalized_word] = cached_translation.translations
+        else:
+            words_to_translate[normalized_word] = word_or_phrase.strip()
+
+    for chunk in _split_in_deepl_requests(list(words_to_translate.values())):
+        logger.debug(f"Translating {len(chunk)} texts in one request to DeepL")
+        try:
+            chunk_results = get_free_translator().translate_text(
+                chunk, source_lang=SOURCE_LANGUAGE,
+                target_lang=TARGET_LANGUAGE)
+        except Exception as e:
+            logger.warning(
+                f"{len(chunk)} texts couldn't be translated together by DeepL: {e}")
+            continue
+        for word_or_phrase, chunk_result in zip(chunk, chunk_results):
+            normalized_word = normalize_word_for_cache(word_or_phrase)
+            deepl_translations[normalized_word] = [chunk_result.text]
+            get_translation_cache().put(DEEPL_PROVIDER, SOURCE_LANGUAGE,
+                                        normalized_word, [chunk_result.text])
+    return deepl_translations
+
+
+def _find_translations_of_provider(provider, translate_function,
+                                   word_or_phrase_to_translate, use_cache):
+    """
+    Returns the translations of the provider. The translations are searched first in the cache.
+
+    :param provider: Required. Name of the provider used in the cache
+    :param translate_function: Required. Function which calls the provider
+    :param word_or_phrase_to_translate: Required.
+    :param use_cache: If False, the provider is always called but the cache is updated
+    :return: None if the provider doesn't have any translation. Otherwise a list of translations
+    """
+    if use_cache:
+        cached_translation = get_translation_cache().get(
+            provider, SOURCE_LANGUAGE, word_or_phrase_to_translate)
+        if cached_translation is not None:
+            return cached_translation.translations
+    translations = translate_function(word_or_phrase_to_translate)
+    get_translation_cache().put(provider, SOURCE_LANGUAGE,
+                                word_or_phrase_to_translate, translations)
+    return translations
+
+
+@profiled('translation')
 def translate_text_to_english(word_or_phrase_to_translate,
-                              debug_client_calls=False):
-    if online_dictionary is not None:
-        online_dictionary_translations = online_dictionary.get_target_single_word_translations_from(
-            word_or_phrase_to_translate)
-        if online_dictionary_translations is None:
-            logger.info(
-                f"The online dictionary don't contain any translation for {word_or_phrase_to_translate}")
-            online_dictionary_translations = []
-    else:
-        logger.info("The online dictionary is deactivated")
-        online_dictionary_translations = []
+                              debug_client_calls=False, use_cache=True,
+                              deepl_translations=None):
+    """
+    Translates the word using the online dictionary and DeepL. Both providers are called at the same time
+    and the translations are returned when both answered or a provider didn't answer in time.
+    The answers of the services are stored in the translation cache.
 
+    :param word_or_phrase_to_translate: Required. Word or phrase in Bulgarian
+    :param debug_client_calls: If True, the calls to DeepL are logged
+    :param use_cache: If False, the translations in the cache are ignored
+    :param deepl_translations: Optional. Translations of DeepL which were already found by translate_texts_with_deepl
+    :return: String with all translations separated by commas
+    :raises Exception: The error of the first provider if none of them answered in time
+    """
     if debug_client_calls:
         logging.getLogger('deepl').setLevel(logging.DEBUG)
     else:
         logging.getLogger('deepl').setLevel(logging.WARNING)
-    deep_translation_result = free_translator.translate_text(
-        word_or_phrase_to_translate,
-        source_lang='BG',
-        target_lang='EN-GB')
-    if isinstance(deep_translation_result, deepl.TextResult):
-        online_dictionary_translations.append(deep_translation_result.text)
-    elif isinstance(deep_translation_result, list):
-        online_dictionary_translations += [result.text for result in
-                                           deep_translation_result]
-    return ", ".join(set(online_dictionary_translations))
+
+    provider_calls = []
+    if get_online_dictionary() is not None:
+        provider_calls.append((ONLINE_DICTIONARY_PROVIDER,
+                               _translate_with_online_dictionary,
+                               ONLINE_DICTIONARY_TIMEOUT_SECONDS))
+    else:
+        logger.info("The online dictionary is deactivated")
+    provider_calls.append(
+        (DEEPL_PROVIDER, _translate_with_deepl, DEEPL_TIMEOUT_SECONDS))
+
+    start_time = time.monotonic()
+    pending_translations = []
+    for provider, translate_function, timeout_seconds in provider_calls:
+        if provider == DEEPL_PROVIDER and deepl_translations is not None:
+            future_translations = Future()
+            future_translations.set_result(deepl_translations)
+        else:
+            future_translations = get_provider_executor().submit(
+                _find_translations_of_provider, provider, translate_function,
+                word_or_phrase_to_translate, use_cache)
+        pending_translations.append(
+            (provider, future_translations, timeout_seconds))
+
+    all_translations = []
+    provider_errors = []
+    for provider, future_translations, timeout_seconds in pending_translations:
+        remaining_seconds = max(0.0,
+                                start_time + timeout_seconds - time.monotonic())
+        try:
+            translations = future_translations.result(timeout=remaining_seconds)
+        except FutureTimeoutError:
+            logger.warning(
+                f"The provider {provider} didn't answer in {timeout_seconds} seconds while translating {word_or_phrase_to_translate}")
+            provider_errors.append(TimeoutError(
+                f"The provider {provider} didn't answer in {timeout_seconds} seconds"))
+            continue
+        except Exception as e:
+            logger.error(
+                f"The provider {provider} failed to translate {word_or_phrase_to_translate}: {e}")
+            provider_errors.append(e)
+            continue
+        if translations is None:
+            logger.info(
+                f"The provider {provider} don't contain any translation for {word_or_phrase_to_translate}")
+        else:
+            all_translations += translations
+
+    # If no provider answered in time, the user must know what went wrong. An empty string means
+    # that the providers don't have any translation
+    if len(provider_errors) == len(pending_translations):
+        raise provider_errors[0]
+    # Remove the duplicates keeping the order
+    return ", ".join(dict.fromkeys(all_translations))
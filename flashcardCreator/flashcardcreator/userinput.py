@@ -18,16 +18,121 @@
 
 import logging
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor, wait
 from tkinter import simpledialog, ttk
 import flashcardcreator.util
+from flashcardcreator.profiling import profiled
 
 # Collection of methods which ask the user for input like the translation of a word and
 # what irregular declinations to import from a word
 
 _AUTOMATIC_WORD_TYPE = 'automatic'
+# The progress window is only shown if the background work takes longer
+_PROGRESS_WINDOW_DELAY_SECONDS = 0.2
+_EVENT_LOOP_INTERVAL_SECONDS = 0.02
 logger = logging.getLogger(__name__)
 
 
+class UserInterface:
+    """
+    Keeps one hidden Tk root and one progress window alive during the whole session, so the dialogs
+    don't create and destroy Tk every time they ask the user something. The slow lookups and translations
+    run in a background worker while the progress window is shown and the Tk event loop keeps running.
+    The Tk widgets are only used from the thread which created this object.
+    """
+
+
+    def __init__(self):
+        self._root = None
+        self._progress_window = None
+        self._progress_label = None
+        self._progress_bar = None
+        self._worker = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix='user-interface-worker')
+
+
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = tk.Tk()
+            self._root.withdraw()
+        return self._root
+
+
+    def _show_progress_window(self, message):
+        if self._progress_window is None:
+            self._progress_window = tk.Toplevel(self.root)
+            self._progress_window.title("Flash card creator")
+            self._progress_window.resizable(False, False)
+            # The window can't be closed while the worker is running
+            self._progress_window.protocol('WM_DELETE_WINDOW', lambda: None)
+            self._progress_label = tk.Label(self._progress_window, width=60)
+            self._progress_label.pack(padx=10, pady=5)
+            self._progress_bar = ttk.Progressbar(self._progress_window,
+                                                 mode='indeterminate',
+                                                 length=300)
+            self._progress_bar.pack(padx=10, pady=5)
+        self._progress_label['text'] = message
+        self._progress_window.deiconify()
+        self._progress_bar.start()
+
+
+    def _hide_progress_window(self):
+        self._progress_bar.stop()
+        self._progress_window.withdraw()
+
+
+    def run_in_background(self, message, function, *args, **kwargs):
+        """
+        Calls the function in the background worker and shows a progress window until it ends
+
+        :param message: Required. Text shown in the progress window
+        :param function: Required. It must not use any Tk widgets
+        :return: Result of the function. Its exceptions are raised again in the caller
+        """
+        future = self._worker.submit(function, *args, **kwargs)
+        wait([future], timeout=_PROGRESS_WINDOW_DELAY_SECONDS)
+        if not future.done():
+            logger.debug(f'Showing the progress window: {message}')
+            self._show_progress_window(message)
+            try:
+                while not future.done():
+                    self.root.update()
+                    wait([future], timeout=_EVENT_LOOP_INTERVAL_SECONDS)
+            finally:
+                self._hide_progress_window()
+        return future.result()
+
+
+    def close(self):
+        self._worker.shutdown(wait=True)
+        if self._root is not None:
+            self._root.destroy()
+            self._root = None
+            self._progress_window = None
+
+
+_user_interface = None
+
+
+def get_user_interface():
+    """
+    Returns the user interface of the session. It is created when it is used the first time
+    :rtype: UserInterface
+    """
+    global _user_interface
+    if _user_interface is None:
+        _user_interface = UserInterface()
+    return _user_interface
+
+
+def close_user_interface():
+    global _user_interface
+    if _user_interface is not None:
+        _user_interface.close()
+        _user_interface = None
+
+
 class ListDialog(simpledialog.Dialog):
     def __init__(self, parent, title, items):
         self.items = items
@@ -80,6 +185,119 @@ class EnterWordAndTypeDialog(tk.simpledialog.Dialog):
         self.result = (self.word_entry.get(), self.word_type_var.get())
 
 
+class ReviewDialog(simpledialog.Dialog):
+    """
+    Shows all the words of an import in one table. The user chooses the word of the grammatical dictionary
+    and edits the translation of each word before everything is imported together.
+    """
+    SKIP_WORD = 'Skip this word'
+
+
+    def __init__(self, parent, title, words, candidate_descriptions,
+                 translations):
+        self.words = words
+        self.candidate_descriptions = candidate_descriptions
+        self.chosen_candidates = [0 if candidates else None for candidates in
+                                  candidate_descriptions]
+        self.translations = [translation or '' for translation in translations]
+        self.selected_row = None
+        super().__init__(parent, title)
+
+
+    def body(self, master):
+        self.table = ttk.Treeview(master, columns=('word', 'candidate', 'translation'),
+                                  show='headings', height=20)
+        self.table.heading('word', text='Word')
+        self.table.heading('candidate', text='Word in the dictionary')
+        self.table.heading('translation', text='Translation')
+        self.table.column('candidate', width=400)
+        self.table.column('translation', width=300)
+        for row_index, word in enumerate(self.words):
+            self.table.insert('', tk.END, iid=str(row_index),
+                              values=self._row_values(row_index))
+        self.table.grid(row=0, column=0, columnspan=2)
+        self.table.bind('<<TreeviewSelect>>', self._show_selected_row)
+
+        tk.Label(master, text="Word in the dictionary:").grid(row=1, column=0)
+        self.candidate_combobox = ttk.Combobox(master, state="readonly", width=80)
+        self.candidate_combobox.grid(row=1, column=1)
+        self.candidate_combobox.bind('<<ComboboxSelected>>', self._update_selected_row)
+        tk.Label(master, text="Translation:").grid(row=2, column=0)
+        self.translation_entry = tk.Entry(master, width=80)
+        self.translation_entry.grid(row=2, column=1)
+        self.translation_entry.bind('<KeyRelease>', self._update_selected_row)
+        if self.words:
+            self.table.selection_set('0')
+        return self.translation_entry
+
+
+    def _row_values(self, row_index):
+        chosen_candidate = self.chosen_candidates[row_index]
+        if chosen_candidate is None:
+            candidate_description = self.SKIP_WORD
+        else:
+            candidate_description = self.candidate_descriptions[row_index][chosen_candidate]
+        return (self.words[row_index], candidate_description,
+                self.translations[row_index])
+
+
+    def _show_selected_row(self, event=None):
+        selection = self.table.selection()
+        if not selection:
+            return
+        self.selected_row = int(selection[0])
+        choices = self.candidate_descriptions[self.selected_row] + [self.SKIP_WORD]
+        self.candidate_combobox['values'] = choices
+        self._set_combobox_choice(choices)
+        self.translation_entry.delete(0, tk.END)
+        self.translation_entry.insert(0, self.translations[self.selected_row])
+
+
+    def _set_combobox_choice(self, choices):
+        chosen_candidate = self.chosen_candidates[self.selected_row]
+        self.candidate_combobox.current(
+            len(choices) - 1 if chosen_candidate is None else chosen_candidate)
+
+
+    def _update_selected_row(self, event=None):
+        if self.selected_row is None:
+            return
+        chosen_index = self.candidate_combobox.current()
+        if chosen_index >= len(self.candidate_descriptions[self.selected_row]):
+            self.chosen_candidates[self.selected_row] = None
+        elif chosen_index >= 0:
+            self.chosen_candidates[self.selected_row] = chosen_index
+        self.translations[self.selected_row] = self.translation_entry.get().strip()
+        self.table.item(str(self.selected_row),
+                        values=self._row_values(self.selected_row))
+
+
+    def apply(self):
+        self._update_selected_row()
+        self.result = list(zip(self.chosen_candidates, self.translations))
+
+
+@profiled('dialog.review_words')
+def ask_user_to_review_words(words, candidate_descriptions, translations):
+    """
+    Shows all words to import in one table, so the user confirms everything at once
+
+    :param words: Required. Words of the input file
+    :param candidate_descriptions: Required. For each word, the list of descriptions of the words of the
+        grammatical dictionary which can be imported. The first one is proposed
+    :param translations: Required. Proposed translation of each word or None
+    :return: List with a tuple (index of the chosen candidate or None to skip the word, translation)
+        for each word. None if the user cancelled the import
+    """
+    dialog = ReviewDialog(get_user_interface().root,
+                          "Review the words to import", words,
+                          candidate_descriptions, translations)
+    reviewed_words = dialog.result
+    logger.debug(f'The user reviewed the words {reviewed_words}')
+    return reviewed_words
+
+
+@profiled('dialog.translation')
 def ask_user_for_translation(word_original, translated_word_original):
     """Prompts the user to correct or complete the automatic translation of the original word
 
@@ -87,48 +305,43 @@ def ask_user_for_translation(word_original, translated_word_original):
     :param translated_word_original: Automatic translation
     :return: Final translation accepted by the user
     """
-    root = tk.Tk()
-    root.withdraw()  # Hide the main window
-
     final_translation = simpledialog.askstring("Flash card creator",
                                                f'Please write the final translation for {word_original}',
-                                               initialvalue=translated_word_original)
+                                               initialvalue=translated_word_original,
+                                               parent=get_user_interface().root)
     logger.debug(
         f'The user entered the final translation {final_translation} for {word_original}')
-    root.destroy()
     return final_translation
 
 
+@profiled('dialog.choose_word')
 def ask_user_to_choose_a_row(found_classified_words):
     """
     Asks the user to choose one of the words
     :param found_classified_words: List of words found
     :return: One row or None
     """
-    root = tk.Tk()
-    dialog = ListDialog(root, "Choose Element", found_classified_words)
+    dialog = ListDialog(get_user_interface().root, "Choose Element",
+                        found_classified_words)
     selected_word = dialog.result
     logger.debug(f'The selected word is {selected_word}')
-    root.destroy()
     return selected_word
 
 
+@profiled('dialog.enter_word')
 def ask_user_for_a_word_and_a_type():
     """
     Ask the user to enter a word and enter a word type if it don't want to choose it automatically
     The type can be None if the user selected "automatic'
     :return: (word, type) or None.
     """
-    root = tk.Tk()
-    root.withdraw()
-
-    enter_word_dialog = EnterWordAndTypeDialog(root, "Flash card creator")
+    enter_word_dialog = EnterWordAndTypeDialog(get_user_interface().root,
+                                               "Flash card creator")
     result = enter_word_dialog.result
     if result:
         word_to_import, word_type = result
         if word_type == _AUTOMATIC_WORD_TYPE:
             word_type = None
         logger.debug(f"Word entered {word_to_import} with type {word_type}")
-        root.destroy()
         return word_to_import, word_type
     return None
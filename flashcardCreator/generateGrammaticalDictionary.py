@@ -0,0 +1,69 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# This script creates a grammatical dictionary with invented words, so the flashcard creator, its tests and
+# its benchmarks can run without downloading the real dictionary
+
+import argparse
+import os
+import sys
+
+from flashcardcreator.syntheticdictionary import generate_grammatical_dictionary, \
+    DEFAULT_WORD_COUNT, DEFAULT_IRREGULAR_RATIO, DEFAULT_HOMOGRAPH_RATIO
+from installGrammaticalDictionary import GRAMMATICAL_DATABASE_LOCAL_FILENAME, \
+    create_grammar_database_indexes, create_form_index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='generateGrammaticalDictionary',
+        description='Creates a grammatical dictionary with invented Bulgarian words for offline tests and benchmarks')
+    parser.add_argument('-o', '--output-file', type=str, default=GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+                        help='Database file to create')
+    parser.add_argument('-n', '--word-count', type=int, default=DEFAULT_WORD_COUNT,
+                        help='Number of words. The real dictionary has about 100000 words')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='The same seed always creates the same words')
+    parser.add_argument('--irregular-ratio', type=float, default=DEFAULT_IRREGULAR_RATIO,
+                        help='Share of the words with irregular forms')
+    parser.add_argument('--homograph-ratio', type=float, default=DEFAULT_HOMOGRAPH_RATIO,
+                        help='Share of the words whose name is used by another word')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='Replaces the database file if it exists')
+    parser.add_argument('--without-indexes', action='store_true',
+                        help="Don't create the indexes and the index of the derivative forms")
+    global_arguments = parser.parse_args()
+    if global_arguments.word_count < 1:
+        parser.error('The parameter --word-count must be a positive number')
+    if os.path.exists(global_arguments.output_file):
+        if not global_arguments.force:
+            print(f'The file {global_arguments.output_file} already exists. Use --force to replace it')
+            sys.exit(2)
+        os.remove(global_arguments.output_file)
+
+    print(f'Generating {global_arguments.word_count} words. Please wait')
+    generated_dictionary = generate_grammatical_dictionary(global_arguments.output_file,
+                                                           global_arguments.word_count,
+                                                           global_arguments.seed,
+                                                           global_arguments.irregular_ratio,
+                                                           global_arguments.homograph_ratio)
+    print(f'The dictionary {global_arguments.output_file} has {generated_dictionary.word_count} words and '
+          f'{generated_dictionary.derivative_form_count} derivative forms')
+    if not global_arguments.without_indexes:
+        create_grammar_database_indexes(global_arguments.output_file)
+        create_form_index(global_arguments.output_file,
+                          os.path.splitext(global_arguments.output_file)[0] + '.formindex')
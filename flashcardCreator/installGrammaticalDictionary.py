@@ -18,11 +18,20 @@
 
 # This script downloads the dictionary data, creates a local database
 
+import argparse
 import gzip
+import hashlib
+import os
+import sys
+import tempfile
+import urllib.error
 import urllib.request
 import sqlite3
 from os.path import exists
 
+from flashcardcreator.formindex import build_form_index, open_form_index, \
+    FORM_INDEX_LOCAL_FILENAME
+
 # TODO Add logging replacing the print calls
 # TODO Move this module to a package in the main application
 
@@ -30,10 +39,26 @@ from os.path import exists
 # It moved it to my own hosting. It has the GPL 2 license
 GRAMMATICAL_DATABASE_URL = 'https://files.areko.consulting/rechnik.chitanka.info.bulgarian.db.sqlite.gz'
 GRAMMATICAL_DATABASE_LOCAL_FILENAME = 'data/grammatical_dictionary.db'
+# The manifest has the format of sha256sum and contains the SHA-256 of the uncompressed database
+GRAMMATICAL_DATABASE_MANIFEST_URL = f'{GRAMMATICAL_DATABASE_URL}.sha256'
+# Expected number of rows in the table derivative_form
+EXPECTED_DERIVATIVE_FORM_COUNT = 4013667
+INSTALLATION_METADATA_SCHEMA_VERSION = '1'
+# The download is processed in chunks of this size, so the memory used doesn't depend on the database size
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+
 
+# Indexes required by the searches of the flash card creator: (name, table, columns)
+GRAMMATICAL_DATABASE_INDEXES = (
+    ('derivative_form_name_idx', 'derivative_form', ('name',)),
+    ('derivative_form_base_word_id_idx', 'derivative_form',
+     ('base_word_id', 'id')),
+    ('word_name_idx', 'word', ('name',))
+)
 
-def run_count_sql_statement_using_config(sql_statement : str):
-    with sqlite3.connect(GRAMMATICAL_DATABASE_LOCAL_FILENAME) as db_connection:
+
+def run_count_sql_statement_using_config(sql_statement : str, database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+    with sqlite3.connect(database_file) as db_connection:
         db_cursor = db_connection.cursor()
         db_cursor.execute(sql_statement)
         firstRow = db_cursor.fetchone()
@@ -42,26 +67,228 @@ def run_count_sql_statement_using_config(sql_statement : str):
     return -1
 
 
-def was_grammar_database_imported():
+def read_installation_metadata(database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+    """
+    Returns the information stored by the installer in the grammatical database.
+    :return: Dictionary with the metadata. Empty if the database was installed by an older version
+    """
+    if run_count_sql_statement_using_config("SELECT count(1) FROM sqlite_schema WHERE type = 'table' AND name = "
+                                            "'installation_metadata';", database_file) != 1:
+        return {}
+    with sqlite3.connect(database_file) as db_connection:
+        return dict(db_connection.execute('SELECT key, value FROM installation_metadata;').fetchall())
+
+
+def write_installation_metadata(content_sha256=None, database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+    """
+    Stores the row counts, the schema version and the checksum of the downloaded database, so the
+    installation can be validated without counting all rows again.
     """
-    Checks if the database contains the expected number of derivative words.
+    metadata = {
+        'schema_version': INSTALLATION_METADATA_SCHEMA_VERSION,
+        'derivative_form_count': run_count_sql_statement_using_config('select count(1) from derivative_form',
+                                                                      database_file),
+        'word_count': run_count_sql_statement_using_config('select count(1) from word', database_file),
+        'content_sha256': content_sha256
+    }
+    with sqlite3.connect(database_file) as db_connection:
+        db_connection.execute('CREATE TABLE IF NOT EXISTS installation_metadata (key TEXT PRIMARY KEY, value TEXT);')
+        db_connection.executemany('INSERT OR REPLACE INTO installation_metadata (key, value) VALUES (?, ?);',
+                                  [(key, None if value is None else str(value)) for key, value in metadata.items()])
+        db_connection.commit()
+    return metadata
+
+
+def was_grammar_database_imported(deep_verify=False, database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+    """
+    Checks if the database contains the expected number of derivative words. Normally only the metadata
+    written by the installer is read.
+    :param deep_verify: If True, all derivative forms are counted and compared with the metadata
     :return: True if the database has the grammatical information
     """
-    if not exists(GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+    if not exists(database_file):
         return False
 
     if run_count_sql_statement_using_config("SELECT count(1) FROM sqlite_schema WHERE type = 'table' AND name = "
-                                      "'derivative_form';") != 1:
+                                      "'derivative_form';", database_file) != 1:
+        return False
+
+    metadata = read_installation_metadata(database_file)
+    if metadata and not deep_verify:
+        return metadata.get('schema_version') == INSTALLATION_METADATA_SCHEMA_VERSION and \
+            metadata.get('derivative_form_count') == str(EXPECTED_DERIVATIVE_FORM_COUNT)
+
+    print('Counting the derivative forms. Please wait')
+    derivative_words_count = run_count_sql_statement_using_config('select count(1) from derivative_form',
+                                                                  database_file)
+    if derivative_words_count != EXPECTED_DERIVATIVE_FORM_COUNT:
+        return False
+    if not metadata:
+        # The database was installed by an older version of the installer
+        write_installation_metadata(database_file=database_file)
+        return True
+    return metadata.get('derivative_form_count') == str(derivative_words_count)
+
+
+def _exists_index_starting_with(db_cursor, table_name, column_names):
+    """
+    Checks if the table has an index whose first columns are the given ones
+    """
+    db_cursor.execute(f'PRAGMA index_list({table_name});')
+    for index_row in db_cursor.fetchall():
+        index_name = index_row[1]
+        db_cursor.execute(f'PRAGMA index_info({index_name});')
+        indexed_columns = [column_row[2] for column_row in db_cursor.fetchall()]
+        if tuple(indexed_columns[:len(column_names)]) == column_names:
+            return True
+    return False
+
+
+def create_grammar_database_indexes(database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME):
+    """
+    Creates the indexes used by the searches if they don't exist and updates the statistics of the query planner.
+    :return: Number of created indexes
+    """
+    created_indexes = 0
+    with sqlite3.connect(database_file) as db_connection:
+        db_cursor = db_connection.cursor()
+        for index_name, table_name, column_names in GRAMMATICAL_DATABASE_INDEXES:
+            if _exists_index_starting_with(db_cursor, table_name, column_names):
+                print(f'The table {table_name} has already an index on {", ".join(column_names)}')
+                continue
+            print(f'Creating the index {index_name} on {table_name}({", ".join(column_names)}). Please wait')
+            db_cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({", ".join(column_names)});')
+            created_indexes += 1
+        db_cursor.execute("SELECT count(1) FROM sqlite_schema WHERE type = 'table' AND name = 'sqlite_stat1';")
+        statistics_exist, = db_cursor.fetchone()
+        if created_indexes or not statistics_exist:
+            print('Analyzing the tables for the query planner')
+            db_cursor.execute('ANALYZE;')
+        db_connection.commit()
+    return created_indexes
+
+
+class _CountingReader:
+    """
+    Counts the bytes read from the download to show the progress
+    """
+
+
+    def __init__(self, stream, total_bytes=None):
+        self._stream = stream
+        self.total_bytes = total_bytes
+        self.read_bytes = 0
+
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.read_bytes += len(data)
+        return data
+
+
+def _print_progress(counting_reader, written_bytes):
+    message = f'\rDownloaded {counting_reader.read_bytes // (1024 * 1024)} MB'
+    if counting_reader.total_bytes:
+        message += f' of {counting_reader.total_bytes // (1024 * 1024)} MB ' \
+                   f'({100 * counting_reader.read_bytes // counting_reader.total_bytes}%)'
+    message += f', uncompressed {written_bytes // (1024 * 1024)} MB'
+    print(message, end='', flush=True)
+
+
+def save_uncompressed_stream(compressed_stream, target_file, total_compressed_bytes=None):
+    """
+    Uncompresses the gzip stream into the open target file using a buffer of fixed size.
+
+    :param compressed_stream: Required. Stream with the gzip data
+    :param target_file: Required. File open in binary mode
+    :param total_compressed_bytes: Optional. Size of the download to show the progress
+    :return: SHA-256 of the uncompressed data as hexadecimal string
+    """
+    counting_reader = _CountingReader(compressed_stream, total_compressed_bytes)
+    sha256 = hashlib.sha256()
+    written_bytes = 0
+    with gzip.GzipFile(fileobj=counting_reader) as compressed_file:
+        while True:
+            chunk = compressed_file.read(DOWNLOAD_BUFFER_SIZE)
+            if not chunk:
+                break
+            target_file.write(chunk)
+            sha256.update(chunk)
+            written_bytes += len(chunk)
+            _print_progress(counting_reader, written_bytes)
+    print()
+    return sha256.hexdigest()
+
+
+def install_database_file(compressed_stream, expected_sha256, database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+                          total_compressed_bytes=None):
+    """
+    Uncompresses the database into a temporary file in the same directory and renames it to the database file
+    only if its checksum is correct. The existing database file is never left half written.
+
+    :param compressed_stream: Required. Stream with the gzip data
+    :param expected_sha256: SHA-256 of the uncompressed database. If it is None, the checksum isn't verified
+    :param database_file: Final location of the database
+    :param total_compressed_bytes: Optional. Size of the download to show the progress
+    :return: SHA-256 of the installed database or None if it wasn't installed
+    """
+    database_directory = os.path.dirname(os.path.abspath(database_file))
+    temporary_file = tempfile.NamedTemporaryFile(dir=database_directory,
+                                                 prefix=os.path.basename(database_file) + '.',
+                                                 suffix='.download', delete=False)
+    try:
+        with temporary_file:
+            print(f'Saving data to {temporary_file.name}')
+            calculated_sha256 = save_uncompressed_stream(compressed_stream, temporary_file,
+                                                         total_compressed_bytes)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        if expected_sha256 is not None and calculated_sha256 != expected_sha256.lower():
+            print(f'The checksum of the downloaded database {calculated_sha256} is different from '
+                  f'the published one {expected_sha256}')
+            os.remove(temporary_file.name)
+            return None
+        os.replace(temporary_file.name, database_file)
+    except BaseException:
+        if exists(temporary_file.name):
+            os.remove(temporary_file.name)
+        raise
+    print(f'The database was saved to {database_file}')
+    return calculated_sha256
+
+
+def create_form_index(database_file=GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+                      index_file=FORM_INDEX_LOCAL_FILENAME):
+    """
+    Creates the memory-mapped index of the derivative forms if it is missing or older than the database.
+    It must run after all changes to the database.
+    :return: True if the index was created
+    """
+    form_index = open_form_index(database_file, index_file)
+    if form_index is not None:
+        form_index.close()
         return False
+    print(f'Creating the index of the derivative forms {index_file}. Please wait')
+    build_form_index(database_file, index_file)
+    return True
+
 
-    derivative_words_count = run_count_sql_statement_using_config('select count(1) from derivative_form')
-    return derivative_words_count == 4013667
+def read_expected_sha256(manifest_content: str):
+    """
+    Returns the checksum of a manifest in the format of sha256sum
+    """
+    for line in manifest_content.splitlines():
+        if line.strip():
+            return line.split()[0]
+    raise ValueError('The manifest of the grammatical database is empty')
 
 
-def download_import_grammar_database():
+def download_import_grammar_database(verify_checksum=True, deep_verify=False):
     print("Checking if the grammatical database was already downloaded.")
-    if was_grammar_database_imported():
+    if was_grammar_database_imported(deep_verify):
         print('The grammatical database was already imported')
+        create_grammar_database_indexes()
+        create_form_index()
         return True
 
     print('Downloading the database with the grammatical classification')
@@ -74,20 +301,46 @@ def download_import_grammar_database():
     opener = urllib.request.build_opener(auth_handler)
     urllib.request.install_opener(opener)
 
-    with urllib.request.urlopen(GRAMMATICAL_DATABASE_URL) as url_downloader_response, gzip.GzipFile(fileobj=url_downloader_response) as compressed_file:
-        print(f'Downloading {GRAMMATICAL_DATABASE_URL}. Please wait 3-5 minutes')
-        uncompressed_dbdump_data = compressed_file.read()
+    expected_sha256 = None
+    if verify_checksum:
+        print(f'Downloading the checksum from {GRAMMATICAL_DATABASE_MANIFEST_URL}')
+        try:
+            with urllib.request.urlopen(GRAMMATICAL_DATABASE_MANIFEST_URL) as manifest_response:
+                expected_sha256 = read_expected_sha256(manifest_response.read().decode('utf-8'))
+        except (urllib.error.URLError, ValueError) as e:
+            print(f"The checksum couldn't be downloaded: {e}. "
+                  f"Please try again later or run this script with --skip-checksum to install the database without verifying it")
+            return False
 
-        with open(GRAMMATICAL_DATABASE_LOCAL_FILENAME, 'wb+') as uncompressed_database_file:
-            print(f'Saving data to {uncompressed_database_file.name}')
-            uncompressed_database_file.write(uncompressed_dbdump_data)
+    with urllib.request.urlopen(GRAMMATICAL_DATABASE_URL) as url_downloader_response:
+        print(f'Downloading {GRAMMATICAL_DATABASE_URL}. Please wait 3-5 minutes')
+        content_length = url_downloader_response.headers.get('Content-Length')
+        content_sha256 = install_database_file(url_downloader_response, expected_sha256,
+                                               total_compressed_bytes=int(content_length) if content_length else None)
+        if content_sha256 is None:
+            return False
 
     print('Checking if the database was correctly downloaded')
-    return was_grammar_database_imported()
+    write_installation_metadata(content_sha256)
+    if not was_grammar_database_imported():
+        return False
+    create_grammar_database_indexes()
+    create_form_index()
+    return True
 
 
 # Main body
-if not download_import_grammar_database():
-    exit(2)
-else:
-    print('Now you can start using the flash creator')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='installGrammaticalDictionary',
+        description='Downloads the grammatical dictionary and creates the indexes used by the flashcard creator')
+    parser.add_argument('--skip-checksum', action='store_true',
+                        help="Don't verify the SHA-256 of the downloaded database against the published manifest")
+    parser.add_argument('--deep-verify', action='store_true',
+                        help='Count all rows of the installed database instead of only reading the metadata')
+    global_arguments = parser.parse_args()
+    if not download_import_grammar_database(verify_checksum=not global_arguments.skip_checksum,
+                                            deep_verify=global_arguments.deep_verify):
+        sys.exit(2)
+    else:
+        print('Now you can start using the flash creator')
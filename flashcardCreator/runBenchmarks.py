@@ -0,0 +1,104 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# This script measures the speed of the flashcard creator without network access and writes the results as JSON.
+# Without a grammatical dictionary, a synthetic one is generated
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from flashcardcreator.benchmark import run_benchmarks, compare_benchmark_results, \
+    DEFAULT_SAMPLES, DEFAULT_PARSED_LINES, DEFAULT_IMPORTED_LINES
+from flashcardcreator.syntheticdictionary import generate_grammatical_dictionary
+from installGrammaticalDictionary import create_grammar_database_indexes, \
+    create_form_index
+
+DEFAULT_SYNTHETIC_WORD_COUNT = 20000
+
+parser = argparse.ArgumentParser(
+    prog='runBenchmarks',
+    description='Measures the searches in the grammatical dictionary and the import of files')
+parser.add_argument('-g', '--grammatical-database', type=str,
+                    help='Grammatical dictionary to use. By default, a synthetic one is generated')
+parser.add_argument('-i', '--index-file', type=str,
+                    help='Index of the derivative forms of the grammatical dictionary')
+parser.add_argument('-n', '--word-count', type=int, default=DEFAULT_SYNTHETIC_WORD_COUNT,
+                    help='Number of words of the synthetic grammatical dictionary')
+parser.add_argument('-s', '--samples', type=int, default=DEFAULT_SAMPLES,
+                    help='Number of searches of each benchmark')
+parser.add_argument('--parsed-lines', type=int, default=DEFAULT_PARSED_LINES,
+                    help='Number of lines parsed by the benchmark of parse_line')
+parser.add_argument('--imported-lines', type=int, default=DEFAULT_IMPORTED_LINES,
+                    help='Number of lines of the imported file')
+parser.add_argument('--seed', type=int, default=0,
+                    help='Seed of the synthetic dictionary and of the chosen words')
+parser.add_argument('-o', '--output-file', type=str,
+                    help='The results are written to this JSON file. By default, they are printed')
+parser.add_argument('-c', '--compare', dest='previous_results_file', type=str,
+                    help='JSON file of a previous run whose results are compared with this one')
+global_arguments = parser.parse_args()
+if global_arguments.samples < 1:
+    parser.error('The parameter --samples must be a positive number')
+if global_arguments.grammatical_database and not os.path.exists(global_arguments.grammatical_database):
+    parser.error(f'The grammatical dictionary {global_arguments.grammatical_database} is missing')
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+# The warnings of the imported words would hide the progress
+logging.getLogger('flashcardcreator').setLevel(logging.ERROR)
+logging.getLogger('flashcardcreator.benchmark').setLevel(logging.INFO)
+
+with tempfile.TemporaryDirectory(prefix='flashcard-benchmark-') as scratch_directory:
+    grammatical_database_file = global_arguments.grammatical_database
+    index_file = global_arguments.index_file
+    if grammatical_database_file is None:
+        grammatical_database_file = os.path.join(scratch_directory, 'grammatical_dictionary.db')
+        index_file = os.path.join(scratch_directory, 'grammatical_dictionary.formindex')
+        print(f'Generating a synthetic grammatical dictionary with {global_arguments.word_count} words',
+              file=sys.stderr)
+        generate_grammatical_dictionary(grammatical_database_file, global_arguments.word_count,
+                                        global_arguments.seed)
+        # The synthetic dictionary has the same indexes as an installed one. The results may be printed
+        with contextlib.redirect_stdout(sys.stderr):
+            create_grammar_database_indexes(grammatical_database_file)
+            create_form_index(grammatical_database_file, index_file)
+    benchmark_results = run_benchmarks(grammatical_database_file, scratch_directory, index_file,
+                                       global_arguments.samples, global_arguments.parsed_lines,
+                                       global_arguments.imported_lines, global_arguments.seed)
+    if global_arguments.grammatical_database is None:
+        benchmark_results['grammatical_database'] = f'synthetic, {global_arguments.word_count} words'
+
+if global_arguments.output_file:
+    with open(global_arguments.output_file, 'w') as output_file:
+        json.dump(benchmark_results, output_file, indent=2)
+    print(f'The results were written to {global_arguments.output_file}', file=sys.stderr)
+else:
+    print(json.dumps(benchmark_results, indent=2))
+
+if global_arguments.previous_results_file:
+    with open(global_arguments.previous_results_file, 'r') as previous_results_file:
+        previous_results = json.load(previous_results_file)
+    print(f"Compared with the commit {previous_results.get('git_commit')}:", file=sys.stderr)
+    for metric, previous_value, current_value, change in compare_benchmark_results(previous_results,
+                                                                                   benchmark_results):
+        shown_change = 'n/a' if change is None else f'{change:+.1f}%'
+        print(f'{metric}: {previous_value:.4g} -> {current_value:.4g} ({shown_change})', file=sys.stderr)
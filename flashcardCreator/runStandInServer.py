@@ -0,0 +1,83 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# This script starts a local server which answers like PONS and DeepL, so the translations can be tested
+# without network access. Point the clients to it with the base URLs in apiKeys.ini
+
+import argparse
+import json
+import logging
+
+from flashcardcreator.standinserver import StandInServer, StandInServerSettings
+
+parser = argparse.ArgumentParser(
+    prog='runStandInServer',
+    description='Local server with the APIs of PONS and DeepL used by the flashcard creator')
+parser.add_argument('--host', type=str, default='127.0.0.1')
+parser.add_argument('-p', '--port', type=int, default=8765)
+parser.add_argument('-l', '--latency-ms', type=float, default=0,
+                    help='Delay of every answer')
+parser.add_argument('-j', '--jitter-ms', type=float, default=0,
+                    help='Maximum random delay added to every answer')
+parser.add_argument('-r', '--requests-per-second', type=float,
+                    help='Requests per second accepted by each service. Other requests get 429')
+parser.add_argument('-b', '--burst', type=int, default=1,
+                    help='Requests which can be sent at once before the rate limit applies')
+parser.add_argument('-e', '--error-rate', type=float, default=0,
+                    help='Share of the requests answered with 500, 502 or 503')
+parser.add_argument('-s', '--seed', type=int, default=0,
+                    help='The same seed injects the same errors and delays')
+parser.add_argument('-t', '--translations-file', type=str,
+                    help='JSON file with the Bulgarian words as keys and lists of translations as values. '
+                         'Without it, every word gets an invented translation')
+parser.add_argument('--pons-api-key', type=str,
+                    help='If it is set, the requests to PONS must send this key')
+parser.add_argument('--deepl-api-key', type=str,
+                    help='If it is set, the requests to DeepL must send this key')
+parser.add_argument('-v', '--verbose', action='store_true',
+                    help='Shows every request')
+global_arguments = parser.parse_args()
+if not 0 <= global_arguments.error_rate <= 1:
+    parser.error('The parameter --error-rate must be between 0 and 1')
+
+logging.basicConfig(level=logging.DEBUG if global_arguments.verbose else logging.INFO)
+translations = None
+if global_arguments.translations_file:
+    with open(global_arguments.translations_file, 'r') as translations_file:
+        translations = json.load(translations_file)
+
+server = StandInServer((global_arguments.host, global_arguments.port),
+                       StandInServerSettings(latency_seconds=global_arguments.latency_ms / 1000,
+                                             jitter_seconds=global_arguments.jitter_ms / 1000,
+                                             requests_per_second=global_arguments.requests_per_second,
+                                             burst=global_arguments.burst,
+                                             error_rate=global_arguments.error_rate,
+                                             seed=global_arguments.seed,
+                                             pons_api_key=global_arguments.pons_api_key,
+                                             deepl_api_key=global_arguments.deepl_api_key),
+                       translations)
+print(f'Serving PONS and DeepL on {server.base_url}. Add to apiKeys.ini:\n'
+      f'deepl_base_url={server.base_url}\n'
+      f'pons_online_dictionary_base_url={server.base_url}\n'
+      f'The statistics are shown on {server.base_url}/stats. Press Ctrl+C to stop')
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    print(f'Answers: {server.statistics()}')
+finally:
+    server.server_close()
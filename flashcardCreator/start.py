@@ -23,10 +23,23 @@ import argparse
 import logging.config
 from tkinter import messagebox
 
+from flashcardcreator.exporter import export_pending_cards, \
+    get_read_answer_file_path
 from flashcardcreator.main import set_flashcard_database, \
+    close_flashcard_database, get_flashcard_store, \
     load_logging_configuration, WordFinder, \
-    import_words_from_text_file
-from flashcardcreator.userinput import ask_user_for_a_word_and_a_type
+    import_words_from_text_file, DEFAULT_PREFETCH_LINES, \
+    check_grammatical_dictionary_query_plans, close_form_index, \
+    search_word_in_background
+from flashcardcreator.profiling import start_profiling, \
+    get_profile_summary, format_profile_summary, write_profile_json
+from flashcardcreator.resolution import AMBIGUITY_POLICIES, \
+    TRANSLATION_POLICIES
+from flashcardcreator.sqltracing import enable_sql_tracing, \
+    DEFAULT_SLOW_STATEMENT_SECONDS
+from flashcardcreator.translator import close_translation_providers
+from flashcardcreator.userinput import ask_user_for_a_word_and_a_type, \
+    get_user_interface, close_user_interface
 from flashcardcreator.util import OTHER_WORD_TYPES
 
 logger = logging.getLogger(__name__)
@@ -40,9 +53,19 @@ parser.add_argument('-v', '--verbose', action='store_true',
                     help='Shows what the flash generator is doing')
 parser.add_argument('-vv', '--debug', action='store_true',
                     help='Shows debug information')
+parser.add_argument('--profile', action='store_true',
+                    help='Shows at the end how long the searches, translations, dialogs and inserts took')
+parser.add_argument('--profile-json', dest='profile_json_path', type=str,
+                    metavar='FILE',
+                    help='Writes the times of --profile to this JSON file')
+parser.add_argument('--trace-sql', action='store_true',
+                    help='Logs the slow SQL statements with their parameters. With -vv all statements are logged')
+parser.add_argument('--slow-sql-ms', dest='slow_sql_milliseconds', type=float,
+                    default=DEFAULT_SLOW_STATEMENT_SECONDS * 1000, metavar='N',
+                    help='SQL statements which take longer than N milliseconds are slow')
 
 group_word_source = parser.add_argument_group('Word source',
-                                              'Where does the word(s) come from?')
+                                              'Where does the word(s) come from? Or export the flashcards')
 exclusive_group_word_source = group_word_source.add_mutually_exclusive_group(
     required=True)
 exclusive_group_word_source.add_argument('-a', '--ask-word-continuously',
@@ -55,10 +78,52 @@ exclusive_group_word_source.add_argument('-i', '--input-file',
                                          dest='input_file_path',
                                          type=str,
                                          help='A file with words to import. It must exist. Please check the file format in the documentation.')
+exclusive_group_word_source.add_argument('-e', '--export-file',
+                                         dest='export_file_path',
+                                         type=str,
+                                         metavar='FILE',
+                                         help='Exports the flashcards which were not exported yet to a tab separated file for Anki and marks them as exported. The cards with an answer to read are written to FILE-read.')
 parser.add_argument('-o', '--output-file',
                     dest='output_file_path',
                     type=str,
                     help='A file where you want to store the results of the import. If it exists, the lines will be appended."')
+parser.add_argument('-b', '--batch-size',
+                    dest='batch_size',
+                    type=int,
+                    default=1,
+                    metavar='N',
+                    help='When importing a file, commit the flashcards of N words together in one transaction. A failing word only rolls back its own flashcards.')
+parser.add_argument('-p', '--prefetch-lines',
+                    dest='prefetch_lines',
+                    type=int,
+                    default=DEFAULT_PREFETCH_LINES,
+                    metavar='K',
+                    help='When importing a file, search and translate the next K lines in the background. 0 deactivates it.')
+parser.add_argument('--no-batch-translation',
+                    dest='batch_translation',
+                    action='store_false',
+                    help="When importing a file, don't translate the words with DeepL in a few requests before the import. Each word is translated when it is imported.")
+group_non_interactive = parser.add_argument_group(
+    'Non-interactive import',
+    'Imports a file without asking the user. The lines which need a decision are written to a review file')
+group_non_interactive.add_argument('-n', '--non-interactive',
+                                   action='store_true',
+                                   help="When importing a file, don't show any dialogs and decide with the policies")
+group_non_interactive.add_argument('--ambiguity-policy',
+                                   choices=list(AMBIGUITY_POLICIES),
+                                   default='first',
+                                   help='What to do when many words of the grammatical dictionary match. skip sends the line to review')
+group_non_interactive.add_argument('--translation-policy',
+                                   choices=list(TRANSLATION_POLICIES),
+                                   default='machine',
+                                   help='What to do when a line has no translation. skip sends the line to review')
+group_non_interactive.add_argument('-r', '--review-file',
+                                   dest='review_file_path',
+                                   type=str,
+                                   help='The lines to review are appended to this file. By default, they are written to the output file')
+parser.add_argument('--deferred-review',
+                    action='store_true',
+                    help='When importing a file, search and translate all words first and review them together in one table')
 parser.add_argument('-t', '--other-word-type',
                     choices=OTHER_WORD_TYPES,
                     help='If the word cannot be found in the grammar dictionary, imports it with this word type')
@@ -70,21 +135,43 @@ if global_arguments.ask_word_continuously and global_arguments.other_word_type i
         "The parameter --other-word-type can only be used when only word is imported")
 if global_arguments.input_file_path and global_arguments.output_file_path is None:
     parser.error("The parameter --output-file is missing")
+if global_arguments.non_interactive and not global_arguments.input_file_path:
+    parser.error("The parameter --non-interactive can only be used with --input-file")
+if global_arguments.deferred_review and not global_arguments.input_file_path:
+    parser.error("The parameter --deferred-review can only be used with --input-file")
+if global_arguments.deferred_review and global_arguments.non_interactive:
+    parser.error("The parameters --deferred-review and --non-interactive can't be used together")
+if global_arguments.batch_size < 1:
+    parser.error("The parameter --batch-size must be a positive number")
+if global_arguments.prefetch_lines < 0:
+    parser.error("The parameter --prefetch-lines can't be negative")
 
-set_flashcard_database(global_arguments.flashcard_database)
+if global_arguments.slow_sql_milliseconds < 0:
+    parser.error("The parameter --slow-sql-ms can't be negative")
+
+if global_arguments.profile or global_arguments.profile_json_path:
+    start_profiling()
 load_logging_configuration(debug=global_arguments.debug,
                            verbose=global_arguments.verbose)
+if global_arguments.trace_sql:
+    enable_sql_tracing(global_arguments.slow_sql_milliseconds / 1000,
+                       log_all_statements=global_arguments.debug)
+set_flashcard_database(global_arguments.flashcard_database)
+check_grammatical_dictionary_query_plans()
 
 
-def find_word_and_create_flashcards(word_to_import, other_word_type):
+def find_word_and_create_flashcards(word_to_import, other_word_type,
+                                    prefetched_line=None):
     """
     Finds and creates the flashcards for the given word
     :param other_word_type: Type of the word if it isn't found in the grammar dictionary
     :param word_to_import: Flashcards will be created for this word
+    :param prefetched_line: Optional. PrefetchedLine with the rows and the translation found in the background
     :return: None if the word wasn't found. True if the flash card was created. False if the creation was aborted.
     """
     found_word = WordFinder.find_word_with_english_translation(word_to_import,
-                                                               other_word_type)
+                                                               other_word_type,
+                                                               prefetched_line=prefetched_line)
     if found_word is None or found_word.exists_flashcard_for_this_word():
         return None
     if not found_word.create_flashcard():
@@ -95,25 +182,59 @@ def find_word_and_create_flashcards(word_to_import, other_word_type):
 
 def show_word_not_found_dialog(word):
     message = f"The word {word} cannot be found or has already flashcards"
-    messagebox.showinfo("Error", message)
+    messagebox.showinfo("Error", message, parent=get_user_interface().root)
 
 
-if global_arguments.word_to_import:
-    find_word_and_create_flashcards(global_arguments.word_to_import,
-                                    global_arguments.other_word_type)
-elif global_arguments.ask_word_continuously:
-    while True:
-        result_tuple = ask_user_for_a_word_and_a_type()
-        if not result_tuple:
-            logger.info("The user wants to exit")
-            break
-        word_to_import, word_type = result_tuple
-        logger.debug(f'The user entered the word {word_to_import}')
-        creation_result = find_word_and_create_flashcards(word_to_import,
-                                                          word_type)
-        if creation_result is None:
-            show_word_not_found_dialog(word_to_import)
-    logger.info("Exiting")
-elif global_arguments.input_file_path:
-    import_words_from_text_file(global_arguments.input_file_path,
-                                global_arguments.output_file_path)
+try:
+    if global_arguments.word_to_import:
+        find_word_and_create_flashcards(global_arguments.word_to_import,
+                                        global_arguments.other_word_type)
+    elif global_arguments.ask_word_continuously:
+        # The background worker checks the existing flashcards in memory without the connection
+        get_flashcard_store().load_existence_index()
+        while True:
+            result_tuple = ask_user_for_a_word_and_a_type()
+            if not result_tuple:
+                logger.info("The user wants to exit")
+                break
+            word_to_import, word_type = result_tuple
+            logger.debug(f'The user entered the word {word_to_import}')
+            # The window stays responsive while the word is searched and translated
+            prefetched_line = get_user_interface().run_in_background(
+                f'Searching and translating {word_to_import}...',
+                search_word_in_background, word_to_import, word_type)
+            creation_result = find_word_and_create_flashcards(word_to_import,
+                                                              word_type,
+                                                              prefetched_line)
+            if creation_result is None:
+                show_word_not_found_dialog(word_to_import)
+        logger.info("Exiting")
+    elif global_arguments.input_file_path:
+        import_words_from_text_file(global_arguments.input_file_path,
+                                    global_arguments.output_file_path,
+                                    global_arguments.batch_size,
+                                    global_arguments.prefetch_lines,
+                                    batch_translation=global_arguments.batch_translation,
+                                    non_interactive=global_arguments.non_interactive,
+                                    ambiguity_policy=global_arguments.ambiguity_policy,
+                                    translation_policy=global_arguments.translation_policy,
+                                    review_file_path=global_arguments.review_file_path,
+                                    deferred_review=global_arguments.deferred_review)
+    elif global_arguments.export_file_path:
+        write_answer_cards, read_answer_cards, _ = export_pending_cards(
+            get_flashcard_store(), global_arguments.export_file_path)
+        print(f'{write_answer_cards} cards were exported to {global_arguments.export_file_path}')
+        if read_answer_cards:
+            print(f'{read_answer_cards} cards were exported to '
+                  f'{get_read_answer_file_path(global_arguments.export_file_path)}')
+finally:
+    close_flashcard_database()
+    close_form_index()
+    close_translation_providers()
+    close_user_interface()
+    if global_arguments.profile or global_arguments.profile_json_path:
+        profile_summary = get_profile_summary()
+        print(format_profile_summary(profile_summary))
+        if global_arguments.profile_json_path:
+            write_profile_json(global_arguments.profile_json_path,
+                               profile_summary)
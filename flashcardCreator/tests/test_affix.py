@@ -15,9 +15,17 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program; if not, see <http://www.gnu.org/licenses/>.
 #
+import os
+import sqlite3
+import tempfile
 import unittest
+import unittest.mock
+
+import flashcardcreator.affix
 from flashcardcreator.affix import \
-    calculate_derivative_forms_with_english_field_names
+    calculate_derivative_forms_with_english_field_names, \
+    calculate_derivative_forms_from_verb, clear_derivative_forms_cache, \
+    prefetch_derivative_forms
 
 
 class TestDerivativeFormsGeneration(unittest.TestCase):
@@ -59,5 +67,60 @@ class TestDerivativeFormsGeneration(unittest.TestCase):
             calculate_derivative_forms_with_english_field_names(70670))
 
 
+class TestDerivativeFormsCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        database_file = os.path.join(self.temporary_directory.name,
+                                     'grammatical_dictionary.db')
+        with sqlite3.connect(database_file) as db_connection:
+            db_connection.executescript('''
+                create table derivative_form (id integer primary key, name text, description text,
+                    base_word_id integer);
+                insert into derivative_form (name, description, base_word_id) values
+                    ('маса', 'ед.ч.', 1), ('маси', 'мн.ч.', 1), ('масата', 'ед.ч. членувано', 1),
+                    ('ям', 'сег.вр., 1л., ед.ч.', 2), ('яде', 'сег.вр., 3л., ед.ч.', 2),
+                    ('ядат', 'сег.вр., 3л., мн.ч.', 2);
+                ''')
+        clear_derivative_forms_cache()
+        self.database_patch = unittest.mock.patch.object(
+            flashcardcreator.affix, 'GRAMMATICAL_DATABASE_LOCAL_FILENAME',
+            database_file)
+        self.database_patch.start()
+        self.sql_search = unittest.mock.patch.object(
+            flashcardcreator.affix, 'return_rows_of_sql_statement',
+            wraps=flashcardcreator.affix.return_rows_of_sql_statement).start()
+
+    def tearDown(self):
+        unittest.mock.patch.stopall()
+        clear_derivative_forms_cache()
+        self.temporary_directory.cleanup()
+
+    def test_derivative_forms_are_searched_once_per_word(self):
+        for _ in range(3):
+            self.assertEqual({'singular_indefinite': 'маса',
+                              'pluralForm': 'маси',
+                              'singular_definite': 'масата'},
+                             calculate_derivative_forms_with_english_field_names(1))
+        self.assertEqual(1, self.sql_search.call_count)
+
+    def test_prefetch_searches_many_words_with_one_statement(self):
+        self.assertEqual(3, prefetch_derivative_forms([1, 2, 2, None, 3]))
+        self.assertEqual(0, prefetch_derivative_forms([1, 2, 3]))
+        self.assertEqual({'сег.вр., 1л., ед.ч.': 'ям',
+                          'сег.вр., 3л., мн.ч.': 'ядат'},
+                         calculate_derivative_forms_from_verb(2))
+        self.assertEqual({}, calculate_derivative_forms_from_verb(3))
+        self.assertEqual(1, self.sql_search.call_count)
+
+    def test_least_recently_used_words_are_removed(self):
+        with unittest.mock.patch.object(
+                flashcardcreator.affix._derivative_forms_cache,
+                '_maximum_size', 1):
+            calculate_derivative_forms_with_english_field_names(1)
+            calculate_derivative_forms_from_verb(2)
+            calculate_derivative_forms_with_english_field_names(1)
+        self.assertEqual(3, self.sql_search.call_count)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import tempfile
+import unittest
+
+import flashcardcreator.main
+from flashcardcreator.benchmark import run_benchmarks, summarize_latencies, \
+    compare_benchmark_results
+from flashcardcreator.database import GRAMMATICAL_DATABASE_LOCAL_FILENAME
+from flashcardcreator.formindex import build_form_index
+from flashcardcreator.syntheticdictionary import generate_grammatical_dictionary
+
+
+class TestSummarizeLatencies(unittest.TestCase):
+    def test_percentiles_in_milliseconds(self):
+        summary = summarize_latencies([duration / 1000 for duration in range(1, 101)])
+        self.assertEqual(100, summary['samples'])
+        self.assertAlmostEqual(50.5, summary['p50_ms'])
+        self.assertAlmostEqual(99.01, summary['p99_ms'])
+        self.assertAlmostEqual(100, summary['max_ms'])
+
+    def test_one_sample(self):
+        self.assertAlmostEqual(2, summarize_latencies([0.002])['p90_ms'])
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        self.index_file = os.path.join(self.temporary_directory.name,
+                                       'grammatical_dictionary.formindex')
+        generate_grammatical_dictionary(self.database_file, word_count=300)
+        build_form_index(self.database_file, self.index_file)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_all_benchmarks_run_offline(self):
+        benchmark_results = run_benchmarks(self.database_file,
+                                           self.temporary_directory.name,
+                                           self.index_file, samples=50,
+                                           parsed_lines=200, imported_lines=20)
+        results = benchmark_results['results']
+        self.assertEqual({'find_word', 'find_all_derivative_forms',
+                          'exists_flashcard_for_this_word', 'parse_line',
+                          'import_words_from_text_file'}, set(results))
+        self.assertTrue(results['find_word']['uses_form_index'])
+        self.assertEqual(results['find_word']['samples'],
+                         results['find_word']['found_words'])
+        self.assertEqual(results['find_all_derivative_forms']['cold']['forms'],
+                         results['find_all_derivative_forms']['warm']['forms'])
+        self.assertEqual(200, results['parse_line']['lines'])
+        self.assertEqual(0, results['import_words_from_text_file']['error_lines'])
+        # The searches use the default grammatical dictionary again
+        self.assertEqual(GRAMMATICAL_DATABASE_LOCAL_FILENAME,
+                         flashcardcreator.main.GRAMMATICAL_DATABASE_LOCAL_FILENAME)
+        self.assertIsNone(flashcardcreator.main.flashcard_store)
+
+        compared_metrics = compare_benchmark_results(benchmark_results,
+                                                     benchmark_results)
+        self.assertIn(('parse_line.lines', 200, 200, 0), compared_metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
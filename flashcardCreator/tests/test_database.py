@@ -15,11 +15,25 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program; if not, see <http://www.gnu.org/licenses/>.
 #
+import os
+import shutil
+import tempfile
 import unittest
 import unittest.mock
 
 from flashcardcreator.database import insert_participles_with_cursor, \
-    SQL_INSERT_OTHER_WORD
+    SQL_INSERT_OTHER_WORD, FlashcardStore
+from flashcardcreator.util import convert_to_absolute_path
+
+
+def copy_flashcard_database(target_directory):
+    """
+    Copies the flashcard database distributed with the application, so the tests can modify it
+    """
+    database_file = os.path.join(target_directory, 'flashcards.sqlite')
+    shutil.copyfile(convert_to_absolute_path('flashcards.sqlite'),
+                    database_file)
+    return database_file
 
 
 class TestInsertParticiplesWithCursor(unittest.TestCase):
@@ -68,5 +82,74 @@ class TestInsertParticiplesWithCursor(unittest.TestCase):
             }
         )
 
+
+class TestFlashcardStore(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.store = FlashcardStore(
+            copy_flashcard_database(self.temporary_directory.name))
+        self.word_fields = {
+            'word': 'тестова дума',
+            'meaningInEnglish': 'test word',
+            'type': 'expression',
+            'externalWordId': None
+        }
+
+    def tearDown(self):
+        self.store.close()
+        self.temporary_directory.cleanup()
+
+    def _count_other_words(self, word):
+        return self.store.return_rows_of_sql_statement(
+            'select count(1) from otherWordTypes where word = ?', (word,))[0][0]
+
+    def test_insert_is_committed(self):
+        self.store.insert_other_word_type(self.word_fields)
+        self.assertFalse(self.store.in_transaction)
+        self.store.close()
+        self.store = FlashcardStore(
+            os.path.join(self.temporary_directory.name, 'flashcards.sqlite'))
+        self.assertEqual(1, self._count_other_words('тестова дума'))
+
+    def test_failing_nested_transaction_only_rolls_back_itself(self):
+        other_word_fields = dict(self.word_fields, word='друга дума')
+        with self.store.transaction():
+            self.store.insert_other_word_type(self.word_fields)
+            with self.assertRaises(ValueError):
+                with self.store.transaction():
+                    self.store.insert_other_word_type(other_word_fields)
+                    raise ValueError('The word is wrong')
+        self.assertEqual(1, self._count_other_words('тестова дума'))
+        self.assertEqual(0, self._count_other_words('друга дума'))
+        self.assertTrue(self.store.exists_flashcard('тестова дума'))
+        self.assertFalse(self.store.exists_flashcard('друга дума'))
+
+    def test_failing_transaction_is_rolled_back(self):
+        with self.assertRaises(ValueError):
+            with self.store.transaction():
+                self.store.insert_other_word_type(self.word_fields)
+                raise ValueError('The word is wrong')
+        self.assertFalse(self.store.in_transaction)
+        self.assertEqual(0, self._count_other_words('тестова дума'))
+        self.assertFalse(self.store.exists_flashcard('тестова дума'))
+
+    def test_existence_index_finds_words_and_external_ids(self):
+        existing_word, existing_external_word_id = self.store.return_rows_of_sql_statement(
+            'select noun, externalWordId from nouns where externalWordId is not null limit 1', ())[0]
+        self.assertTrue(self.store.exists_flashcard(existing_word))
+        self.assertTrue(self.store.exists_flashcard('несъществуваща', existing_external_word_id))
+        self.assertFalse(self.store.exists_flashcard('несъществуваща', -1))
+        self.store.insert_other_word_type(dict(self.word_fields, externalWordId=-1))
+        self.assertTrue(self.store.exists_flashcard('друга дума', -1))
+
+    def test_explicit_rollback_removes_words_from_existence_index(self):
+        self.assertFalse(self.store.exists_flashcard('тестова дума'))
+        self.store.begin()
+        self.store.insert_other_word_type(self.word_fields)
+        self.assertTrue(self.store.exists_flashcard('тестова дума'))
+        self.store.rollback()
+        self.assertFalse(self.store.exists_flashcard('тестова дума'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import csv
+import os
+import tempfile
+import unittest
+
+from flashcardcreator.database import FlashcardStore
+from flashcardcreator.exporter import export_pending_cards, \
+    get_read_answer_file_path
+from tests.test_database import copy_flashcard_database
+
+
+class TestExportPendingCards(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.store = FlashcardStore(
+            copy_flashcard_database(self.temporary_directory.name))
+        self.store.migrate()
+        self.export_file = os.path.join(self.temporary_directory.name,
+                                        'cards.tsv')
+
+    def tearDown(self):
+        self.store.close()
+        self.temporary_directory.cleanup()
+
+    def _count_rows(self, sql_statement):
+        return self.store.return_rows_of_sql_statement(sql_statement, ())[0][0]
+
+    def _read_exported_cards(self, file_path):
+        with open(file_path, encoding='utf-8', newline='') as exported_file:
+            return [row for row in csv.reader(exported_file, delimiter='\t')
+                    if not row[0].startswith('#')]
+
+    def test_pending_cards_are_exported_and_marked(self):
+        pending_cards = self._count_rows('select count(1) from ankiWebCardsWriteAnswer')
+        self.store.insert_other_word_type({'word': 'тест', 'meaningInEnglish': 'test',
+                                           'type': None, 'externalWordId': None})
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("update otherWordTypes set typeInCard = 0, tags = 'a,b' "
+                              "where word = 'тест'")
+
+        write_answer_cards, read_answer_cards, marked_rows = export_pending_cards(
+            self.store, self.export_file, export_date='2023-05-01', chunk_size=7)
+
+        self.assertEqual((pending_cards, 1), (write_answer_cards, read_answer_cards))
+        self.assertEqual(pending_cards, len(self._read_exported_cards(self.export_file)))
+        self.assertEqual([['test', 'тест', 'a b']], self._read_exported_cards(
+            get_read_answer_file_path(self.export_file)))
+        self.assertEqual(marked_rows, self._count_rows(
+            "select (select count(1) from nouns where flashcardExportDate = '2023-05-01') "
+            "+ (select count(1) from adjetives where flashcardExportDate = '2023-05-01') "
+            "+ (select count(1) from verbs4 where flashcardExportDate = '2023-05-01') "
+            "+ (select count(1) from otherWordTypes where flashcardExportDate = '2023-05-01') "
+            "+ (select count(1) from wordOrder where flashcardExportDate = '2023-05-01')"))
+        self.assertEqual(0, self._count_rows('select count(1) from ankiWebCardsWriteAnswer'))
+        self.assertEqual(0, self._count_rows('select count(1) from ankiWebCardsReadAnswer'))
+
+    def test_rows_without_cards_are_not_marked(self):
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("insert into verbs4 (presentSingular1, tense, imperfect, singular1) "
+                              "values ('безсмислям', 'p', 1, 'безсмислям')")
+        export_pending_cards(self.store, self.export_file)
+        self.assertEqual(1, self._count_rows(
+            "select count(1) from verbs4 where presentSingular1 = 'безсмислям' "
+            "and flashcardExportDate is null"))
+
+    def test_nothing_is_written_without_pending_cards(self):
+        export_pending_cards(self.store, self.export_file)
+        os.remove(self.export_file)
+        self.assertEqual((0, 0, 0), export_pending_cards(self.store, self.export_file))
+        self.assertEqual([], [file_name for file_name in os.listdir(self.temporary_directory.name)
+                              if file_name.startswith('cards')])
+
+
+if __name__ == '__main__':
+    unittest.main()
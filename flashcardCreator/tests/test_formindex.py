@@ -0,0 +1,109 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import flashcardcreator.database
+import flashcardcreator.main
+from flashcardcreator.formindex import build_form_index, FormIndex, \
+    open_form_index
+from flashcardcreator.main import SQL_FIND_CANDIDATE_ROWS, WordFinder
+
+WORDS_TO_SEARCH = ['ябълка', 'ябълки', 'ябълката', 'хубав', 'хубава', 'хубави',
+                   'софия', 'София', 'и', 'кон', 'коне', 'а', 'жъ', 'яя', '']
+
+
+def create_small_grammatical_database(database_file):
+    with sqlite3.connect(database_file) as db_connection:
+        db_connection.executescript('''
+            create table word_type (id integer primary key, name text, speech_part text);
+            create table word (id integer primary key, name text, type_id integer, meaning text);
+            create table derivative_form (id integer primary key, name text, description text,
+                base_word_id integer);
+            insert into word_type values (1, '41', 'noun_female'), (2, '76', 'adjective'),
+                (3, 'name', 'name_capital'), (4, 'conjunction', 'conjunction');
+            insert into word values (1, 'ябълка', 1, 'плод'), (2, 'хубав', 2, null),
+                (3, 'София', 3, 'град'), (4, 'и', 4, null), (5, 'кон', 99, null),
+                (6, 'хубава', 1, null);
+            insert into derivative_form values (1, 'ябълка', 'ед.ч.', 1), (2, 'ябълки', 'мн.ч.', 1),
+                (3, 'ябълката', 'ед.ч. членувано', 1), (4, 'хубав', 'м.р.', 2),
+                (5, 'хубава', 'ж.р.', 2), (6, 'хубави', 'мн.ч.', 2), (7, 'хубава', 'ед.ч.', 6),
+                (8, 'коне', 'мн.ч.', 5), (9, 'хубава', 'ж.р.', 2);
+            ''')
+
+
+class TestFormIndex(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        self.index_file = os.path.join(self.temporary_directory.name,
+                                       'grammatical_dictionary.formindex')
+        create_small_grammatical_database(self.database_file)
+        build_form_index(self.database_file, self.index_file)
+        self.form_index = FormIndex(self.index_file)
+
+    def tearDown(self):
+        self.form_index.close()
+        self.temporary_directory.cleanup()
+
+    def _find_with_sql(self, word_to_search):
+        return sorted(flashcardcreator.database.return_rows_of_sql_statement(
+            self.database_file, SQL_FIND_CANDIDATE_ROWS,
+            {'word_to_search': word_to_search,
+             'word_to_search_like_name': word_to_search.capitalize()}))
+
+    def test_index_finds_the_same_words_as_the_sql_search(self):
+        self.assertEqual(8, len(self.form_index))
+        for word_to_search in WORDS_TO_SEARCH:
+            with self.subTest(word_to_search):
+                self.assertEqual(self._find_with_sql(word_to_search),
+                                 self.form_index.find(word_to_search,
+                                                      word_to_search.capitalize()))
+
+    def test_words_of_a_form_are_returned_once(self):
+        self.assertEqual([(2, 'хубав', 2, 'adjective', None),
+                          (6, 'хубава', 1, 'noun_female', None)],
+                         self.form_index.find('хубава'))
+
+    def test_changed_database_makes_the_index_stale(self):
+        self.assertTrue(self.form_index.is_fresh_for(self.database_file))
+        opened_index = open_form_index(self.database_file, self.index_file)
+        self.assertIsNotNone(opened_index)
+        opened_index.close()
+        later = time.time() + 10
+        os.utime(self.database_file, (later, later))
+        with self.assertLogs('flashcardcreator.formindex', 'WARNING'):
+            self.assertIsNone(open_form_index(self.database_file, self.index_file))
+
+    def test_word_finder_uses_the_index(self):
+        with unittest.mock.patch.object(flashcardcreator.main, 'get_form_index',
+                                        return_value=self.form_index), \
+                unittest.mock.patch.object(flashcardcreator.database,
+                                           'return_rows_of_sql_statement') as sql_search:
+            self.assertEqual([(3, 'София', 3, 'name_capital', 'град')],
+                             WordFinder.find_candidate_rows(' СОФИЯ '))
+            sql_search.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import contextlib
+import gzip
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+import unittest.mock
+import urllib.error
+
+import flashcardcreator.main
+import installGrammaticalDictionary
+from flashcardcreator.main import check_grammatical_dictionary_query_plans
+from installGrammaticalDictionary import create_grammar_database_indexes, \
+    download_import_grammar_database, install_database_file, read_expected_sha256, read_installation_metadata, \
+    was_grammar_database_imported, write_installation_metadata
+
+
+def create_grammatical_database_without_indexes(database_file):
+    """
+    Creates a small database with the tables of the grammatical dictionary which are searched
+    """
+    with sqlite3.connect(database_file) as db_connection:
+        db_connection.executescript('''
+            create table word_type (id integer primary key, name text, speech_part text);
+            create table word (id integer primary key, name text, type_id integer, meaning text);
+            create table derivative_form (id integer primary key, name text, description text,
+                base_word_id integer);
+            ''')
+        db_connection.executemany('insert into word_type values (?, ?, ?);',
+                                  [(type_id, str(type_id), 'noun_male') for
+                                   type_id in range(1, 300)])
+        db_connection.executemany('insert into word values (?, ?, ?, ?);',
+                                  [(word_id, f'дума{word_id}',
+                                    word_id % 299 + 1, None) for word_id in
+                                   range(1, 3000)])
+        db_connection.executemany(
+            'insert into derivative_form values (?, ?, ?, ?);',
+            [(form_id, f'форма{form_id}', 'ед.ч.', form_id // 5 + 1) for
+             form_id in range(1, 15000)])
+
+
+class TestGrammarDatabaseIndexes(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        create_grammatical_database_without_indexes(self.database_file)
+        self.patch = unittest.mock.patch.object(
+            flashcardcreator.main, 'GRAMMATICAL_DATABASE_LOCAL_FILENAME',
+            self.database_file)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temporary_directory.cleanup()
+
+    def _create_indexes(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return create_grammar_database_indexes(self.database_file)
+
+    def test_searches_use_indexes_after_the_installation(self):
+        with self.assertLogs(flashcardcreator.main.logger, 'WARNING'):
+            self.assertTrue(check_grammatical_dictionary_query_plans())
+        self.assertEqual(3, self._create_indexes())
+        self.assertEqual([], check_grammatical_dictionary_query_plans())
+
+    def test_existing_indexes_are_not_created_again(self):
+        with sqlite3.connect(self.database_file) as db_connection:
+            db_connection.execute(
+                'create index other_name on word (name, type_id);')
+        self.assertEqual(2, self._create_indexes())
+        self.assertEqual(0, self._create_indexes())
+
+
+class TestInstallationMetadata(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        create_grammatical_database_without_indexes(self.database_file)
+        self.patch = unittest.mock.patch.object(
+            installGrammaticalDictionary, 'EXPECTED_DERIVATIVE_FORM_COUNT',
+            14999)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temporary_directory.cleanup()
+
+    def _was_imported(self, deep_verify=False):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return was_grammar_database_imported(deep_verify,
+                                                 self.database_file)
+
+    def test_metadata_is_written_for_legacy_installations(self):
+        self.assertEqual({}, read_installation_metadata(self.database_file))
+        self.assertTrue(self._was_imported())
+        metadata = read_installation_metadata(self.database_file)
+        self.assertEqual('14999', metadata['derivative_form_count'])
+        self.assertEqual('2999', metadata['word_count'])
+        self.assertIsNone(metadata['content_sha256'])
+
+    def test_validation_only_reads_the_metadata(self):
+        write_installation_metadata('abc123', self.database_file)
+        with sqlite3.connect(self.database_file) as db_connection:
+            db_connection.execute('delete from derivative_form where id > 100;')
+        self.assertTrue(self._was_imported())
+        self.assertFalse(self._was_imported(deep_verify=True))
+
+    def test_wrong_metadata_fails_the_validation(self):
+        write_installation_metadata(database_file=self.database_file)
+        with sqlite3.connect(self.database_file) as db_connection:
+            db_connection.execute("update installation_metadata set value = '1' "
+                                  "where key = 'derivative_form_count';")
+        self.assertFalse(self._was_imported())
+
+
+class TestInstallDatabaseFile(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        with open(self.database_file, 'wb') as old_database_file:
+            old_database_file.write(b'old database')
+        # Bigger than the buffer, so it is written in many chunks
+        self.database_content = os.urandom(3 * 1024 * 1024 + 17)
+        self.compressed_content = gzip.compress(self.database_content)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def _install(self, expected_sha256):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return install_database_file(io.BytesIO(self.compressed_content),
+                                         expected_sha256, self.database_file,
+                                         len(self.compressed_content))
+
+    def _read_database_file(self):
+        with open(self.database_file, 'rb') as database_file:
+            return database_file.read()
+
+    def test_database_is_installed_if_checksum_is_correct(self):
+        expected_sha256 = hashlib.sha256(self.database_content).hexdigest()
+        self.assertEqual(expected_sha256, self._install(expected_sha256))
+        self.assertEqual(self.database_content, self._read_database_file())
+        self.assertEqual(['grammatical_dictionary.db'],
+                         os.listdir(self.temporary_directory.name))
+
+    def test_database_is_not_replaced_if_checksum_is_wrong(self):
+        self.assertIsNone(self._install(hashlib.sha256(b'other').hexdigest()))
+        self.assertEqual(b'old database', self._read_database_file())
+        self.assertEqual(['grammatical_dictionary.db'],
+                         os.listdir(self.temporary_directory.name))
+
+    def test_read_expected_sha256(self):
+        self.assertEqual('abc123', read_expected_sha256(
+            '\nabc123  rechnik.chitanka.info.bulgarian.db.sqlite\n'))
+
+    def test_missing_manifest_stops_the_installation(self):
+        output = io.StringIO()
+        with unittest.mock.patch.object(installGrammaticalDictionary,
+                                        'was_grammar_database_imported',
+                                        return_value=False), \
+                unittest.mock.patch('urllib.request.install_opener'), \
+                unittest.mock.patch('urllib.request.urlopen', side_effect=urllib.error.HTTPError(
+                    installGrammaticalDictionary.GRAMMATICAL_DATABASE_MANIFEST_URL, 404,
+                    'Not Found', {}, None)) as urlopen, \
+                contextlib.redirect_stdout(output):
+            self.assertFalse(download_import_grammar_database())
+        # The database isn't downloaded without its checksum
+        urlopen.assert_called_once()
+        self.assertIn('--skip-checksum', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
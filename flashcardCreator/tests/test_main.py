@@ -15,10 +15,20 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program; if not, see <http://www.gnu.org/licenses/>.
 #
+import os
+import sqlite3
+import tempfile
 import unittest
+import unittest.mock
+
+import flashcardcreator.main
+import flashcardcreator.userinput
 from flashcardcreator.main import first_cyrillic_letter_upper_case, ParsedLine, \
-    parse_line
+    parse_line, import_words_from_text_file, set_flashcard_database, \
+    close_flashcard_database, WordFinder, search_word_in_background
+from flashcardcreator.resolution import InteractiveResolver
 from flashcardcreator.util import OTHER_WORD_TYPES
+from tests.test_database import copy_flashcard_database
 
 
 class TestConvertingSearchWordToAName(unittest.TestCase):
@@ -127,5 +137,324 @@ class TestParseLineMethod(unittest.TestCase):
         self.assertIsNotNone(parsed_line.error)
 
 
+class TestSearchWordInBackground(unittest.TestCase):
+    def test_translation_is_finished(self):
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                return_value=[(None, 'наречие', None, 'adverb', None)]), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_text_to_english',
+                    return_value='adverb') as translation:
+            prefetched_line = search_word_in_background('наречие')
+        translation.assert_called_once()
+        self.assertTrue(prefetched_line.machine_translation.done())
+        self.assertEqual(('наречие', 'adverb'),
+                         prefetched_line.machine_translation.result())
+
+    def test_word_to_choose_isn_t_translated(self):
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                return_value=[(None, 'дума', None, 'noun', 'thought'),
+                              (None, 'дума', None, 'noun', 'speech')]), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main,
+                    'translate_text_to_english') as translation:
+            prefetched_line = search_word_in_background('дума')
+        translation.assert_not_called()
+        self.assertEqual(2, len(prefetched_line.candidate_rows))
+        self.assertIsNone(prefetched_line.machine_translation)
+
+    def test_word_with_flashcards_isn_t_translated(self):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            set_flashcard_database(copy_flashcard_database(temporary_directory))
+            try:
+                flashcardcreator.main.flashcard_store.register_flashcard('наречие', 42)
+                with unittest.mock.patch.object(
+                        WordFinder, 'find_candidate_rows',
+                        return_value=[(42, 'наречие', None, 'adverb', None)]), \
+                        unittest.mock.patch.object(
+                            flashcardcreator.main, 'prefetch_derivative_forms'), \
+                        unittest.mock.patch.object(
+                            flashcardcreator.main,
+                            'translate_text_to_english') as translation:
+                    prefetched_line = search_word_in_background('наречие')
+            finally:
+                close_flashcard_database()
+        translation.assert_not_called()
+        self.assertIsNone(prefetched_line.machine_translation)
+
+
+class TestImportWordsFromTextFile(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        set_flashcard_database(
+            copy_flashcard_database(self.temporary_directory.name))
+        self.input_file_path = os.path.join(self.temporary_directory.name,
+                                            'input.txt')
+        self.output_file_path = os.path.join(self.temporary_directory.name,
+                                             'output.txt')
+        with open(self.input_file_path, 'w') as input_file:
+            input_file.write('първи израз = first expression\n'
+                             'втори израз = second expression\n'
+                             'трети израз = third expression\n')
+
+    def tearDown(self):
+        close_flashcard_database()
+        self.temporary_directory.cleanup()
+
+    @staticmethod
+    def _find_expression(word_to_search, other_word_type,
+                         found_classified_words=None):
+        if word_to_search == 'втори израз':
+            raise sqlite3.OperationalError('The database is broken')
+        return WordFinder._create_classified_word_subclass(
+            None, word_to_search, None, other_word_type, None)
+
+    def _count_expressions(self):
+        return flashcardcreator.main.flashcard_store.return_rows_of_sql_statement(
+            "select count(1) from otherWordTypes where word like '% израз'",
+            {})[0][0]
+
+    def test_batch_import_skips_only_the_failing_word(self):
+        with unittest.mock.patch.object(WordFinder, '_find_word',
+                                        side_effect=self._find_expression):
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path, batch_size=2)
+        self.assertFalse(flashcardcreator.main.flashcard_store.in_transaction)
+        self.assertEqual(2, self._count_expressions())
+        with open(self.output_file_path, 'r') as output_file:
+            output_lines = output_file.readlines()
+        self.assertEqual(2, len(output_lines))
+        self.assertTrue(output_lines[0].startswith(
+            flashcardcreator.main.ERROR_PREFIX))
+        self.assertEqual('втори израз = second expression\n', output_lines[1])
+
+    def test_sequential_import_without_prefetch(self):
+        with unittest.mock.patch.object(WordFinder, '_find_word',
+                                        side_effect=self._find_expression), \
+                unittest.mock.patch.object(flashcardcreator.main,
+                                           'translate_texts_with_deepl') as batch_translation:
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path,
+                                        prefetch_lines=0)
+        self.assertEqual(2, self._count_expressions())
+        # All lines have a translation
+        batch_translation.assert_not_called()
+
+    def test_prefetched_translations_keep_the_line_order(self):
+        with open(self.input_file_path, 'w') as input_file:
+            for counter in range(20):
+                input_file.write(f'# коментар {counter}\nнаречие{counter}\n')
+        translated_words = []
+
+        def translate(word, debug_client_calls=False, deepl_translations=None):
+            translated_words.append(word)
+            return f'translation of {word} ({deepl_translations[0]})'
+
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                side_effect=lambda word: [
+                    (None, word, None, 'adverb', None)]) as candidate_search, \
+                unittest.mock.patch.object(flashcardcreator.main,
+                                           'translate_text_to_english',
+                                           side_effect=translate), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_texts_with_deepl',
+                    side_effect=lambda words: {word: [f'deepl {word}'] for
+                                               word in words}) as batch_translation, \
+                unittest.mock.patch.object(
+                    flashcardcreator.userinput, 'ask_user_for_translation',
+                    side_effect=lambda word, translation: translation):
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path,
+                                        prefetch_lines=3)
+        self.assertEqual(20, len(translated_words))
+        batch_translation.assert_called_once()
+        self.assertEqual(20, candidate_search.call_count)
+        with open(self.output_file_path, 'r') as output_file:
+            self.assertEqual([f'# коментар {counter}\n' for counter in range(20)],
+                             output_file.readlines())
+        self.assertEqual([('translation of наречие7 (deepl наречие7)',)],
+                         flashcardcreator.main.flashcard_store.return_rows_of_sql_statement(
+                             "select meaningInEnglish from otherWordTypes where word = 'наречие7'",
+                             {}))
+
+    def test_batch_translation_uses_the_headwords(self):
+        with open(self.input_file_path, 'w') as input_file:
+            input_file.write('бързичко\n'
+                             'двусмислица\n'
+                             'познато\n')
+        flashcardcreator.main.flashcard_store.register_flashcard('познато', 7)
+        translations = []
+
+        def find_candidate_rows(word):
+            if word == 'двусмислица':
+                return [(1, word, 1, 'adverb', None),
+                        (2, word, 2, 'adverb', None)]
+            elif word == 'познато':
+                return [(7, word, None, 'adverb', None)]
+            return [(None, 'бързотест', None, 'adverb', None)]
+
+        def translate(word, debug_client_calls=False, deepl_translations=None):
+            translations.append((word, deepl_translations))
+            return deepl_translations[0]
+
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                side_effect=find_candidate_rows) as candidate_search, \
+                unittest.mock.patch.object(flashcardcreator.main,
+                                           'translate_text_to_english',
+                                           side_effect=translate), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_texts_with_deepl',
+                    side_effect=lambda words: {word: [f'deepl {word}'] for
+                                               word in words}) as batch_translation:
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path,
+                                        prefetch_lines=0,
+                                        non_interactive=True,
+                                        ambiguity_policy='skip')
+        batch_translation.assert_called_once_with(['бързотест'])
+        self.assertEqual([('бързотест', ['deepl бързотест'])], translations)
+        # The import takes the rows found for the batch translation
+        self.assertEqual(3, candidate_search.call_count)
+
+    def test_batch_translation_can_be_deactivated(self):
+        with open(self.input_file_path, 'w') as input_file:
+            input_file.write('бързичко\n')
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                return_value=[(None, 'бързотест', None, 'adverb', None)]), \
+                unittest.mock.patch.object(flashcardcreator.main,
+                                           'translate_text_to_english',
+                                           return_value='quickly'), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main,
+                    'translate_texts_with_deepl') as batch_translation:
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path,
+                                        batch_translation=False,
+                                        non_interactive=True)
+        batch_translation.assert_not_called()
+
+    def test_non_interactive_import_sends_undecided_lines_to_review(self):
+        with open(self.input_file_path, 'w') as input_file:
+            input_file.write('наречиетест\n'
+                             'двусмислица = ambiguity\n'
+                             'непреводимо\n')
+        review_file_path = os.path.join(self.temporary_directory.name,
+                                        'review.txt')
+
+        def find_candidate_rows(word):
+            if word == 'двусмислица':
+                return [(1, word, 1, 'adverb', None),
+                        (2, word, 2, 'adverb', None)]
+            return [(None, word, None, 'adverb', None)]
+
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                side_effect=find_candidate_rows), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_text_to_english',
+                    side_effect=lambda word, debug_client_calls=False, deepl_translations=None:
+                    'adverb' if word == 'наречиетест' else None), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_texts_with_deepl',
+                    return_value={}), \
+                unittest.mock.patch.object(
+                    flashcardcreator.userinput, 'ask_user_for_translation',
+                    side_effect=AssertionError('No dialogs')), \
+                unittest.mock.patch.object(
+                    flashcardcreator.userinput, 'ask_user_to_choose_a_row',
+                    side_effect=AssertionError('No dialogs')):
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path,
+                                        non_interactive=True,
+                                        ambiguity_policy='skip',
+                                        review_file_path=review_file_path)
+        self.assertIsInstance(flashcardcreator.main.word_resolver,
+                              InteractiveResolver)
+        self.assertEqual([('adverb',)],
+                         flashcardcreator.main.flashcard_store.return_rows_of_sql_statement(
+                             "select meaningInEnglish from otherWordTypes where word = 'наречиетест'",
+                             {}))
+        with open(review_file_path, 'r') as review_file:
+            review_lines = review_file.readlines()
+        self.assertEqual(4, len(review_lines))
+        self.assertTrue(review_lines[0].startswith(flashcardcreator.main.INFO_PREFIX))
+        self.assertEqual(['двусмислица = ambiguity\n', 'непреводимо\n'],
+                         review_lines[1::2])
+
+
+    def test_deferred_review_asks_once_and_imports_the_reviewed_words(self):
+        with open(self.input_file_path, 'w') as input_file:
+            input_file.write('# коментар\n'
+                             'отложено\n'
+                             'двусмислица = ambiguity\n'
+                             'познато\n'
+                             'пропуснато\n')
+        flashcardcreator.main.flashcard_store.register_flashcard('познато')
+        reviews = []
+
+        def find_candidate_rows(word):
+            if word == 'двусмислица':
+                return [(None, word, None, 'adverb', 'first meaning'),
+                        (None, word, None, 'adverb', 'second meaning')]
+            return [(None, word, None, 'adverb', None)]
+
+        def review_words(words, candidate_descriptions, translations):
+            reviews.append((words, candidate_descriptions, translations))
+            return [(0, 'postponed'), (1, translations[1]), (None, None)]
+
+        with unittest.mock.patch.object(
+                WordFinder, 'find_candidate_rows',
+                side_effect=find_candidate_rows), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_text_to_english',
+                    side_effect=lambda word, debug_client_calls=False, deepl_translations=None:
+                    f'machine {word}'), \
+                unittest.mock.patch.object(
+                    flashcardcreator.main, 'translate_texts_with_deepl',
+                    return_value={}), \
+                unittest.mock.patch.object(
+                    flashcardcreator.userinput, 'ask_user_to_review_words',
+                    side_effect=review_words), \
+                unittest.mock.patch.object(
+                    flashcardcreator.userinput, 'ask_user_for_translation',
+                    side_effect=AssertionError('No dialogs')), \
+                unittest.mock.patch.object(
+                    flashcardcreator.userinput, 'ask_user_to_choose_a_row',
+                    side_effect=AssertionError('No dialogs')):
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path,
+                                        deferred_review=True)
+        self.assertEqual(1, len(reviews))
+        words, candidate_descriptions, translations = reviews[0]
+        self.assertEqual(['отложено', 'двусмислица', 'пропуснато'], words)
+        self.assertEqual(2, len(candidate_descriptions[1]))
+        self.assertEqual(['machine отложено', 'ambiguity', 'machine пропуснато'],
+                         translations)
+        self.assertEqual([('ambiguity',), ('postponed',)],
+                         flashcardcreator.main.flashcard_store.return_rows_of_sql_statement(
+                             "select meaningInEnglish from otherWordTypes "
+                             "where word in ('двусмислица', 'отложено', 'пропуснато') order by word",
+                             {}))
+        with open(self.output_file_path, 'r') as output_file:
+            output_lines = output_file.readlines()
+        self.assertEqual('# коментар\n', output_lines[0])
+        # The known word is written in the resolve phase and isn't reviewed
+        self.assertEqual(f"{flashcardcreator.main.INFO_PREFIX}The word 'познато' already has flashcards\n",
+                         output_lines[1])
+        self.assertEqual('познато\n', output_lines[2])
+        self.assertTrue(output_lines[3].startswith(flashcardcreator.main.INFO_PREFIX))
+        self.assertEqual('пропуснато\n', output_lines[4])
+
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            import_words_from_text_file(self.input_file_path,
+                                        self.output_file_path, batch_size=0)
+
+
 if __name__ == '__main__':
     unittest.main()
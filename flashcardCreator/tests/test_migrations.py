@@ -0,0 +1,167 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import sqlite3
+import tempfile
+import unittest
+
+from flashcardcreator.database import FlashcardStore, find_full_table_scans, \
+    SQL_FIND_VERB_PAIR
+from flashcardcreator.migrations import apply_migrations, get_schema_version, \
+    LATEST_SCHEMA_VERSION, Migration, MIGRATIONS
+from tests.test_database import copy_flashcard_database
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = copy_flashcard_database(
+            self.temporary_directory.name)
+        self.db_connection = sqlite3.connect(self.database_file,
+                                             isolation_level=None)
+
+    def tearDown(self):
+        self.db_connection.close()
+        self.temporary_directory.cleanup()
+
+    def test_migrations_are_applied_once(self):
+        self.assertEqual(0, get_schema_version(self.db_connection))
+        self.assertEqual(len(MIGRATIONS), apply_migrations(self.db_connection))
+        self.assertEqual(LATEST_SCHEMA_VERSION,
+                         get_schema_version(self.db_connection))
+        self.assertEqual(0, apply_migrations(self.db_connection))
+
+    def test_store_uses_the_indexes_after_the_migration(self):
+        with FlashcardStore(self.database_file) as store:
+            store.migrate()
+        for sql_statement in ('select 1 from nouns where externalWordId = ?',
+                              'select 1 from adjetives where externalWordId = ?',
+                              'select 1 from otherWordTypes where externalWordId = ?'):
+            with self.subTest(sql_statement):
+                self.assertEqual([], find_full_table_scans(
+                    self.database_file, sql_statement, (1,)))
+        self.assertEqual([], find_full_table_scans(
+            self.database_file, SQL_FIND_VERB_PAIR, (1, 2)))
+        # The partial indexes only contain the flashcards which were not exported
+        for table, index in (('nouns', 'nounsNotExportedIdx'),
+                             ('verbs4', 'verbs4NotExportedIdx')):
+            with self.subTest(table):
+                self.assertEqual([f'SCAN {table} USING INDEX {index}'],
+                                 find_full_table_scans(
+                                     self.database_file,
+                                     f'select 1 from {table} where flashcardExportDate is null',
+                                     ()))
+
+
+    def test_failing_migration_is_rolled_back(self):
+        failing_migrations = MIGRATIONS + (
+            Migration(LATEST_SCHEMA_VERSION + 1, 'Fails', '''
+                create table newTable (id integer);
+                insert into tableWhichDoesNotExist values (1);
+                '''),)
+        with self.assertRaises(sqlite3.OperationalError):
+            apply_migrations(self.db_connection, failing_migrations)
+        self.assertEqual(LATEST_SCHEMA_VERSION,
+                         get_schema_version(self.db_connection))
+        self.assertEqual([], self.db_connection.execute(
+            "select name from sqlite_schema where name = 'newTable'").fetchall())
+
+    def test_newer_database_is_rejected(self):
+        self.db_connection.execute(
+            f'PRAGMA user_version = {LATEST_SCHEMA_VERSION + 1};')
+        with self.assertRaises(ValueError):
+            apply_migrations(self.db_connection)
+
+
+class TestExportCards(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = copy_flashcard_database(
+            self.temporary_directory.name)
+        self.store = FlashcardStore(self.database_file)
+
+    def tearDown(self):
+        self.store.close()
+        self.temporary_directory.cleanup()
+
+    def _read_view(self, view):
+        return set(self.store.return_rows_of_sql_statement(
+            f'select front, back, tags from {view}', ()))
+
+    def _pending_cards_of(self, back):
+        return sorted(row for row in self._read_view('ankiWebCardsWriteAnswer')
+                      if row[1] == back)
+
+    def test_views_show_the_same_cards_after_the_migration(self):
+        write_answer_cards = self._read_view('ankiWebCardsWriteAnswer')
+        read_answer_cards = self._read_view('ankiWebCardsReadAnswer')
+        self.store.migrate()
+        self.assertEqual(write_answer_cards,
+                         self._read_view('ankiWebCardsWriteAnswer'))
+        self.assertEqual(read_answer_cards,
+                         self._read_view('ankiWebCardsReadAnswer'))
+        self.assertEqual(
+            ['SEARCH exportCards USING INDEX exportCardsPendingIdx (answerType=?)'],
+            [detail for _, _, _, detail in self.store.return_rows_of_sql_statement(
+                'EXPLAIN QUERY PLAN select * from ankiWebCardsWriteAnswer', ())
+             if 'exportCards' in detail])
+
+    def test_cards_follow_the_changes_of_the_flashcards(self):
+        self.store.migrate()
+        self.store.insert_noun({'noun': 'тестица', 'meaningInEnglish': 'test',
+                                'genderAbrev': 'f', 'irregularPluralEnding': 'тестици',
+                                'irregularDefiniteArticle': None, 'countableEnding': None,
+                                'irregularPluralWithArticle': '', 'externalWordId': None})
+        self.assertEqual([('test (singular with gender)', 'една тестица', 'nouns,')],
+                         self._pending_cards_of('една тестица'))
+        self.assertEqual([('test (plural)', 'тестици', 'nouns,')],
+                         self._pending_cards_of('тестици'))
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("update nouns set meaningInEnglish = 'quiz' where noun = 'тестица'")
+        self.assertEqual([('quiz (plural)', 'тестици', 'nouns,')],
+                         self._pending_cards_of('тестици'))
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("update nouns set flashcardExportDate = date('now') where noun = 'тестица'")
+        self.assertEqual([], self._pending_cards_of('тестици'))
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("delete from nouns where noun = 'тестица'")
+        self.assertEqual([], self.store.return_rows_of_sql_statement(
+            "select * from exportCards where sourceKey = 'тестица'", ()))
+
+    def test_cards_of_verbs_contain_the_meaning(self):
+        self.store.migrate()
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("insert into verbMeanings (meaningInEnglish, presentSingular1) "
+                              "values ('to test', 'тествам')")
+            db_cursor.execute("insert into verbs4 (presentSingular1, tense, imperfect, singular1, plural3) "
+                              "values ('тествам', 'p', 1, 'тествам', 'тестват ')")
+            tense_name = db_cursor.execute(
+                "select name from verbTenses where code = 'p'").fetchone()[0]
+        self.assertEqual([(f'to test - те ({tense_name}) (imperf.)', 'тестват', 'verbs,')],
+                         self._pending_cards_of('тестват'))
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("update verbMeanings set meaningInEnglish = 'to try' "
+                              "where presentSingular1 = 'тествам'")
+        self.assertEqual([(f'to try - те ({tense_name}) (imperf.)', 'тестват', 'verbs,')],
+                         self._pending_cards_of('тестват'))
+        with self.store.transaction() as db_cursor:
+            db_cursor.execute("delete from verbMeanings where presentSingular1 = 'тествам'")
+        self.assertEqual([], self._pending_cards_of('тестват'))
+
+
+if __name__ == '__main__':
+    unittest.main()
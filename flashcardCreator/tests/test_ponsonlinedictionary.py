@@ -15,15 +15,24 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program; if not, see <http://www.gnu.org/licenses/>.
 #
+import os
+import socket
 import unittest
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 
-from flashcardcreator.translator import online_dictionary
+from flashcardcreator.ponsonlinedictionary import OnlineDictionary, \
+    OnlineDictionaryException, PONS_DICTIONARY_PATH
+from flashcardcreator.standinserver import StandInServer, \
+    StandInServerSettings
+from flashcardcreator.translator import get_online_dictionary
 
 
 class TestGettingTranslationsFromOnlineDictionary(unittest.TestCase):
     def setUp(self) -> None:
-        self.online_dictionary = online_dictionary
-        if online_dictionary is None:
+        self.online_dictionary = get_online_dictionary()
+        if self.online_dictionary is None:
             self.fail("The API key for the PONS dictionary is not configured")
 
 
@@ -51,5 +60,78 @@ class TestGettingTranslationsFromOnlineDictionary(unittest.TestCase):
                 'слънцетттт'))
 
 
+class TestConnectionPoolOfOnlineDictionary(unittest.TestCase):
+    def _start_server(self, settings=StandInServerSettings(), **dictionary_arguments):
+        self.server = StandInServer(settings=settings).start_in_background()
+        self.addCleanup(self.server.close)
+        self.online_dictionary = OnlineDictionary(
+            api_key='pons key',
+            server_url=f'{self.server.base_url}{PONS_DICTIONARY_PATH}',
+            **dictionary_arguments)
+        self.addCleanup(self.online_dictionary.close)
+
+    def test_connection_is_reused(self):
+        self._start_server()
+        for word in ('дума', 'страна', 'слънце'):
+            self.assertEqual([f'translation of {word}'],
+                             self.online_dictionary.get_target_single_word_translations_from(word))
+        self.server.force_statuses('pons', 503)
+        with self.assertRaises(OnlineDictionaryException) as raised_exception:
+            self.online_dictionary.get_full_response_from('дума')
+        self.assertEqual(503, raised_exception.exception.http_status)
+        self.assertEqual(1, self.server.connection_count())
+
+    def test_responses_are_compressed(self):
+        self._start_server()
+        http_status, headers, body = self.online_dictionary._connection_pool.request(
+            'GET', f'{PONS_DICTIONARY_PATH}?{urlencode({"q": "дума"})}',
+            {'Accept-Encoding': 'gzip'})
+        self.assertEqual((200, 'gzip'), (http_status, headers['Content-Encoding']))
+        self.assertEqual('translation of дума',
+                         self.online_dictionary.get_translations_from('дума')[0]['target'])
+
+    def test_threads_use_their_own_connections(self):
+        self._start_server(StandInServerSettings(latency_seconds=0.02),
+                           maximum_idle_connections=2)
+        words = [f'дума{word_number}' for word_number in range(20)]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            translations = list(executor.map(
+                self.online_dictionary.get_target_single_word_translations_from, words))
+        self.assertEqual([[f'translation of {word}'] for word in words], translations)
+        self.assertLessEqual(self.server.connection_count(), 2)
+
+    def test_idle_connection_closed_by_the_server_is_replaced(self):
+        self._start_server()
+        self.online_dictionary.get_full_response_from('дума')
+        idle_connection, = self.online_dictionary._connection_pool._idle_connections
+        # The idle connection is replaced by a socket whose other end was closed like a server does it
+        idle_connection.sock.close()
+        idle_connection.sock, closed_peer = socket.socketpair()
+        closed_peer.close()
+        self.assertEqual(['translation of дума'],
+                         self.online_dictionary.get_target_single_word_translations_from('дума'))
+        self.assertEqual(2, self.server.connection_count())
+
+    def test_slow_answers_time_out(self):
+        self._start_server(StandInServerSettings(latency_seconds=0.5),
+                           read_timeout_seconds=0.05)
+        with self.assertRaises(OnlineDictionaryException) as raised_exception:
+            self.online_dictionary.get_full_response_from('дума')
+        self.assertIsInstance(raised_exception.exception.__cause__, TimeoutError)
+
+    def test_proxy_of_the_environment_is_used(self):
+        self._start_server()
+        with unittest.mock.patch.dict(os.environ, {'http_proxy': self.server.base_url,
+                                                   'no_proxy': ''}):
+            online_dictionary = OnlineDictionary(
+                api_key='pons key',
+                server_url=f'http://api.pons.invalid{PONS_DICTIONARY_PATH}')
+        self.addCleanup(online_dictionary.close)
+        for _ in range(2):
+            self.assertEqual(['translation of дума'],
+                             online_dictionary.get_target_single_word_translations_from('дума'))
+        self.assertEqual(1, self.server.connection_count())
+
+
 if __name__ == '__main__':
     unittest.main()
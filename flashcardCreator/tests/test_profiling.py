@@ -0,0 +1,110 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import flashcardcreator.database
+import flashcardcreator.main
+import flashcardcreator.profiling
+from flashcardcreator.main import WordFinder
+from flashcardcreator.profiling import profiled, profiled_stage, \
+    start_profiling, stop_profiling, get_profile_summary, \
+    format_profile_summary, write_profile_json, record_stage_duration
+
+
+@profiled('test.stage')
+def _measured_function(value):
+    if value is None:
+        raise ValueError('Missing value')
+    return value * 2
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        start_profiling()
+
+    def tearDown(self):
+        stop_profiling()
+        flashcardcreator.profiling.reset_profile()
+
+    def test_nothing_is_measured_without_profiling(self):
+        stop_profiling()
+        self.assertEqual(4, _measured_function(2))
+        with profiled_stage('test.context'):
+            pass
+        self.assertEqual([], get_profile_summary())
+
+    def test_calls_and_exceptions_are_measured(self):
+        self.assertEqual(4, _measured_function(2))
+        with self.assertRaises(ValueError):
+            _measured_function(None)
+        with profiled_stage('test.context'):
+            pass
+        self.assertEqual({'test.stage': 2, 'test.context': 1},
+                         {stage_summary['stage']: stage_summary['count']
+                          for stage_summary in get_profile_summary()})
+
+    def test_percentiles(self):
+        for duration in range(1, 101):
+            record_stage_duration('test.stage', duration / 1000)
+        record_stage_duration('test.short', 0.5)
+        summary = get_profile_summary()
+        self.assertEqual(['test.stage', 'test.short'],
+                         [stage_summary['stage'] for stage_summary in summary])
+        self.assertAlmostEqual(5.05, summary[0]['total_seconds'])
+        self.assertAlmostEqual(50, summary[0]['p50_ms'])
+        self.assertAlmostEqual(95, summary[0]['p95_ms'])
+        self.assertAlmostEqual(100, summary[0]['max_ms'])
+        table_lines = format_profile_summary(summary).splitlines()
+        self.assertEqual(3, len(table_lines))
+        self.assertTrue(table_lines[1].startswith('test.stage'))
+
+    def test_json_file(self):
+        record_stage_duration('test.stage', 0.002)
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            json_file_path = os.path.join(temporary_directory, 'profile.json')
+            write_profile_json(json_file_path)
+            with open(json_file_path, 'r') as json_file:
+                stages = json.load(json_file)['stages']
+        self.assertEqual('test.stage', stages[0]['stage'])
+        self.assertAlmostEqual(2, stages[0]['p95_ms'])
+
+    def test_word_search_is_measured(self):
+        with unittest.mock.patch.object(flashcardcreator.main, 'get_form_index',
+                                        return_value=None), \
+                unittest.mock.patch.object(flashcardcreator.database,
+                                           'return_rows_of_sql_statement',
+                                           return_value=[]):
+            self.assertIsNone(WordFinder._find_word('непознато', None))
+        self.assertEqual(['dictionary.find_word'],
+                         [stage_summary['stage'] for stage_summary in get_profile_summary()])
+
+    def test_choosing_a_word_isn_t_measured_as_search(self):
+        candidate_rows = [(1, 'дума', 1, 'noun_female', 'thought'),
+                          (2, 'дума', 1, 'noun_female', 'speech')]
+        with unittest.mock.patch.object(flashcardcreator.main.word_resolver,
+                                        'choose_row', return_value=None):
+            self.assertIsNone(WordFinder._find_word('дума', None, candidate_rows))
+        self.assertEqual([], get_profile_summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
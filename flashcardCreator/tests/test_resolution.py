@@ -0,0 +1,88 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+import unittest.mock
+
+import flashcardcreator.resolution
+from flashcardcreator.resolution import NonInteractiveResolver, \
+    ReviewRequired
+
+FOUND_ROWS = [(1, 'лук', 10, 'noun_male', 'onion'),
+              (2, 'лук', 11, 'noun_male', 'bow')]
+
+
+class TestNonInteractiveResolver(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        self.patch = unittest.mock.patch.object(
+            flashcardcreator.resolution, 'GRAMMATICAL_DATABASE_LOCAL_FILENAME',
+            self.database_file)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temporary_directory.cleanup()
+
+    def _create_words_table(self, with_frequency):
+        with sqlite3.connect(self.database_file) as db_connection:
+            if with_frequency:
+                db_connection.executescript('''
+                    create table word (id integer primary key, name text, chitanka_count integer);
+                    insert into word values (1, 'лук', 3), (2, 'лук', 40);
+                    ''')
+            else:
+                db_connection.execute('create table word (id integer primary key, name text);')
+
+    def test_most_frequent_word_is_chosen(self):
+        self._create_words_table(with_frequency=True)
+        self.assertEqual(FOUND_ROWS[1], NonInteractiveResolver(
+            'most-frequent').choose_row('лук', FOUND_ROWS))
+
+    def test_first_word_is_chosen_without_frequencies(self):
+        self._create_words_table(with_frequency=False)
+        with self.assertLogs(flashcardcreator.resolution.logger, 'WARNING'):
+            self.assertEqual(FOUND_ROWS[0], NonInteractiveResolver(
+                'most-frequent').choose_row('лук', FOUND_ROWS))
+
+    def test_undecided_lines_are_written_to_review(self):
+        review_file = io.StringIO()
+        resolver = NonInteractiveResolver('skip', 'machine', review_file)
+        with self.assertRaises(ReviewRequired):
+            resolver.choose_row('лук', FOUND_ROWS)
+        self.assertEqual('onion', resolver.confirm_translation('лук', 'onion'))
+        with self.assertRaises(ReviewRequired):
+            resolver.confirm_translation('лук', None)
+        with self.assertLogs(flashcardcreator.resolution.logger, 'WARNING'):
+            resolver.send_to_review('лук', 'Two words were found')
+        self.assertEqual('# INFO: Two words were found\nлук\n',
+                         review_file.getvalue())
+        self.assertEqual(1, resolver.reviewed_lines)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            NonInteractiveResolver('random')
+
+
+if __name__ == '__main__':
+    unittest.main()
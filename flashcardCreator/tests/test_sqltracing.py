@@ -0,0 +1,106 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import flashcardcreator.sqltracing
+from flashcardcreator.database import find_large_table_scans
+from flashcardcreator.main import find_large_table_scans_of_hot_statements
+from flashcardcreator.sqltracing import enable_sql_tracing, \
+    disable_sql_tracing, connect, TracingConnection
+from flashcardcreator.syntheticdictionary import generate_grammatical_dictionary
+from installGrammaticalDictionary import create_grammar_database_indexes
+
+
+class TestSqlTracing(unittest.TestCase):
+    def tearDown(self):
+        disable_sql_tracing()
+
+    def test_connections_are_not_traced_by_default(self):
+        with contextlib.closing(connect(':memory:')) as db_connection:
+            self.assertNotIsInstance(db_connection, TracingConnection)
+
+    def test_slow_statements_are_logged_with_their_parameters(self):
+        enable_sql_tracing(slow_statement_seconds=0)
+        with contextlib.closing(connect(':memory:')) as db_connection:
+            self.assertIsInstance(db_connection, TracingConnection)
+            db_connection.executescript('create table numbers (number integer);')
+            with self.assertLogs(flashcardcreator.sqltracing.logger,
+                                 'WARNING') as logs:
+                self.assertEqual((3,), db_connection.execute(
+                    'select ? + ?', (1, 2)).fetchone())
+                db_connection.cursor().executemany(
+                    'insert into numbers values (?)', [(1,), (2,)])
+        self.assertEqual(2, len(logs.output))
+        self.assertIn('select ? + ? Parameters: (1, 2)', logs.output[0])
+        self.assertIn('Parameters: 2 rows', logs.output[1])
+
+    def test_fast_statements_are_not_logged(self):
+        enable_sql_tracing(slow_statement_seconds=60)
+        with contextlib.closing(connect(':memory:')) as db_connection, \
+                self.assertNoLogs(flashcardcreator.sqltracing.logger, 'WARNING'):
+            db_connection.execute('select 1').fetchone()
+
+    def test_all_statements_are_logged_at_debug_level(self):
+        enable_sql_tracing(slow_statement_seconds=60, log_all_statements=True)
+        with contextlib.closing(connect(':memory:')) as db_connection, \
+                self.assertLogs(flashcardcreator.sqltracing.logger,
+                                'DEBUG') as logs:
+            db_connection.execute('select ?', ('съм',)).fetchone()
+        self.assertEqual(["DEBUG:flashcardcreator.sqltracing:SQL: select 'съм'"],
+                         logs.output)
+
+
+class TestHotStatementQueryPlans(unittest.TestCase):
+    """
+    Fails if the statements which run for every imported word read a large table completely
+    """
+    MINIMUM_ROWS = 1000
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        generate_grammatical_dictionary(self.database_file, word_count=2000,
+                                        seed=3)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_hot_statements_use_the_indexes_of_the_installer(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_grammar_database_indexes(self.database_file)
+        self.assertEqual([], find_large_table_scans_of_hot_statements(
+            self.database_file, self.MINIMUM_ROWS))
+
+    def test_scans_without_indexes_are_found(self):
+        large_table_scans = find_large_table_scans_of_hot_statements(
+            self.database_file, self.MINIMUM_ROWS)
+        self.assertIn('SCAN df (derivative_form has at least 1000 rows)',
+                      large_table_scans)
+        self.assertIn('SCAN w (word has at least 1000 rows)', large_table_scans)
+
+    def test_scans_of_small_tables_are_ignored(self):
+        sql_statement = 'select 1 from word_type as wt where wt.speech_part = ?'
+        self.assertEqual([], find_large_table_scans(
+            self.database_file, sql_statement, ('noun',), self.MINIMUM_ROWS))
+        self.assertEqual(1, len(find_large_table_scans(
+            self.database_file, sql_statement, ('noun',), minimum_rows=1)))
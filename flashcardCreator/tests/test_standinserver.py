@@ -0,0 +1,123 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+import urllib.request
+
+import flashcardcreator.translator
+from flashcardcreator.ponsonlinedictionary import OnlineDictionary, \
+    OnlineDictionaryException, PONS_DICTIONARY_PATH
+from flashcardcreator.standinserver import StandInServer, \
+    StandInServerSettings, _RateLimiter
+
+
+class TestStandInServer(unittest.TestCase):
+    def _start_server(self, settings=StandInServerSettings(), translations=None):
+        self.server = StandInServer(settings=settings,
+                                    translations=translations).start_in_background()
+        self.addCleanup(self.server.close)
+        self.online_dictionary = OnlineDictionary(
+            api_key='pons key',
+            server_url=f'{self.server.base_url}{PONS_DICTIONARY_PATH}')
+        self.addCleanup(self.online_dictionary.close)
+
+    def test_pons_translations(self):
+        self._start_server(translations={'слънце': ['sun', 'sunbathe', 'the sun']})
+        self.assertEqual(['sun', 'sunbathe'],
+                         self.online_dictionary.get_target_single_word_translations_from('слънце'))
+        self.assertIsNone(self.online_dictionary.get_target_single_word_translations_from('слънцетттт'))
+        self.assertEqual({'pons 200': 1, 'pons 204': 1}, self.server.statistics())
+
+    def test_pons_api_key_is_checked(self):
+        self._start_server(StandInServerSettings(pons_api_key='other key'))
+        with self.assertRaises(OnlineDictionaryException):
+            self.online_dictionary.get_full_response_from('слънце')
+        self.assertEqual({'pons 403': 1}, self.server.statistics())
+
+    def test_forced_errors_are_answered_in_order(self):
+        self._start_server()
+        self.server.force_statuses('pons', 503, 200)
+        with self.assertRaises(OnlineDictionaryException):
+            self.online_dictionary.get_full_response_from('дума')
+        self.assertEqual(['translation of дума'],
+                         self.online_dictionary.get_target_single_word_translations_from('дума'))
+
+    def test_rate_limit(self):
+        self._start_server(StandInServerSettings(requests_per_second=0.01, burst=2))
+        for _ in range(2):
+            self.online_dictionary.get_full_response_from('дума')
+        with self.assertRaises(OnlineDictionaryException):
+            self.online_dictionary.get_full_response_from('дума')
+        self.assertEqual({'pons 200': 2, 'pons 429': 1}, self.server.statistics())
+
+    def test_random_errors_depend_on_the_seed(self):
+        answers = []
+        for _ in range(2):
+            self._start_server(StandInServerSettings(error_rate=0.5, seed=3))
+            for _ in range(10):
+                try:
+                    self.online_dictionary.get_full_response_from('дума')
+                except OnlineDictionaryException:
+                    pass
+            answers.append(self.server.statistics())
+            self.server.close()
+        self.assertEqual(answers[0], answers[1])
+        self.assertEqual(10, sum(answers[0].values()))
+
+    def test_statistics_page(self):
+        self._start_server()
+        with urllib.request.urlopen(f'{self.server.base_url}/stats') as response:
+            self.assertEqual({}, json.loads(response.read().decode('utf-8')))
+
+    def test_deepl_client_with_configured_base_url(self):
+        self._start_server(StandInServerSettings(deepl_api_key='deepl key'),
+                           {'страна': ['country']})
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            api_keys_file = os.path.join(temporary_directory, 'apiKeys.ini')
+            with open(api_keys_file, 'w') as api_keys:
+                api_keys.write(f'[DEFAULT]\ndeepl=deepl key\npons_online_dictionary=pons key\n'
+                               f'deepl_base_url={self.server.base_url}\n'
+                               f'pons_online_dictionary_base_url={self.server.base_url}/\n')
+            with unittest.mock.patch.object(flashcardcreator.translator,
+                                            'API_KEYS_FILENAME', api_keys_file):
+                deepl_translator = flashcardcreator.translator.init_function_create_deepl_translator()
+                online_dictionary = flashcardcreator.translator.init_function_create_online_dictionary()
+        self.assertEqual(['country', 'translation of дума'],
+                         [result.text for result in
+                          deepl_translator.translate_text(['страна', 'дума'], source_lang='BG',
+                                                          target_lang='EN-GB')])
+        self.assertEqual(['country'],
+                         online_dictionary.get_target_single_word_translations_from('страна'))
+        self.assertEqual({'deepl 200': 1, 'pons 200': 1}, self.server.statistics())
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_tokens_are_refilled_over_time(self):
+        now = [0.0]
+        rate_limiter = _RateLimiter(2, 1, clock=lambda: now[0])
+        self.assertEqual(0, rate_limiter.try_acquire())
+        self.assertAlmostEqual(0.5, rate_limiter.try_acquire())
+        now[0] = 0.5
+        self.assertEqual(0, rate_limiter.try_acquire())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import tempfile
+import unittest
+
+from flashcardcreator.affix import DERIVATIVE_FORMS_DESCRIPTIONS_TO_ENGLISH_NAMES, \
+    VERB_DERIVATIVE_FORMS_WHICH_MIGHT_BE_IRREGULAR, \
+    VERB_PARTICIPLES_WHICH_MIGHT_BE_IRREGULAR
+from flashcardcreator.database import return_rows_of_sql_statement
+from flashcardcreator.main import SQL_FIND_CANDIDATE_ROWS, WordFinder
+from flashcardcreator.syntheticdictionary import generate_grammatical_dictionary, \
+    read_word_type_ids
+
+
+class TestSyntheticDictionary(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temporary_directory.name,
+                                          'grammatical_dictionary.db')
+        self.generated_dictionary = generate_grammatical_dictionary(
+            self.database_file, word_count=2000, seed=7)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def _rows(self, sql_statement, params=()):
+        return return_rows_of_sql_statement(self.database_file, sql_statement,
+                                            params)
+
+    def test_row_counts(self):
+        self.assertEqual([(2000,)], self._rows('select count(1) from word'))
+        self.assertEqual([(self.generated_dictionary.derivative_form_count,)],
+                         self._rows('select count(1) from derivative_form'))
+        self.assertGreater(self.generated_dictionary.derivative_form_count, 2000)
+
+    def test_same_seed_generates_the_same_words(self):
+        other_database_file = os.path.join(self.temporary_directory.name,
+                                           'other.db')
+        generate_grammatical_dictionary(other_database_file, word_count=2000,
+                                        seed=7)
+        sql_statement = 'select name, type_id from word order by id limit 100'
+        self.assertEqual(self._rows(sql_statement),
+                         return_rows_of_sql_statement(other_database_file,
+                                                      sql_statement, ()))
+
+    def test_existing_database_is_not_replaced(self):
+        with self.assertRaises(FileExistsError):
+            generate_grammatical_dictionary(self.database_file, word_count=1)
+
+    def test_type_ids_match_the_configuration(self):
+        configured_type_ids = {(type_id, speech_part) for speech_part, type_ids in
+                               read_word_type_ids().items() for type_id in type_ids}
+        used_type_ids = set(self._rows('''
+            select distinct wt.id, wt.speech_part
+            from word as w join word_type as wt on w.type_id = wt.id
+            where exists (select 1 from derivative_form as df where df.base_word_id = w.id)'''))
+        self.assertTrue(used_type_ids)
+        self.assertLessEqual(used_type_ids, configured_type_ids)
+
+    def test_descriptions_are_the_ones_of_the_real_dictionary(self):
+        descriptions = {description for description, in
+                        self._rows('select distinct description from derivative_form')}
+        self.assertLessEqual(set(DERIVATIVE_FORMS_DESCRIPTIONS_TO_ENGLISH_NAMES),
+                             descriptions)
+        self.assertLessEqual(set(VERB_DERIVATIVE_FORMS_WHICH_MIGHT_BE_IRREGULAR +
+                                 VERB_PARTICIPLES_WHICH_MIGHT_BE_IRREGULAR), descriptions)
+
+    def test_generated_words_can_be_classified(self):
+        for word_id, name, type_id, speech_part, meaning in self._rows('''
+                select w.id, w.name, w.type_id, wt.speech_part, w.meaning
+                from word as w join word_type as wt on w.type_id = wt.id
+                order by w.id limit 50'''):
+            with self.subTest(name):
+                self.assertIn((word_id, name, type_id, speech_part, meaning),
+                              self._rows(SQL_FIND_CANDIDATE_ROWS,
+                                         {'word_to_search': name,
+                                          'word_to_search_like_name': name.capitalize()}))
+                self.assertIsNotNone(WordFinder._create_classified_word_subclass(
+                    word_id, name, type_id, speech_part, meaning))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import tempfile
+import unittest
+
+from flashcardcreator.translationcache import TranslationCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTranslationCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.cache = TranslationCache(
+            os.path.join(self.temporary_directory.name, 'cache.db'),
+            time_to_live_seconds=100, negative_time_to_live_seconds=10,
+            maximum_entries=3, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temporary_directory.cleanup()
+
+    def test_stored_translations_are_found_with_normalized_word(self):
+        self.cache.put('deepl', 'BG', 'Слънце', ['sun'])
+        self.assertEqual(['sun'],
+                         self.cache.get('deepl', 'BG', '  слънце ').translations)
+        self.assertIsNone(self.cache.get('pons', 'BG', 'слънце'))
+
+    def test_negative_entries(self):
+        self.cache.put('pons', 'BG', 'слънцетттт', None)
+        cached_translation = self.cache.get('pons', 'BG', 'слънцетттт')
+        self.assertIsNotNone(cached_translation)
+        self.assertIsNone(cached_translation.translations)
+
+    def test_entries_expire(self):
+        self.cache.put('pons', 'BG', 'слънцетттт', None)
+        self.cache.put('deepl', 'BG', 'слънце', ['sun'])
+        self.clock.now += 50
+        self.assertIsNone(self.cache.get('pons', 'BG', 'слънцетттт'))
+        self.assertIsNotNone(self.cache.get('deepl', 'BG', 'слънце'))
+        self.clock.now += 100
+        self.assertIsNone(self.cache.get('deepl', 'BG', 'слънце'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for counter in range(100):
+            self.clock.now += 1
+            self.cache.put('deepl', 'BG', f'дума{counter}', [f'word{counter}'])
+        self.assertEqual(3, len(self.cache.list_entries()))
+        self.assertIsNotNone(self.cache.get('deepl', 'BG', 'дума99'))
+        self.assertIsNone(self.cache.get('deepl', 'BG', 'дума0'))
+
+    def test_purge(self):
+        self.cache.put('pons', 'BG', 'слънцетттт', None)
+        self.cache.put('deepl', 'BG', 'слънце', ['sun'])
+        self.clock.now += 50
+        self.assertEqual(1, self.cache.purge(expired_only=True))
+        self.assertEqual([('deepl', 1, 0, 0)], self.cache.statistics())
+        self.assertEqual(1, self.cache.purge(provider='deepl'))
+        self.assertEqual([], self.cache.list_entries())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,12 +15,21 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program; if not, see <http://www.gnu.org/licenses/>.
 #
+import os
+import tempfile
+import time
 import unittest
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+
+import deepl
+
 import flashcardcreator.translator
+from flashcardcreator.translationcache import TranslationCache
 
 class TestDeepLTranslator(unittest.TestCase):
     def setUp(self) -> None:
-        self._free_translator = flashcardcreator.translator.free_translator
+        self._free_translator = flashcardcreator.translator.get_free_translator()
 
     def _return_one_translate_sentence(self, word):
         result = self._free_translator.translate_text(
@@ -33,5 +42,140 @@ class TestDeepLTranslator(unittest.TestCase):
         self.assertEqual(self._return_one_translate_sentence('нищо подобно'), 'nothing like')
 
 
+class TestTranslateTextToEnglish(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.translation_cache = TranslationCache(
+            os.path.join(self.temporary_directory.name, 'cache.db'))
+        self.free_translator = unittest.mock.Mock()
+        self.free_translator.translate_text.return_value = deepl.TextResult(
+            'sun', 'BG', 0)
+        self.online_dictionary = unittest.mock.Mock()
+        self.online_dictionary.get_target_single_word_translations_from.return_value = None
+        self.provider_executor = ThreadPoolExecutor(max_workers=4)
+        self.patches = [
+            unittest.mock.patch.object(flashcardcreator.translator,
+                                       'get_provider_executor',
+                                       return_value=self.provider_executor),
+            unittest.mock.patch.object(flashcardcreator.translator,
+                                       'get_translation_cache',
+                                       return_value=self.translation_cache),
+            unittest.mock.patch.object(flashcardcreator.translator,
+                                       'get_free_translator',
+                                       return_value=self.free_translator),
+            unittest.mock.patch.object(flashcardcreator.translator,
+                                       'get_online_dictionary',
+                                       return_value=self.online_dictionary)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        # The providers which didn't answer in time must finish before the patches are removed
+        self.provider_executor.shutdown(wait=True)
+        for patch in self.patches:
+            patch.stop()
+        self.translation_cache.close()
+        self.temporary_directory.cleanup()
+
+    def test_providers_are_called_only_once(self):
+        for _ in range(2):
+            self.assertEqual('sun',
+                             flashcardcreator.translator.translate_text_to_english(
+                                 'слънце'))
+        self.free_translator.translate_text.assert_called_once()
+        self.online_dictionary.get_target_single_word_translations_from.assert_called_once()
+
+    def test_cache_can_be_ignored(self):
+        flashcardcreator.translator.translate_text_to_english('слънце')
+        flashcardcreator.translator.translate_text_to_english('слънце',
+                                                              use_cache=False)
+        self.assertEqual(2, self.free_translator.translate_text.call_count)
+
+    def _slow_online_dictionary(self, word):
+        time.sleep(0.5)
+        return ['sunshine']
+
+    def _slow_deepl(self, *args, **kwargs):
+        time.sleep(0.5)
+        return deepl.TextResult('sun', 'BG', 0)
+
+    def test_providers_are_called_concurrently(self):
+        self.online_dictionary.get_target_single_word_translations_from.side_effect = self._slow_online_dictionary
+        self.free_translator.translate_text.side_effect = self._slow_deepl
+        start_time = time.monotonic()
+        self.assertEqual('sunshine, sun',
+                         flashcardcreator.translator.translate_text_to_english(
+                             'слънце'))
+        self.assertLess(time.monotonic() - start_time, 0.9)
+
+    def test_slow_provider_is_ignored_after_its_timeout(self):
+        self.online_dictionary.get_target_single_word_translations_from.side_effect = self._slow_online_dictionary
+        with unittest.mock.patch.object(flashcardcreator.translator,
+                                        'ONLINE_DICTIONARY_TIMEOUT_SECONDS',
+                                        0.1):
+            start_time = time.monotonic()
+            self.assertEqual('sun',
+                             flashcardcreator.translator.translate_text_to_english(
+                                 'слънце'))
+            self.assertLess(time.monotonic() - start_time, 0.4)
+
+    def test_failing_provider_is_ignored(self):
+        self.online_dictionary.get_target_single_word_translations_from.side_effect = OSError(
+            'No connection')
+        self.assertEqual('sun',
+                         flashcardcreator.translator.translate_text_to_english(
+                             'слънце'))
+
+    def test_deepl_translations_found_in_batch_are_used(self):
+        self.assertEqual('sunshine',
+                         flashcardcreator.translator.translate_text_to_english(
+                             'слънце', deepl_translations=['sunshine']))
+        self.free_translator.translate_text.assert_not_called()
+
+    def test_texts_are_translated_in_batches(self):
+        self.free_translator.translate_text.side_effect = lambda texts, **kwargs: [
+            deepl.TextResult(f'translation of {text}', 'BG', 0) for text in
+            texts]
+        words = [f'дума{counter}' for counter in range(120)] + ['Дума1']
+        with unittest.mock.patch.object(flashcardcreator.translator,
+                                        'DEEPL_MAXIMUM_TEXTS_PER_REQUEST', 50):
+            deepl_translations = flashcardcreator.translator.translate_texts_with_deepl(
+                words)
+        self.assertEqual(3, self.free_translator.translate_text.call_count)
+        self.assertEqual(120, len(deepl_translations))
+        self.assertEqual(['translation of дума1'], deepl_translations['дума1'])
+        # The translations were stored in the cache
+        self.assertEqual('translation of дума7',
+                         flashcardcreator.translator.translate_text_to_english(
+                             'дума7'))
+        self.assertEqual(3, self.free_translator.translate_text.call_count)
+
+    def test_error_is_raised_if_all_providers_fail(self):
+        self.online_dictionary.get_target_single_word_translations_from.side_effect = OSError(
+            'No connection')
+        self.free_translator.translate_text.side_effect = OSError(
+            'No connection')
+        with self.assertRaises(OSError):
+            flashcardcreator.translator.translate_text_to_english('слънце')
+
+    def test_error_is_raised_if_no_provider_answers_in_time(self):
+        self.online_dictionary.get_target_single_word_translations_from.side_effect = self._slow_online_dictionary
+        self.free_translator.translate_text.side_effect = OSError(
+            'No connection')
+        with unittest.mock.patch.object(flashcardcreator.translator,
+                                        'ONLINE_DICTIONARY_TIMEOUT_SECONDS',
+                                        0.1), \
+                self.assertRaises(TimeoutError):
+            flashcardcreator.translator.translate_text_to_english('слънце')
+        self.free_translator.translate_text.side_effect = self._slow_deepl
+        with unittest.mock.patch.object(flashcardcreator.translator,
+                                        'ONLINE_DICTIONARY_TIMEOUT_SECONDS',
+                                        0.1), \
+                unittest.mock.patch.object(flashcardcreator.translator,
+                                           'DEEPL_TIMEOUT_SECONDS', 0.1), \
+                self.assertRaises(TimeoutError):
+            flashcardcreator.translator.translate_text_to_english('дума')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+#  Copyright (c) 2023 Antonio Robirosa <flashcard.creator@areko.consulting>
+#
+#  This file is part of the Bulgarian Flashcard Creator.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#   (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <http://www.gnu.org/licenses/>.
+#
+
+# This script shows and removes the translations stored in the translation cache
+
+import argparse
+import json
+from datetime import datetime
+
+from flashcardcreator.translationcache import TranslationCache, \
+    TRANSLATION_CACHE_LOCAL_FILENAME
+
+parser = argparse.ArgumentParser(
+    prog='translationCache',
+    description='Shows and removes the translations stored in the translation cache')
+parser.add_argument('-c', '--cache-file', type=str,
+                    default=TRANSLATION_CACHE_LOCAL_FILENAME,
+                    help='Database file of the translation cache')
+subparsers = parser.add_subparsers(dest='command', required=True)
+subparsers.add_parser('stats',
+                      help='Shows the number of entries per provider')
+list_parser = subparsers.add_parser('list',
+                                    help='Shows the most recently used entries')
+list_parser.add_argument('-p', '--provider', type=str,
+                         help='Only shows the entries of this provider')
+list_parser.add_argument('-l', '--limit', type=int, default=50,
+                         help='Maximum number of entries to show')
+purge_parser = subparsers.add_parser('purge', help='Removes entries')
+purge_parser.add_argument('-e', '--expired', action='store_true',
+                          help='Only removes the expired entries')
+purge_parser.add_argument('-p', '--provider', type=str,
+                          help='Only removes the entries of this provider')
+purge_parser.add_argument('-w', '--word', type=str,
+                          help='Only removes the entries of this word')
+
+
+def _format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(sep=' ',
+                                                       timespec='seconds')
+
+
+global_arguments = parser.parse_args()
+translation_cache = TranslationCache(global_arguments.cache_file)
+try:
+    if global_arguments.command == 'stats':
+        for provider, entries, negative_entries, expired_entries in translation_cache.statistics():
+            print(f'{provider}: {entries} entries, {negative_entries} without translations, '
+                  f'{expired_entries} expired')
+    elif global_arguments.command == 'list':
+        for provider, source_language, word, translations, created_at, last_accessed_at in \
+                translation_cache.list_entries(global_arguments.provider,
+                                               global_arguments.limit):
+            shown_translations = 'no translation' if translations is None else ', '.join(
+                json.loads(translations))
+            print(f'{provider}\t{source_language}\t{word}\t{shown_translations}\t'
+                  f'created {_format_timestamp(created_at)}\t'
+                  f'used {_format_timestamp(last_accessed_at)}')
+    elif global_arguments.command == 'purge':
+        removed_entries = translation_cache.purge(global_arguments.expired,
+                                                  global_arguments.provider,
+                                                  global_arguments.word)
+        print(f'{removed_entries} entries were removed from the translation cache')
+finally:
+    translation_cache.close()